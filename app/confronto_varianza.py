@@ -0,0 +1,235 @@
+"""
+CONFRONTO METODI A VARIANZA RIDOTTA - GRUPPO DEL PESCE
+Stima Monte Carlo della differenza di durata (giorni) tra metodo sequenziale
+e metodo sovrapposto con numeri casuali comuni, variabili antitetiche,
+variabili di controllo e arresto adattivo sulla precisione richiesta
+"""
+import copy
+import dataclasses
+import math
+from statistics import NormalDist
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.main import sequenza_produzione_completa_sequenziale, sequenza_produzione_integrata_sovrapposta
+from data_model.specie_ittica_model import SpecieIttica
+from utils.configurazione import ConfigurazioneGruppoDelPesce
+from utils.generazione_lotti import genera_lotti_da_quantili
+
+# Le tonnellate non sono una metrica: i due metodi producono per costruzione le
+# stesse tonnellate sugli stessi lotti, per cui la loro differenza è sempre nulla
+METRICHE = ('giorni',)
+
+
+def _simula_replica(specie_disponibili: List[SpecieIttica], config: ConfigurazioneGruppoDelPesce,
+                    min_larve: int, max_larve: int, u: np.ndarray,
+                    ampiezza_sopravvivenza: float, ampiezza_durate: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Esegue una replica di entrambi i metodi sullo stesso vettore di uniformi u
+    (numeri casuali comuni). Le prime n componenti fissano la taglia dei lotti,
+    le tre successive i tassi di sopravvivenza per fase (uniformi attorno al
+    valore nominale), le restanti 3n le durate delle fasi per specie quando
+    ampiezza_durate è positiva. Restituisce le risposte [giorni_seq, giorni_sov]
+    e le variabili di controllo, cioè le 3n uniformi delle durate (vuote se le
+    durate non variano): sono le uniche componenti di u che muovono i giorni.
+    """
+    n = len(specie_disponibili)
+    u_lotti = u[:n]
+    u_sopravvivenza = u[n:n + 3]
+    u_durate = u[n + 3:].reshape(n, 3)
+
+    if ampiezza_durate > 0:
+        specie_disponibili = [
+            dataclasses.replace(
+                s,
+                giorni_fase_larvale=max(1, round(s.giorni_fase_larvale * (1 + ampiezza_durate * (2 * ud[0] - 1)))),
+                giorni_preingrasso=max(1, round(s.giorni_preingrasso * (1 + ampiezza_durate * (2 * ud[1] - 1)))),
+                giorni_ingrasso=max(1, round(s.giorni_ingrasso * (1 + ampiezza_durate * (2 * ud[2] - 1))))
+            )
+            for s, ud in zip(specie_disponibili, u_durate)
+        ]
+
+    nominali = (config.tasso_sopravvivenza_larvale, config.tasso_sopravvivenza_preingrasso, config.tasso_sopravvivenza_ingrasso)
+    tassi = [min(1.0, t * (1 + ampiezza_sopravvivenza * (2 * us - 1))) for t, us in zip(nominali, u_sopravvivenza)]
+
+    config_replica = copy.copy(config)
+    config_replica.tasso_sopravvivenza_larvale, config_replica.tasso_sopravvivenza_preingrasso, config_replica.tasso_sopravvivenza_ingrasso = tassi
+
+    lotti = genera_lotti_da_quantili(specie_disponibili, min_larve, max_larve, u_lotti)
+    risultati_seq = sequenza_produzione_completa_sequenziale(lotti, config_replica)
+    risultati_sov = sequenza_produzione_integrata_sovrapposta(lotti, config_replica)
+
+    risposte = np.array([
+        risultati_seq['tempo_totale'],
+        risultati_sov['tempo_totale']
+    ], dtype=float)
+    controlli = u_durate.ravel() if ampiezza_durate > 0 else np.empty(0)
+    return risposte, controlli
+
+
+def _stima_con_controlli(y: np.ndarray, c: np.ndarray, mu_c: np.ndarray, usa_controlli: bool) -> Tuple[float, float]:
+    """
+    Restituisce media e varianza campionaria di y corrette con le variabili di
+    controllo c (di media nota mu_c) tramite regressione ai minimi quadrati:
+    y_cv = y - (c - mu_c) @ beta. Le colonne di controllo a varianza nulla
+    (es. taglie dei lotti con coppie antitetiche perfette) vengono scartate.
+    """
+    k = len(y)
+    if usa_controlli:
+        c_centrati = c - mu_c
+        attivi = c_centrati.std(axis=0) > 1e-12 * (np.abs(mu_c) + 1)
+        p = int(attivi.sum())
+        if p and k > p + 2:
+            x = c_centrati[:, attivi]
+            x_medio = x - x.mean(axis=0)
+            beta, *_ = np.linalg.lstsq(x_medio, y - y.mean(), rcond=None)
+            y = y - x @ beta
+            return float(y.mean()), float(y.var(ddof=1 + p)) if k > 1 + p else 0.0
+    return float(y.mean()), float(y.var(ddof=1)) if k > 1 else 0.0
+
+
+def confronta_metodi_varianza_ridotta(specie_disponibili: List[SpecieIttica], config: ConfigurazioneGruppoDelPesce,
+                                      min_larve: int, max_larve: int,
+                                      precisione_giorni: float = 1.0, livello_confidenza: float = 0.95,
+                                      ampiezza_sopravvivenza: float = 0.05, ampiezza_durate: float = 0.1,
+                                      antitetiche: bool = False, variabili_controllo: bool = True,
+                                      dimensione_blocco: int = 32, min_repliche: int = 64, max_repliche: int = 20000,
+                                      seed: Optional[int] = None) -> Dict:
+    """
+    Confronta i due metodi produttivi sotto incertezza stimando la differenza
+    media sequenziale - sovrapposto in giorni. Le durate delle fasi variano
+    di ±ampiezza_durate attorno ai valori della specie: con ampiezza_durate=0
+    la differenza è deterministica e la stima si riduce a un solo valore.
+    Entrambi i metodi
+    usano gli stessi numeri casuali per replica (numeri casuali comuni); con
+    antitetiche=True ogni campione è la media delle repliche u e 1-u; con
+    variabili_controllo=True la stima è corretta con le uniformi che fissano
+    le durate delle fasi, di media nota 1/2. Le repliche proseguono a blocchi finché la semiampiezza
+    dell'intervallo di confidenza scende sotto la precisione richiesta o si raggiunge max_repliche.
+    Per confronto riporta anche la varianza che avrebbe una stima con estrazioni
+    indipendenti per i due metodi e le repliche che questa richiederebbe.
+
+    La differenza in giorni è (a meno degli arrotondamenti) lineare nelle
+    durate, per cui con antitetiche=True le coppie possono dare tutte lo
+    stesso valore: la varianza campionaria è nulla e non dice nulla sulla
+    precisione. In questo caso la stima è marcata 'degenere', senza intervallo
+    né fattore di riduzione, e le repliche si fermano a min_repliche.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(specie_disponibili)
+    dimensione = n + 3 + 3 * n
+    z = NormalDist().inv_cdf(0.5 + livello_confidenza / 2)
+    precisioni = {'giorni': precisione_giorni}
+
+    mu_c = np.full(3 * n if ampiezza_durate > 0 else 0, 0.5)
+
+    campioni_risposte = []   # risposte per campione (media della coppia se antitetiche)
+    campioni_controlli = []
+    singole = []             # prima replica di ogni campione: base per la stima indipendente
+    repliche = 0
+    stime = {}
+    convergenza = False
+    degenere = False
+
+    while repliche < max_repliche:
+        for u in rng.random((dimensione_blocco, dimensione)):
+            risposte, controlli = _simula_replica(specie_disponibili, config, min_larve, max_larve, u,
+                                                  ampiezza_sopravvivenza, ampiezza_durate)
+            singole.append(risposte)
+            repliche += 1
+            if antitetiche:
+                risposte_a, controlli_a = _simula_replica(specie_disponibili, config, min_larve, max_larve, 1 - u,
+                                                          ampiezza_sopravvivenza, ampiezza_durate)
+                risposte = (risposte + risposte_a) / 2
+                controlli = (controlli + controlli_a) / 2
+                repliche += 1
+            campioni_risposte.append(risposte)
+            campioni_controlli.append(controlli)
+
+        y = np.array(campioni_risposte)
+        c = np.array(campioni_controlli)
+        s = np.array(singole)
+        k = len(y)
+
+        stime = {}
+        for m, metrica in enumerate(METRICHE):
+            seq, sov = y[:, 2 * m], y[:, 2 * m + 1]
+            media, varianza = _stima_con_controlli(seq - sov, c, mu_c, variabili_controllo)
+            # Coppie antitetiche tutte uguali: la varianza nulla non misura la precisione
+            stima_degenere = antitetiche and k > 1 and float(np.ptp(seq - sov)) == 0.0
+            semiampiezza = None if stima_degenere else z * math.sqrt(varianza / k)
+            # Estrazioni indipendenti: Var(seq - sov) = Var(seq) + Var(sov), 2 simulazioni per replica
+            varianza_indipendente = float(s[:, 2 * m].var(ddof=1) + s[:, 2 * m + 1].var(ddof=1))
+            repliche_indipendenti = math.ceil(varianza_indipendente * (z / precisioni[metrica]) ** 2)
+            # Varianza per replica effettiva, confrontabile con quella indipendente
+            varianza_per_replica = varianza * (2 if antitetiche else 1)
+            stime[metrica] = {
+                'media_sequenziale': float(seq.mean()),
+                'media_sovrapposto': float(sov.mean()),
+                'differenza': media,
+                'degenere': stima_degenere,
+                'semiampiezza': semiampiezza,
+                'intervallo': None if stima_degenere else (media - semiampiezza, media + semiampiezza),
+                'varianza_indipendente': varianza_indipendente,
+                'varianza_ridotta': varianza_per_replica,
+                'repliche_indipendenti_stimate': repliche_indipendenti,
+                # Non definito se la differenza è deterministica (nessuna variabilità da ridurre)
+                # Non definito anche per la stima degenere, la cui varianza non è stimabile
+                'fattore_riduzione': None if varianza_indipendente == 0 or stima_degenere else
+                (varianza_indipendente / varianza_per_replica if varianza_per_replica > 0 else math.inf)
+            }
+
+        if repliche >= min_repliche:
+            if any(stime[m]['degenere'] for m in METRICHE):
+                # Altre coppie darebbero ancora lo stesso valore
+                degenere = True
+                break
+            if all(stime[m]['semiampiezza'] <= precisioni[m] for m in METRICHE):
+                convergenza = True
+                break
+
+    return {
+        'repliche': repliche,
+        'campioni': len(campioni_risposte),
+        'livello_confidenza': livello_confidenza,
+        'convergenza': convergenza,
+        'degenere': degenere,
+        'metriche': stime
+    }
+
+
+def stampa_confronto_varianza(risultati: Dict):
+    """
+    Stampa su console il riepilogo del confronto a varianza ridotta: numero di
+    repliche, intervallo di confidenza della differenza per ciascuna metrica e
+    fattore di riduzione rispetto a estrazioni indipendenti.
+    """
+    righe = [
+        f"\n{'='*80}",
+        f"CONFRONTO A VARIANZA RIDOTTA - {risultati['repliche']} repliche "
+        f"({'convergenza raggiunta' if risultati['convergenza'] else 'stima antitetica degenere' if risultati['degenere'] else 'limite repliche raggiunto'})",
+        f"{'='*80}"
+    ]
+    for metrica, stima in risultati['metriche'].items():
+        righe.append(f"\n {metrica.upper()} (sequenziale - sovrapposto):")
+        if stima['degenere']:
+            righe.append(f"    Differenza media: {stima['differenza']:.2f} [IC non disponibile]")
+        else:
+            basso, alto = stima['intervallo']
+            righe.append(f"    Differenza media: {stima['differenza']:.2f} "
+                         f"[IC {risultati['livello_confidenza']*100:.0f}%: {basso:.2f} ; {alto:.2f}]")
+        righe.append(f"    Medie: sequenziale {stima['media_sequenziale']:.2f} - sovrapposto {stima['media_sovrapposto']:.2f}")
+        if stima['degenere']:
+            righe.append("    Stima degenere: tutte le coppie antitetiche danno la stessa differenza, la "
+                         "varianza non è stimabile (usare antitetiche=False per un intervallo)")
+        elif stima['fattore_riduzione'] is None:
+            righe.append("    Fattore di riduzione varianza: n/d (differenza deterministica)")
+        elif math.isinf(stima['fattore_riduzione']):
+            righe.append(f"    Varianza residua nulla (repliche indipendenti stimate: "
+                         f"{stima['repliche_indipendenti_stimate']:,})")
+        else:
+            righe.append(f"    Fattore di riduzione varianza: {stima['fattore_riduzione']:.1f}x "
+                         f"(repliche indipendenti stimate: {stima['repliche_indipendenti_stimate']:,})")
+    righe.append(f"{'='*80}\n")
+    print("\n".join(righe))
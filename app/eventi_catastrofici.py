@@ -0,0 +1,344 @@
+"""
+EVENTI CATASTROFICI - GRUPPO DEL PESCE
+Strato stocastico di eventi rari (epidemie, mareggiate sulle gabbie, crisi di
+ossigeno nelle vasche) sopra la sopravvivenza per fase, con stima dei quantili
+estremi della perdita di tonnellate per importance sampling: intensità, lotti
+colpiti e gravità degli eventi sono inclinati con il metodo cross-entropy e i
+campioni sono ripesati con il rapporto di verosimiglianza
+"""
+import math
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from data_model.evento_catastrofico_model import EventoCatastrofico
+
+EVENTI_PREDEFINITI = [
+    EventoCatastrofico("Epidemia", ('preingrasso', 'ingrasso'), tasso_annuo=0.05,
+                       alfa_perdita=2.0, beta_perdita=3.0, quota_lotti_colpiti=0.5),
+    EventoCatastrofico("Mareggiata sulle gabbie", ('ingrasso',), tasso_annuo=0.02,
+                       alfa_perdita=2.0, beta_perdita=2.0, quota_lotti_colpiti=0.35),
+    EventoCatastrofico("Crisi di ossigeno nelle vasche", ('larvale', 'preingrasso'), tasso_annuo=0.1,
+                       alfa_perdita=5.0, beta_perdita=2.0, quota_lotti_colpiti=0.2)
+]
+
+# Coppie replica-lotto (ed evento-lotto) elaborate insieme da simula_perdite: limita la memoria
+ELEMENTI_BLOCCO = 1_000_000
+
+# Campi di inizio e fine di ciascuna fase nei dettagli del metodo sovrapposto
+CAMPI_FASI = {
+    'larvale': ('inizio_giorno', 'fine_larvale_giorno'),
+    'preingrasso': ('fine_larvale_giorno', 'fine_preingrasso_giorno'),
+    'ingrasso': ('fine_preingrasso_giorno', 'fine_ingrasso_giorno')
+}
+
+
+def probabilita_periodo_ritorno(anni: float, giorni_ciclo: float) -> float:
+    """
+    Probabilità di superamento per ciclo produttivo di una perdita con
+    periodo di ritorno di `anni` anni (ad esempio 100 per l'evento
+    "1 volta in 100 anni"), dato un ciclo di `giorni_ciclo` giorni.
+    """
+    return 1 - (1 - 1 / anni) ** (giorni_ciclo / 365)
+
+
+def _verifica_evento(evento: EventoCatastrofico):
+    """
+    Controlla i parametri di un tipo di evento: il rapporto di
+    verosimiglianza usa log(quota) e log(1 - quota), per cui la quota di
+    lotti colpiti deve stare strettamente tra 0 e 1 (un evento che non
+    colpisce mai nessun lotto va semplicemente omesso).
+    """
+    if not 0 < evento.quota_lotti_colpiti < 1:
+        raise ValueError(f"Evento '{evento.nome}': quota_lotti_colpiti deve essere in (0, 1), "
+                         f"ricevuto {evento.quota_lotti_colpiti}")
+    if not (evento.alfa_perdita > 0 and evento.beta_perdita > 0):
+        raise ValueError(f"Evento '{evento.nome}': alfa_perdita e beta_perdita devono essere positivi")
+    if not evento.tasso_annuo >= 0:
+        raise ValueError(f"Evento '{evento.nome}': tasso_annuo non può essere negativo")
+    fasi_ignote = set(evento.fasi) - set(CAMPI_FASI)
+    if fasi_ignote:
+        raise ValueError(f"Evento '{evento.nome}': fasi sconosciute {sorted(fasi_ignote)}")
+
+
+class ModelloEventi:
+    """
+    Eventi catastrofici su un piano del metodo sovrapposto. Ogni tipo di
+    evento è un processo di Poisson sull'orizzonte del piano; un evento al
+    giorno t colpisce, con probabilità quota_lotti_colpiti ciascuno, i lotti
+    che in t si trovano in una delle sue fasi, eliminando una quota Beta dei
+    pesci. Le perdite si sommano alla sopravvivenza per fase già contenuta
+    nei risultati: le tonnellate di un lotto sono moltiplicate per il
+    prodotto delle quote sopravvissute agli eventi (senza ripetere le
+    troncature intere delle sequenze produttive). Eventi con parametri
+    fuori dominio sono rifiutati con ValueError.
+    """
+
+    def __init__(self, risultati_sov: Dict, eventi: Sequence[EventoCatastrofico] = None):
+        self.eventi = list(EVENTI_PREDEFINITI if eventi is None else eventi)
+        for evento in self.eventi:
+            _verifica_evento(evento)
+        dettagli = risultati_sov['dettagli']
+        n = len(dettagli)
+        self.tonnellate_lotti = np.fromiter((d['tonnellate_prodotte'] for d in dettagli), dtype=np.float64, count=n)
+        self.tonnellate_attese = float(self.tonnellate_lotti.sum())
+        self.orizzonte_giorni = risultati_sov['tempo_totale']
+        self._intervalli = {
+            fase: (np.fromiter((d[inizio] for d in dettagli), dtype=np.int64, count=n),
+                   np.fromiter((d[fine] for d in dettagli), dtype=np.int64, count=n))
+            for fase, (inizio, fine) in CAMPI_FASI.items()
+        }
+        # Numero atteso di eventi di ciascun tipo sull'orizzonte, senza inclinazione
+        self.eventi_attesi = np.array([e.tasso_annuo * self.orizzonte_giorni / 365 for e in self.eventi])
+
+    def parametri_nominali(self) -> Dict[str, np.ndarray]:
+        """Parametri degli eventi senza inclinazione, un valore per tipo di evento"""
+        return {
+            'intensita': np.ones(len(self.eventi)),
+            'quota': np.array([e.quota_lotti_colpiti for e in self.eventi]),
+            'alfa': np.array([e.alfa_perdita for e in self.eventi]),
+            'beta': np.array([e.beta_perdita for e in self.eventi])
+        }
+
+    def simula_perdite(self, rng: np.random.Generator, repliche: int,
+                       inclinazione: Optional[Dict[str, np.ndarray]] = None) -> Dict:
+        """
+        Simula `repliche` realizzazioni indipendenti del piano. Con
+        `inclinazione` (stesse chiavi di parametri_nominali) gli eventi sono
+        campionati con intensità moltiplicate per 'intensita', quota di lotti
+        colpiti 'quota' e perdita Beta('alfa', 'beta'). Restituisce per
+        replica la perdita di tonnellate, il logaritmo del rapporto di
+        verosimiglianza tra distribuzione nominale e inclinata (0 senza
+        inclinazione) e, per tipo di evento, numero di eventi, lotti presenti
+        e lotti colpiti; per ogni tipo anche replica e quota persa di ciascun
+        evento, usate per aggiornare l'inclinazione. Le repliche sono simulate
+        a blocchi di al più ELEMENTI_BLOCCO coppie replica-lotto (ed eventi
+        a blocchi di al più ELEMENTI_BLOCCO coppie evento-lotto), per cui la
+        memoria non cresce con repliche, intensità inclinate e numero di lotti.
+        """
+        nominali = self.parametri_nominali()
+        inclinazione = inclinazione or nominali
+        dimensione = max(1, ELEMENTI_BLOCCO // max(len(self.tonnellate_lotti), 1))
+        blocchi = [
+            self._simula_blocco(rng, min(dimensione, repliche - inizio), inclinazione, nominali)
+            for inizio in range(0, repliche, dimensione)
+        ] or [self._simula_blocco(rng, 0, inclinazione, nominali)]
+
+        # Indici di replica dei singoli eventi riportati alla numerazione complessiva
+        severita = []
+        for k in range(len(self.eventi)):
+            inizio = 0
+            repliche_evento, perdite_evento = [], []
+            for blocco in blocchi:
+                replica, perdita = blocco['severita'][k]
+                repliche_evento.append(replica + inizio)
+                perdite_evento.append(perdita)
+                inizio += len(blocco['perdite'])
+            severita.append((np.concatenate(repliche_evento), np.concatenate(perdite_evento)))
+
+        risultati = {campo: np.concatenate([b[campo] for b in blocchi])
+                     for campo in ('perdite', 'log_rapporto', 'conteggi', 'presenze', 'colpi')}
+        risultati['severita'] = severita
+        return risultati
+
+    def _simula_blocco(self, rng: np.random.Generator, repliche: int, inclinazione: Dict[str, np.ndarray],
+                       nominali: Dict[str, np.ndarray]) -> Dict:
+        numero_lotti = len(self.tonnellate_lotti)
+        numero_eventi = len(self.eventi)
+        eventi_per_passo = max(1, ELEMENTI_BLOCCO // max(numero_lotti, 1))
+        log_sopravvivenza = np.zeros((repliche, numero_lotti))
+        log_rapporto = np.zeros(repliche)
+        conteggi = np.zeros((repliche, numero_eventi), dtype=np.int64)
+        presenze = np.zeros((repliche, numero_eventi), dtype=np.int64)
+        colpi = np.zeros((repliche, numero_eventi), dtype=np.int64)
+        severita = []
+
+        for k, evento in enumerate(self.eventi):
+            intensita = inclinazione['intensita'][k]
+            quota, quota_nominale = inclinazione['quota'][k], nominali['quota'][k]
+            alfa, beta = inclinazione['alfa'][k], inclinazione['beta'][k]
+            alfa_nominale, beta_nominale = nominali['alfa'][k], nominali['beta'][k]
+
+            conteggi[:, k] = rng.poisson(self.eventi_attesi[k] * intensita, repliche)
+            # Rapporto di verosimiglianza del processo di Poisson: (1/f)^N exp((f - 1) mu)
+            log_rapporto += -conteggi[:, k] * np.log(intensita) + (intensita - 1) * self.eventi_attesi[k]
+            totale = int(conteggi[:, k].sum())
+            replica = np.repeat(np.arange(repliche), conteggi[:, k])
+            perdita = np.clip(rng.beta(alfa, beta, totale), 1e-12, 1 - 1e-12)
+            severita.append((replica, perdita))
+            if totale == 0:
+                continue
+
+            giorno = rng.uniform(0, self.orizzonte_giorni, totale)
+            numero_presenti = np.zeros(totale, dtype=np.int64)
+            numero_colpiti = np.zeros(totale, dtype=np.int64)
+            for a in range(0, totale, eventi_per_passo):
+                b = min(a + eventi_per_passo, totale)
+                presenti = np.zeros((b - a, numero_lotti), dtype=bool)
+                for fase in evento.fasi:
+                    inizio, fine = self._intervalli[fase]
+                    presenti |= (inizio <= giorno[a:b, None]) & (giorno[a:b, None] < fine)
+                colpiti = presenti & (rng.random(presenti.shape) < quota)
+                np.add.at(log_sopravvivenza, replica[a:b], np.log(1 - perdita[a:b, None] * colpiti))
+                numero_presenti[a:b] = presenti.sum(axis=1)
+                numero_colpiti[a:b] = colpiti.sum(axis=1)
+
+            presenze[:, k] = np.bincount(replica, weights=numero_presenti, minlength=repliche).astype(np.int64)
+            colpi[:, k] = np.bincount(replica, weights=numero_colpiti, minlength=repliche).astype(np.int64)
+            # Rapporto di verosimiglianza dei lotti colpiti (Bernoulli) e delle perdite (Beta)
+            log_rapporto += (colpi[:, k] * np.log(quota_nominale / quota)
+                             + (presenze[:, k] - colpi[:, k]) * np.log((1 - quota_nominale) / (1 - quota)))
+            log_densita = ((alfa_nominale - alfa) * np.log(perdita) + (beta_nominale - beta) * np.log1p(-perdita)
+                           + _log_beta(alfa, beta) - _log_beta(alfa_nominale, beta_nominale))
+            log_rapporto += np.bincount(replica, weights=log_densita, minlength=repliche)
+
+        perdite = self.tonnellate_attese - np.exp(log_sopravvivenza) @ self.tonnellate_lotti
+        return {
+            'perdite': np.maximum(perdite, 0.0),
+            'log_rapporto': log_rapporto,
+            'conteggi': conteggi,
+            'presenze': presenze,
+            'colpi': colpi,
+            'severita': severita
+        }
+
+
+def _log_beta(alfa: float, beta: float) -> float:
+    return math.lgamma(alfa) + math.lgamma(beta) - math.lgamma(alfa + beta)
+
+
+def _aggiorna_inclinazione(modello: ModelloEventi, campione: Dict, pesi_elite: np.ndarray,
+                           inclinazione: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Passo cross-entropy: stima pesata, sulle sole repliche oltre soglia,
+    dei parametri che le rendono più probabili. Intensità e quota hanno la
+    soluzione esatta (eventi medi per replica rispetto ai nominali, lotti
+    colpiti su lotti presenti); per la Beta si usano i momenti pesati delle
+    perdite. Un tipo di evento assente dalle repliche oltre soglia mantiene
+    i parametri correnti. Qualunque inclinazione lascia la stima corretta,
+    perché i campioni sono ripesati con il rapporto di verosimiglianza esatto.
+    """
+    nuova = {campo: valori.copy() for campo, valori in inclinazione.items()}
+    peso_totale = pesi_elite.sum()
+    attesi = modello.eventi_attesi
+    nuova['intensita'] = np.where(attesi > 0, np.maximum((pesi_elite @ campione['conteggi']) / (peso_totale * np.where(attesi > 0, attesi, 1)), 1e-3), 1.0)
+
+    presenze = pesi_elite @ campione['presenze']
+    colpi = pesi_elite @ campione['colpi']
+    for k, (replica, perdita) in enumerate(campione['severita']):
+        if presenze[k] > 0:
+            nuova['quota'][k] = np.clip(colpi[k] / presenze[k], 0.01, 0.99)
+        pesi = pesi_elite[replica]
+        if len(perdita) < 2 or pesi.sum() <= 0:
+            continue
+        media = np.average(perdita, weights=pesi)
+        varianza = np.average((perdita - media) ** 2, weights=pesi)
+        if varianza > 0:
+            comune = media * (1 - media) / varianza - 1
+            if comune > 0:
+                nuova['alfa'][k] = max(media * comune, 0.1)
+                nuova['beta'][k] = max((1 - media) * comune, 0.1)
+    return nuova
+
+
+def _quantile_pesato(perdite: np.ndarray, pesi: np.ndarray, probabilita_superamento: float) -> float:
+    """
+    Più piccola perdita q tale che la probabilità stimata di perdite
+    maggiori o uguali a q non superi quella indicata (pesi normalizzati sul
+    numero di repliche, come nello stimatore di importance sampling).
+    """
+    ordine = np.argsort(perdite)[::-1]
+    superamento = np.cumsum(pesi[ordine]) / len(perdite)
+    indice = int(np.searchsorted(superamento, probabilita_superamento, side='right'))
+    return float(perdite[ordine][max(indice - 1, 0)])
+
+
+def _esito(perdite: np.ndarray, pesi: np.ndarray, probabilita_superamento: float,
+           inclinazione: Dict[str, np.ndarray], simulazioni: int, modello: ModelloEventi) -> Dict:
+    quantile = _quantile_pesato(perdite, pesi, probabilita_superamento)
+    contributi = pesi * (perdite >= quantile)
+    stima = contributi.mean()
+    errore_standard = contributi.std(ddof=1) / np.sqrt(len(perdite))
+    return {
+        'probabilita_superamento': probabilita_superamento,
+        'perdita_tonnellate': quantile,
+        'perdita_percentuale': quantile / modello.tonnellate_attese * 100 if modello.tonnellate_attese else 0.0,
+        'probabilita_stimata': float(stima),
+        'errore_relativo': float(errore_standard / stima) if stima > 0 else float('inf'),
+        'campioni_in_coda': int((perdite >= quantile).sum()),
+        'inclinazione': {
+            evento.nome: {campo: float(valori[k]) for campo, valori in inclinazione.items()}
+            for k, evento in enumerate(modello.eventi)
+        },
+        'simulazioni': simulazioni
+    }
+
+
+def stima_monte_carlo(modello: ModelloEventi, probabilita_superamento: float, repliche: int = 100_000,
+                      seed: Optional[int] = None) -> Dict:
+    """
+    Stima Monte Carlo semplice del quantile di perdita con la probabilità di
+    superamento indicata: per una probabilità p servono circa 100/p
+    repliche per un errore relativo del 10% sulla coda.
+    """
+    rng = np.random.default_rng(seed)
+    campione = modello.simula_perdite(rng, repliche)
+    return _esito(campione['perdite'], np.ones(repliche), probabilita_superamento,
+                  modello.parametri_nominali(), repliche, modello)
+
+
+def stima_importance_sampling(modello: ModelloEventi, probabilita_superamento: float, repliche: int = 20_000,
+                              repliche_pilota: int = 2_000, quota_elite: float = 0.1, iterazioni_massime: int = 20,
+                              seed: Optional[int] = None) -> Dict:
+    """
+    Stima il quantile di perdita con la probabilità di superamento indicata
+    (ad esempio probabilita_periodo_ritorno(100, giorni_ciclo) per la
+    perdita "1 volta in 100 anni") per importance sampling. Intensità degli
+    eventi, quota di lotti colpiti e distribuzione delle perdite sono
+    inclinate con il metodo cross-entropy a più livelli: a ogni iterazione
+    pilota la soglia è il minimo tra il quantile (1 - quota_elite) delle
+    perdite campionate e il quantile pesato cercato, e l'inclinazione è
+    aggiornata sulle repliche oltre soglia. Quando la soglia raggiunge il
+    quantile cercato, la stima finale usa `repliche` repliche con
+    l'inclinazione trovata, ripesate con il rapporto di verosimiglianza.
+    Restituisce quantile, probabilità stimata con errore relativo,
+    inclinazione finale e numero totale di simulazioni.
+    """
+    rng = np.random.default_rng(seed)
+    inclinazione = modello.parametri_nominali()
+    simulazioni = 0
+
+    for _ in range(iterazioni_massime):
+        campione = modello.simula_perdite(rng, repliche_pilota, inclinazione)
+        simulazioni += repliche_pilota
+        perdite = campione['perdite']
+        pesi = np.exp(campione['log_rapporto'])
+        obiettivo = _quantile_pesato(perdite, pesi, probabilita_superamento)
+        soglia = min(float(np.quantile(perdite, 1 - quota_elite)), obiettivo)
+        if soglia <= 0:
+            # Nessuna perdita nella maggior parte delle repliche: si aumentano le intensità
+            inclinazione = {**inclinazione, 'intensita': inclinazione['intensita'] * 2}
+            continue
+
+        inclinazione = _aggiorna_inclinazione(modello, campione, pesi * (perdite >= soglia), inclinazione)
+        if soglia >= obiettivo:
+            break
+
+    campione = modello.simula_perdite(rng, repliche, inclinazione)
+    simulazioni += repliche
+    return _esito(campione['perdite'], np.exp(campione['log_rapporto']), probabilita_superamento,
+                  inclinazione, simulazioni, modello)
+
+
+def stampa_stima(esito: Dict, titolo: str = "PERDITA DA EVENTI CATASTROFICI"):
+    print("\n" + "=" * 80)
+    print(f" {titolo}")
+    print("=" * 80)
+    print(f"   Probabilità di superamento per ciclo: {esito['probabilita_superamento']:.2e}")
+    print(f"   Perdita: {esito['perdita_tonnellate']:.1f} t ({esito['perdita_percentuale']:.1f}% della produzione attesa)")
+    print(f"   Probabilità stimata: {esito['probabilita_stimata']:.2e} (errore relativo {esito['errore_relativo'] * 100:.1f}%)")
+    print(f"   Repliche nella coda: {esito['campioni_in_coda']:,} - simulazioni totali: {esito['simulazioni']:,}")
+    for nome, parametri in esito['inclinazione'].items():
+        print(f"   {nome}: intensità x{parametri['intensita']:.2f}, quota lotti colpiti {parametri['quota']:.2f}, "
+              f"perdita Beta({parametri['alfa']:.2f}, {parametri['beta']:.2f})")
+    print("=" * 80 + "\n")
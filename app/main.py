@@ -10,6 +10,8 @@ from data_model.specie_ittica_model import SpecieIttica
 from utils.calcolo_vasche import calcola_vasche_larvali, calcola_gabbie_ingrasso, calcola_vasche_preingrasso
 from utils.configurazione import ConfigurazioneGruppoDelPesce
 from utils.generazione_lotti import genera_lotti_casuali
+from utils.output_console import scrivi_lotti, scrivi_risultati, verifica_modalita
+from utils.storico_simulazioni import PERCORSO_PREDEFINITO, StoricoSimulazioni
 
 # ============================================================================
 # SEQUENZE PRODUTTIVE
@@ -96,7 +98,8 @@ def sequenza_produzione_integrata_sovrapposta(lotti: List[LottoProduzione], conf
     offset_inizio = 0
 
     for idx, lotto in enumerate(lotti):
-        # FASE 1: LARVALE
+        # FASE 1: LARVALE (le fasi larvali non si sovrappongono: il lotto
+        # dispone di tutte le vasche larvali)
         vasche_larvali = calcola_vasche_larvali(lotto, config)
         giorni_larvali = lotto.specie.giorni_fase_larvale
 
@@ -157,59 +160,22 @@ def sequenza_produzione_integrata_sovrapposta(lotti: List[LottoProduzione], conf
 # 6. OUTPUT E REPORTING
 # ============================================================================
 
-def stampa_risultati(risultati: Dict):
+def stampa_risultati(risultati: Dict, modalita: str = 'completo'):
     """
     Formatta e stampa su console i risultati della simulazione in modo strutturato.
     # Visualizza per ogni specie: numeri (larve, avannotti, pesci, tonnellate),
     # risorse utilizzate (vasche e gabbie), tempi di ogni fase e performance complessive.
     # Include anche totali aggregati di produzione e tempo complessivo del ciclo.
+    # Il testo è costruito in memoria e scritto a blocchi di lotti; la modalità
+    # (completo, sintesi, tabella, jsonl, csv) è descritta in scrivi_risultati.
     """
-    print(f"\n{'='*80}")
-    print(f"RISULTATI SIMULAZIONE - {risultati['metodo']}")
-    print(f"{'='*80}")
-
-    for dettaglio in risultati['dettagli']:
-        print(f"\n Specie: {dettaglio['specie']}")
-        print(f"    NUMERI:")
-        print(f"      Larve seminate: {dettaglio['larve_seminate']:,} larve")
-        print(f"      Avannotti prodotti (2g): {dettaglio['avannotti_2g']:,}")
-        print(f"      Pesci commerciali: {dettaglio['pesci_commerciali']:,}")
-        print(f"      Tonnellate prodotte: {dettaglio['tonnellate_prodotte']} t")
-
-        print(f"\n    RISORSE UTILIZZATE:")
-        print(f"      Vasche larvali: {dettaglio['vasche_larvali']}")
-        print(f"      Vasche preingrasso: {dettaglio['vasche_preingrasso']}")
-        print(f"      Gabbie ingrasso: {dettaglio['gabbie_ingrasso']}")
-
-        print(f"\n     TEMPI:")
-        if 'inizio_giorno' in dettaglio:
-            print(f"      Inizio ciclo: giorno {dettaglio['inizio_giorno']}")
-            print(f"      Fine larvale: giorno {dettaglio['fine_larvale_giorno']} ({dettaglio['giorni_larvali']}gg)")
-            print(f"      Fine preingrasso: giorno {dettaglio['fine_preingrasso_giorno']} ({dettaglio['giorni_preingrasso']}gg)")
-            print(f"      Fine ingrasso: giorno {dettaglio['fine_ingrasso_giorno']} ({dettaglio['giorni_ingrasso']}gg)")
-        else:
-            print(f"      Fase larvale: {dettaglio['giorni_larvali']} giorni")
-            print(f"      Fase preingrasso: {dettaglio['giorni_preingrasso']} giorni")
-            print(f"      Fase ingrasso: {dettaglio['giorni_ingrasso']} giorni")
-            print(f"      Tempo totale: {dettaglio['giorni_totali']} giorni")
-
-        print(f"\n    PERFORMANCE:")
-        print(f"      Tasso sopravvivenza totale: {dettaglio['tasso_sopravvivenza_totale']}%")
-
-    print(f"\n{'='*80}")
-    print(f"️  TEMPO TOTALE CICLO PRODUTTIVO: {risultati['tempo_totale']} giorni")
-
-    # Calcola produzione totale
-    tot_tonnellate = sum(d['tonnellate_prodotte'] for d in risultati['dettagli'])
-    tot_pesci = sum(d['pesci_commerciali'] for d in risultati['dettagli'])
-    print(f" PRODUZIONE TOTALE: {tot_tonnellate:.2f} tonnellate ({tot_pesci:,} pesci)")
-    print(f"{'='*80}\n")
+    scrivi_risultati(risultati, modalita)
 
 # ============================================================================
 # 7. FUNZIONE PRINCIPALE
 # ============================================================================
 
-def main():
+def main(modalita_output: str = None, motore: str = None):
     """
     Punto di ingresso principale del programma. Configura l'ambiente di simulazione,
     # definisce le tre specie ittiche (Spigola, Orata, Ombrina) con i loro parametri
@@ -217,13 +183,15 @@ def main():
     # genera lotti casuali, esegue entrambe le simulazioni (sequenziale e sovrapposta),
     # genera il report grafico PNG, e stampa il confronto dettagliato tra i metodi
     # includendo analisi della produzione annuale e raggiungimento del target aziendale.
+    # La modalità di output (completo, sintesi, tabella, jsonl, csv) è letta da
+    # MODALITA_OUTPUT se non indicata: in jsonl/csv stampa solo i record dei risultati.
+    # Il motore di simulazione (riferimento, vettoriale, a_blocchi, parallelo) è letto
+    # da MOTORE_SIMULAZIONE se non indicato; i risultati non dipendono dal motore.
+    # Solo con REGISTRA_STORICO attivo (di default è disattivato) entrambe le esecuzioni
+    # sono archiviate nel database SQLite.
     """
-
-    print("\n" + "="*80)
-    print(" SIMULAZIONE PRODUZIONE - GRUPPO DEL PESCE")
-    print("   Filiera integrata: dalla nascita alla taglia commerciale")
-    print("   Sede: Guidonia (RM) - 6 impianti produttivi in Italia")
-    print("="*80)
+    # Import locale: app.motori_simulazione importa le sequenze da questo modulo
+    from app.motori_simulazione import ottieni_motore
 
     # Definisci le tre specie principali del Gruppo Del Pesce
     specie_ittiche = [
@@ -267,43 +235,52 @@ def main():
 
     # Configura il gruppo produttivo
     config = ConfigurazioneGruppoDelPesce()
-
-    print(f"\n CONFIGURAZIONE GRUPPO DEL PESCE:")
-    print(f"\n    AVANNOTTERIA (Riproduzione):")
-    print(f"      - Vasche larvali piccole (2-5mc): {config.vasche_larvali_piccole}")
-    print(f"      - Vasche larvali medie (10mc): {config.vasche_larvali_medie}")
-    print(f"      - Vasche larvali grandi (20mc): {config.vasche_larvali_grandi}")
-    print(f"      - Vasche preingrasso (40mc): {config.vasche_preingrasso}")
-
-    print(f"\n    IMPIANTI PRODUTTIVI:")
-    print(f"      - Numero impianti: {config.numero_impianti}")
-    print(f"      - Gabbie per impianto: {config.gabbie_per_impianto}")
-    print(f"      - Volume gabbia: {config.volume_gabbia} mc")
-    print(f"      - Impianto terra Orbetello: {config.vasche_terra_orbetello} vasche da {config.volume_vasca_terra} mc")
-
-    print(f"\n    CAPACITÀ E PARAMETRI:")
-    print(f"      - Capacità produttiva annua: {config.capacita_produttiva_annua:,} tonnellate/anno")
-    print(f"      - Sopravvivenza larvale: {config.tasso_sopravvivenza_larvale*100}%")
-    print(f"      - Sopravvivenza preingrasso: {config.tasso_sopravvivenza_preingrasso*100}%")
-    print(f"      - Sopravvivenza ingrasso: {config.tasso_sopravvivenza_ingrasso*100}%")
-    print(f"      - Efficienza operativa: {config.efficienza_operativa*100}%")
-
+    modalita = modalita_output or config.modalita_output
+    # Modalità e motore sono verificati prima di stampare qualsiasi cosa
+    verifica_modalita(modalita)
+    motore_simulazione = ottieni_motore(motore or config.motore_simulazione)
+    # Nelle modalità jsonl/csv lo stdout contiene solo i record dei risultati
+    leggibile = modalita not in ('jsonl', 'csv')
+
+    if leggibile:
+        print("\n" + "="*80)
+        print(" SIMULAZIONE PRODUZIONE - GRUPPO DEL PESCE")
+        print("   Filiera integrata: dalla nascita alla taglia commerciale")
+        print("   Sede: Guidonia (RM) - 6 impianti produttivi in Italia")
+        print("="*80)
+
+        print(f"\n CONFIGURAZIONE GRUPPO DEL PESCE:")
+        print(f"\n    AVANNOTTERIA (Riproduzione):")
+        print(f"      - Vasche larvali piccole (2-5mc): {config.vasche_larvali_piccole}")
+        print(f"      - Vasche larvali medie (10mc): {config.vasche_larvali_medie}")
+        print(f"      - Vasche larvali grandi (20mc): {config.vasche_larvali_grandi}")
+        print(f"      - Vasche preingrasso (40mc): {config.vasche_preingrasso}")
+
+        print(f"\n    IMPIANTI PRODUTTIVI:")
+        print(f"      - Numero impianti: {config.numero_impianti}")
+        print(f"      - Gabbie per impianto: {config.gabbie_per_impianto}")
+        print(f"      - Volume gabbia: {config.volume_gabbia} mc")
+        print(f"      - Impianto terra Orbetello: {config.vasche_terra_orbetello} vasche da {config.volume_vasca_terra} mc")
+
+        print(f"\n    CAPACITÀ E PARAMETRI:")
+        print(f"      - Capacità produttiva annua: {config.capacita_produttiva_annua:,} tonnellate/anno")
+        print(f"      - Sopravvivenza larvale: {config.tasso_sopravvivenza_larvale*100}%")
+        print(f"      - Sopravvivenza preingrasso: {config.tasso_sopravvivenza_preingrasso*100}%")
+        print(f"      - Sopravvivenza ingrasso: {config.tasso_sopravvivenza_ingrasso*100}%")
+        print(f"      - Efficienza operativa: {config.efficienza_operativa*100}%")
 
     # Genera lotti casuali
-    print("\n Generazione lotti di produzione...")
+    if leggibile:
+        print("\n Generazione lotti di produzione...")
     lotti = genera_lotti_casuali(specie_ittiche, min_larve=1000000, max_larve=2500000)
 
-    print("\n Lotti generati:")
-    for lotto in lotti:
-        print(f"   - {lotto.specie.nome}")
-        print(f"     Larve da seminare: {lotto.numero_larve:,} larve")
-        print(f"     Densità larvale: {lotto.specie.densita_semina_larvale} larve/litro")
-        print(f"     Taglia commerciale target: {lotto.specie.taglia_commerciale}g")
+    if leggibile:
+        scrivi_lotti(lotti, modalita)
 
     # SIMULAZIONE 1: Sequenziale
-    risultati_seq = sequenza_produzione_completa_sequenziale(lotti, config)
+    risultati_seq = motore_simulazione.sequenziale(lotti, config)
     # SIMULAZIONE 2: Sovrapposta (più efficiente)
-    risultati_sov = sequenza_produzione_integrata_sovrapposta(lotti, config)
+    risultati_sov = motore_simulazione.sovrapposto(lotti, config)
 
     # GENERA REPORT GRAFICO
     report_generator = ReportGeneratorGruppoDelPesce(config)
@@ -314,7 +291,26 @@ def main():
         nome_file="report_produzione.png"
     )
 
+    # ARCHIVIA LE ESECUZIONI NELLO STORICO
+    if config.registra_storico:
+        with StoricoSimulazioni(config.percorso_storico or PERCORSO_PREDEFINITO) as storico:
+            storico.registra_esecuzione(risultati_seq, 'sequenziale', config, specie_ittiche,
+                                        motore_simulazione.nome, file_png)
+            storico.registra_esecuzione(risultati_sov, 'sovrapposto', config, specie_ittiche,
+                                        motore_simulazione.nome, file_png, risultati_tonnellate=risultati_seq)
+
+    if not leggibile:
+        scrivi_risultati(risultati_seq, modalita)
+        scrivi_risultati(risultati_sov, modalita, intestazione_csv=False)
+        return
+
+    if modalita != 'completo':
+        scrivi_risultati(risultati_seq, modalita)
+        scrivi_risultati(risultati_sov, modalita)
+
     print(f" Report generato: {file_png}")
+    if config.registra_storico:
+        print(f" Esecuzioni registrate nello storico: {storico.percorso}")
 
     # Confronto finale
     print("\n" + "="*80)
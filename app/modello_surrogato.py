@@ -0,0 +1,386 @@
+"""
+MODELLO SURROGATO - GRUPPO DEL PESCE
+Regressione polinomiale addestrata su simulazioni reali nello spazio dei
+parametri di configurazione e del mix di specie, per rispondere in pochi
+microsecondi a domande what-if su tempo totale, tonnellate e raggiungimento
+del target, con stima dell'errore e ricorso automatico al motore reale
+"""
+import copy
+import itertools
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.motori_simulazione import simula
+from data_model.lotto_produzione_model import LottoProduzione
+from data_model.specie_ittica_model import SpecieIttica
+from utils.configurazione import ConfigurazioneGruppoDelPesce
+
+USCITE = ('tempo_totale', 'tonnellate', 'raggiungimento_target')
+
+# Uscite stimate per regressione: il tempo totale è calcolato esattamente dalla
+# rotazione dei lotti e il raggiungimento del target ne deriva
+USCITE_REGRESSIONE = ('tonnellate',)
+
+# Parametri di ConfigurazioneGruppoDelPesce (più le larve per lotto) e intervalli di addestramento predefiniti.
+# Il dominio copre solo tassi, efficienza, target e taglia dei lotti: vasche e gabbie
+# non influiscono su tempo totale, tonnellate e target, per cui restano quelle della
+# configurazione base e una domanda su di esse solleva KeyError
+DOMINIO_PREDEFINITO = {
+    'tasso_sopravvivenza_larvale': (0.4, 0.95),
+    'tasso_sopravvivenza_preingrasso': (0.6, 1.0),
+    'tasso_sopravvivenza_ingrasso': (0.7, 1.0),
+    'efficienza_operativa': (0.5, 1.0),
+    'capacita_produttiva_annua': (1000, 10000),
+    'larve_per_lotto': (500_000, 5_000_000)
+}
+LOTTI_PER_SPECIE_PREDEFINITI = (1, 10)
+
+# Numero di deviazioni standard dell'insieme bootstrap sommate all'errore di validazione
+FATTORE_DISPERSIONE = 3.0
+
+
+def nome_parametro_lotti(indice_specie: int) -> str:
+    """Nome del parametro con il numero di lotti della specie indicata"""
+    return f"lotti_specie_{indice_specie}"
+
+
+def lotti_scenario(specie_disponibili: List[SpecieIttica], lotti_per_specie: Sequence[int],
+                   larve_per_lotto: int) -> List[LottoProduzione]:
+    """
+    Lotti di uno scenario: le specie si alternano a rotazione (come in
+    genera_lotti_casuali) finché ciascuna ha il suo numero di lotti, tutti
+    con lo stesso numero di larve.
+    """
+    lotti = []
+    for giro in range(max(lotti_per_specie, default=0)):
+        for specie, numero in zip(specie_disponibili, lotti_per_specie):
+            if giro < numero:
+                lotti.append(LottoProduzione(specie, larve_per_lotto))
+    return lotti
+
+
+def valuta_scenario(specie_disponibili: List[SpecieIttica], config: ConfigurazioneGruppoDelPesce,
+                    valori: Dict[str, float], motore: Optional[str] = None) -> Dict[str, float]:
+    """
+    Esegue la simulazione reale (metodo sovrapposto) di uno scenario: i
+    valori dei parametri sostituiscono quelli della configurazione, i
+    parametri lotti_specie_<i> e larve_per_lotto definiscono i lotti.
+    Tonnellate e raggiungimento del target sono calcolati come in main()
+    (le tonnellate dei due metodi coincidono lotto per lotto).
+    """
+    config = copy.copy(config)
+    for nome, valore in valori.items():
+        if hasattr(config, nome):
+            setattr(config, nome, valore)
+    lotti_per_specie = [int(valori[nome_parametro_lotti(i)]) for i in range(len(specie_disponibili))]
+    lotti = lotti_scenario(specie_disponibili, lotti_per_specie, int(valori['larve_per_lotto']))
+
+    risultati = simula(lotti, config, 'sovrapposto', motore)
+    tonnellate = sum(d['tonnellate_prodotte'] for d in risultati['dettagli'])
+    tempo_totale = risultati['tempo_totale']
+    produzione_annua = tonnellate * 365 / tempo_totale if tempo_totale else 0.0
+    return {
+        'tempo_totale': tempo_totale,
+        'tonnellate': tonnellate,
+        'raggiungimento_target': produzione_annua / config.capacita_produttiva_annua * 100
+    }
+
+
+def tempo_totale_rotazione(giorni_larvali: np.ndarray, giorni_totali: np.ndarray,
+                           lotti_per_specie: np.ndarray) -> np.ndarray:
+    """
+    Tempo totale esatto del metodo sovrapposto per i lotti di lotti_scenario,
+    in forma chiusa e vettoriale su più righe di lotti_per_specie (righe x
+    specie). Ogni lotto inizia alla fine della fase larvale del precedente,
+    per cui l'ultimo lotto della specie s inizia dopo le fasi larvali dei
+    lotti che lo precedono nella rotazione: min(lotti_t, lotti_s - 1) lotti
+    delle specie t che seguono s e min(lotti_t, lotti_s) di quelle che la
+    precedono. Il tempo totale è la fine più tarda tra gli ultimi lotti di
+    ciascuna specie; dipende solo dal numero di lotti, non dalle larve.
+    """
+    lotti = np.atleast_2d(np.asarray(lotti_per_specie, dtype=np.int64))
+    numero_specie = lotti.shape[1]
+    precede = np.tri(numero_specie, k=-1, dtype=np.int64)  # precede[s, t] = 1 se t < s
+    lotti_prima = np.minimum(lotti[:, None, :], lotti[:, :, None] - 1 + precede)
+    inizio_ultimo = (np.maximum(lotti_prima, 0) * np.asarray(giorni_larvali, dtype=np.int64)).sum(axis=2)
+    fine_ultimo = np.where(lotti > 0, inizio_ultimo + np.asarray(giorni_totali, dtype=np.int64), 0)
+    return fine_ultimo.max(axis=1, initial=0)
+
+
+def indici_monomi(numero_parametri: int, grado: int) -> np.ndarray:
+    """
+    Indici dei fattori di tutti i monomi di grado al più `grado`: una riga
+    per fattore, con 0 per la colonna costante e i + 1 per il parametro i.
+    """
+    return np.array(list(itertools.combinations_with_replacement(range(numero_parametri + 1), grado))).T
+
+
+def _termini_polinomiali(z: np.ndarray, indici: np.ndarray) -> np.ndarray:
+    """Matrice dei monomi (righe di z x monomi) dati gli indici dei fattori"""
+    z1 = np.empty((len(z), z.shape[1] + 1))
+    z1[:, 0] = 1.0
+    z1[:, 1:] = z
+    return z1[:, indici].prod(axis=1)
+
+
+def _percorso_npz(percorso: str) -> Path:
+    """Percorso del file del modello, con l'estensione .npz aggiunta se manca"""
+    percorso = Path(percorso)
+    return percorso if percorso.suffix == '.npz' else percorso.with_name(percorso.name + '.npz')
+
+
+class ModelloSurrogato:
+    """
+    Regressione polinomiale (cubica di default, con tutte le interazioni)
+    sui parametri normalizzati in [-1, 1], in scala logaritmica per i
+    parametri positivi, che stima il logaritmo delle tonnellate: sono
+    prodotti di tassi e quantità, per cui in scala logaritmica sono quasi
+    polinomi di grado basso. Il tempo totale è invece una funzione a gradini
+    del numero di lotti di ciascuna specie ed è calcolato esattamente
+    (tempo_totale_rotazione); il raggiungimento del target è ricavato da
+    tonnellate stimate e tempo esatto, con lo stesso errore relativo delle
+    tonnellate. Un insieme di modelli bootstrap fornisce la dispersione
+    locale; l'errore stimato di una previsione è il 99° percentile
+    dell'errore su un insieme di validazione più FATTORE_DISPERSIONE volte
+    la dispersione, espresso come errore relativo. Specie, configurazione base e dominio sono
+    salvati insieme ai coefficienti, così un modello caricato da file può
+    ricorrere da solo al motore reale.
+    """
+
+    def __init__(self, parametri: List[str], limiti: np.ndarray, interi: np.ndarray, coefficienti: np.ndarray,
+                 errore_validazione: np.ndarray, specie: List[SpecieIttica], config_base: Dict,
+                 valori_base: Dict[str, float], motore: Optional[str] = None, grado: int = 3):
+        self.parametri = list(parametri)
+        self.limiti = np.asarray(limiti, dtype=np.float64)
+        self.interi = np.asarray(interi, dtype=bool)
+        self.coefficienti = np.asarray(coefficienti, dtype=np.float64)  # (termini, modelli x USCITE_REGRESSIONE)
+        self.errore_validazione = np.asarray(errore_validazione, dtype=np.float64)  # log, per USCITE_REGRESSIONE
+        self.specie = specie
+        self.config_base = config_base
+        self.valori_base = valori_base
+        self.motore = motore
+        self.grado = grado
+        self._monomi = indici_monomi(len(self.parametri), grado)
+
+        self._colonne_log = np.flatnonzero(self.limiti[:, 0] > 0)
+        trasformati = self.limiti.copy()
+        trasformati[self._colonne_log] = np.log(trasformati[self._colonne_log])
+        self._centro = trasformati.mean(axis=1)
+        self._semiampiezza = np.maximum((trasformati[:, 1] - trasformati[:, 0]) / 2, 1e-12)
+        self._indice = {nome: i for i, nome in enumerate(self.parametri)}
+        self._vettore_base = np.array([valori_base[nome] for nome in self.parametri], dtype=np.float64)
+
+        # Dati del calcolo esatto del tempo totale
+        self._colonne_lotti = [self._indice[nome_parametro_lotti(i)] for i in range(len(self.specie))]
+        self._giorni_larvali = np.array([s.giorni_fase_larvale for s in self.specie], dtype=np.int64)
+        self._giorni_totali = np.array([s.giorni_fase_larvale + s.giorni_preingrasso + s.giorni_ingrasso
+                                        for s in self.specie], dtype=np.int64)
+        self._colonna_target = self._indice.get('capacita_produttiva_annua')
+        self._tempi_calcolati: Dict[Tuple[int, ...], np.ndarray] = {}
+
+    # ------------------------------------------------------------------
+    # Addestramento
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def addestra(cls, specie_disponibili: List[SpecieIttica], config: ConfigurazioneGruppoDelPesce,
+                 dominio: Optional[Dict[str, Tuple[float, float]]] = None,
+                 lotti_per_specie: Tuple[int, int] = LOTTI_PER_SPECIE_PREDEFINITI,
+                 campioni: int = 4000, frazione_validazione: float = 0.2, modelli_bootstrap: int = 8,
+                 grado: int = 3, motore: Optional[str] = 'vettoriale',
+                 seed: Optional[int] = None) -> 'ModelloSurrogato':
+        """
+        Campiona il dominio con un Latin hypercube (in scala logaritmica per
+        i parametri positivi), esegue la simulazione reale di ogni campione,
+        addestra il modello sulla parte di addestramento e ne misura
+        l'errore sulla parte di validazione. `dominio` associa ai parametri
+        di configurazione (nomi degli attributi di
+        ConfigurazioneGruppoDelPesce) e a larve_per_lotto l'intervallo da
+        esplorare; il numero di lotti di ogni specie varia in
+        `lotti_per_specie`. I parametri con estremi interi restano interi; i
+        valori base (usati per i parametri non indicati nelle domande) sono
+        quelli della configurazione o, se assenti, il centro dell'intervallo.
+        """
+        dominio = dict(dominio or DOMINIO_PREDEFINITO)
+        for i in range(len(specie_disponibili)):
+            dominio.setdefault(nome_parametro_lotti(i), lotti_per_specie)
+        parametri = list(dominio)
+        limiti = np.array([dominio[nome] for nome in parametri], dtype=np.float64)
+
+        interi = np.array([isinstance(basso, int) and isinstance(alto, int) for basso, alto in dominio.values()])
+        valori_base = {}
+        for (nome, (basso, alto)), intero in zip(dominio.items(), interi):
+            valore = getattr(config, nome, None)
+            if valore is None:
+                valore = (basso + alto) / 2
+            valori_base[nome] = int(round(valore)) if intero else float(valore)
+
+        modello = cls(parametri, limiti, interi, np.zeros((1, 1)), np.zeros(len(USCITE_REGRESSIONE)),
+                      list(specie_disponibili), dict(vars(config)), valori_base, motore, grado)
+
+        # Latin hypercube nello spazio normalizzato
+        rng = np.random.default_rng(seed)
+        strati = np.stack([rng.permutation(campioni) for _ in parametri], axis=1)
+        z = (strati + rng.random((campioni, len(parametri)))) / campioni * 2 - 1
+        x = modello._da_normalizzati(z)
+
+        y = np.array([[valutazione[uscita] for uscita in USCITE_REGRESSIONE]
+                      for valutazione in (modello._valuta_reale(riga) for riga in x)])
+        log_y = np.log(np.maximum(y, 1e-12))
+
+        validazione = max(int(campioni * frazione_validazione), 1)
+        ordine = rng.permutation(campioni)
+        indici_validazione, indici_addestramento = ordine[:validazione], ordine[validazione:]
+        termini = _termini_polinomiali(modello._normalizza(x), modello._monomi)
+
+        coefficienti = []
+        for b in range(modelli_bootstrap):
+            righe = indici_addestramento if b == 0 else rng.choice(indici_addestramento, len(indici_addestramento))
+            soluzione, *_ = np.linalg.lstsq(termini[righe], log_y[righe], rcond=None)
+            coefficienti.append(soluzione)
+        modello.coefficienti = np.concatenate(coefficienti, axis=1)
+
+        previsione = termini[indici_validazione] @ modello.coefficienti
+        media = previsione.reshape(validazione, modelli_bootstrap, len(USCITE_REGRESSIONE)).mean(axis=1)
+        modello.errore_validazione = np.quantile(np.abs(media - log_y[indici_validazione]), 0.99, axis=0)
+        return modello
+
+    def _valuta_reale(self, riga: np.ndarray) -> Dict[str, float]:
+        valori = {nome: (int(v) if intero else float(v)) for nome, v, intero in zip(self.parametri, riga, self.interi)}
+        config = ConfigurazioneGruppoDelPesce()
+        for nome, valore in self.config_base.items():
+            setattr(config, nome, valore)
+        return valuta_scenario(self.specie, config, valori, self.motore)
+
+    # ------------------------------------------------------------------
+    # Trasformazioni
+    # ------------------------------------------------------------------
+
+    def _normalizza(self, x: np.ndarray) -> np.ndarray:
+        trasformati = np.array(x, dtype=np.float64, ndmin=2)
+        trasformati[:, self._colonne_log] = np.log(np.maximum(trasformati[:, self._colonne_log], 1e-300))
+        return (trasformati - self._centro) / self._semiampiezza
+
+    def _da_normalizzati(self, z: np.ndarray) -> np.ndarray:
+        x = self._centro + z * self._semiampiezza
+        x[..., self._colonne_log] = np.exp(x[..., self._colonne_log])
+        x = np.where(self.interi, np.rint(x), x)
+        return np.clip(x, self.limiti[:, 0], self.limiti[:, 1])
+
+    def vettore(self, valori: Dict[str, float]) -> np.ndarray:
+        """Vettore dei parametri: i valori indicati sostituiscono quelli base"""
+        x = self._vettore_base.copy()
+        for nome, valore in valori.items():
+            if nome not in self._indice:
+                raise KeyError(f"Parametro non presente nel modello surrogato: {nome!r}")
+            x[self._indice[nome]] = valore
+        return x
+
+    # ------------------------------------------------------------------
+    # Interrogazione
+    # ------------------------------------------------------------------
+
+    def nel_dominio(self, x: np.ndarray) -> np.ndarray:
+        """True per le righe interne all'intervallo di addestramento"""
+        x = np.atleast_2d(x)
+        return ((x >= self.limiti[:, 0]) & (x <= self.limiti[:, 1])).all(axis=1)
+
+    def predici(self, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Previsioni vettoriali per righe di parametri (nell'ordine di
+        self.parametri): restituisce uscite ed errore relativo stimato, due
+        matrici righe x USCITE. Il tempo totale è esatto (errore 0).
+        """
+        x = np.atleast_2d(np.asarray(x, dtype=np.float64))
+        previsione = (_termini_polinomiali(self._normalizza(x), self._monomi) @ self.coefficienti).reshape(
+            len(x), -1, len(USCITE_REGRESSIONE))
+        media = previsione.mean(axis=1)
+        dispersione = np.sqrt(((previsione - media[:, None]) ** 2).mean(axis=1))
+        errore_tonnellate = np.expm1(self.errore_validazione + FATTORE_DISPERSIONE * dispersione)[:, 0]
+        tonnellate = np.exp(media[:, 0])
+
+        tempo_totale = self._tempo_totale(np.rint(x[:, self._colonne_lotti]).astype(np.int64))
+        target = (x[:, self._colonna_target] if self._colonna_target is not None
+                  else self.config_base['capacita_produttiva_annua'])
+
+        uscite = np.empty((len(x), len(USCITE)))
+        uscite[:, 0] = tempo_totale
+        uscite[:, 1] = tonnellate
+        uscite[:, 2] = 0.0
+        np.divide(tonnellate * 365 * 100, tempo_totale * target, out=uscite[:, 2], where=tempo_totale > 0)
+        errore = np.zeros((len(x), len(USCITE)))
+        errore[:, 1] = errore[:, 2] = errore_tonnellate
+        return uscite, errore
+
+    def _tempo_totale(self, lotti_per_specie: np.ndarray) -> np.ndarray:
+        """
+        Tempo totale esatto per righe di numeri di lotti; le singole domande
+        sono memorizzate per combinazione di lotti (poche, perché intere).
+        """
+        if len(lotti_per_specie) != 1:
+            return tempo_totale_rotazione(self._giorni_larvali, self._giorni_totali, lotti_per_specie)
+        chiave = tuple(lotti_per_specie[0].tolist())
+        tempo = self._tempi_calcolati.get(chiave)
+        if tempo is None:
+            tempo = self._tempi_calcolati[chiave] = tempo_totale_rotazione(
+                self._giorni_larvali, self._giorni_totali, lotti_per_specie)
+        return tempo
+
+    def interroga(self, valori: Dict[str, float], tolleranza_relativa: float = 0.05,
+                  usa_simulazione: bool = True) -> Dict:
+        """
+        Risponde a una domanda what-if. Se il punto è fuori dal dominio di
+        addestramento o l'errore stimato di una uscita supera la tolleranza
+        (e usa_simulazione è vero) esegue la simulazione reale. Restituisce
+        le uscite, l'errore relativo stimato (0 per la simulazione) e la
+        fonte ('surrogato' o 'simulazione').
+        """
+        x = self.vettore(valori)
+        uscite, errore = self.predici(x)
+        affidabile = bool(self.nel_dominio(x)[0]) and bool((errore[0] <= tolleranza_relativa).all())
+        if affidabile or not usa_simulazione:
+            risposta = dict(zip(USCITE, uscite[0].tolist()))
+            risposta['errore_relativo'] = dict(zip(USCITE, errore[0].tolist()))
+            risposta['fonte'] = 'surrogato'
+            return risposta
+
+        risposta = self._valuta_reale(np.where(self.interi, np.rint(x), x))
+        risposta['errore_relativo'] = dict.fromkeys(USCITE, 0.0)
+        risposta['fonte'] = 'simulazione'
+        return risposta
+
+    # ------------------------------------------------------------------
+    # Serializzazione
+    # ------------------------------------------------------------------
+
+    def salva(self, percorso: str):
+        """
+        Salva il modello in un file .npz: coefficienti e dominio come array,
+        specie, configurazione base e valori base come JSON. L'estensione
+        .npz è aggiunta se manca, come fa np.savez.
+        """
+        metadati = {
+            'parametri': self.parametri,
+            'specie': [vars(s) for s in self.specie],
+            'config_base': self.config_base,
+            'valori_base': self.valori_base,
+            'motore': self.motore,
+            'grado': self.grado
+        }
+        np.savez(_percorso_npz(percorso), limiti=self.limiti, interi=self.interi, coefficienti=self.coefficienti,
+                 errore_validazione=self.errore_validazione, metadati=np.array(json.dumps(metadati)))
+
+    @classmethod
+    def carica(cls, percorso: str) -> 'ModelloSurrogato':
+        """
+        Carica un modello salvato con salva, dallo stesso percorso (con o
+        senza estensione .npz).
+        """
+        with np.load(_percorso_npz(percorso), allow_pickle=False) as dati:
+            metadati = json.loads(str(dati['metadati']))
+            return cls(metadati['parametri'], dati['limiti'], dati['interi'], dati['coefficienti'],
+                       dati['errore_validazione'], [SpecieIttica(**s) for s in metadati['specie']],
+                       metadati['config_base'], metadati['valori_base'], metadati['motore'], metadati['grado'])
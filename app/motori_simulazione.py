@@ -0,0 +1,191 @@
+"""
+MOTORI DI SIMULAZIONE - GRUPPO DEL PESCE
+Registro dei motori (backend) che eseguono le sequenze produttive: il motore
+di riferimento di app/main.py e le varianti vettoriale, a blocchi e parallela,
+selezionabili per nome da main() e da simula()
+"""
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.main import sequenza_produzione_completa_sequenziale, sequenza_produzione_integrata_sovrapposta
+from data_model.lotto_produzione_model import LottoProduzione
+from utils.array_lotti import calcola_quantita_lotti, lotti_in_array, pianifica_sovrapposta
+from utils.configurazione import ConfigurazioneGruppoDelPesce
+from utils.memoria_condivisa import calcola_lotti_in_parallelo
+
+METODI = ('sequenziale', 'sovrapposto')
+
+# Nomi dei metodi nei risultati, identici a quelli delle sequenze di riferimento
+NOMI_METODI = {
+    'sequenziale': 'Sequenziale (dalla nascita alla taglia commerciale)',
+    'sovrapposto': 'Integrata Sovrapposta (gestione multi-lotto simultanea)'
+}
+
+DIMENSIONE_BLOCCO = 50_000  # lotti per blocco del motore a blocchi
+
+Sequenza = Callable[[List[LottoProduzione], ConfigurazioneGruppoDelPesce], Dict]
+
+
+@dataclass(frozen=True)
+class MotoreSimulazione:
+    """Backend registrato: una funzione per ciascun metodo produttivo"""
+    nome: str
+    sequenziale: Sequenza
+    sovrapposto: Sequenza
+    descrizione: str = ""
+
+
+MOTORI: Dict[str, MotoreSimulazione] = {}
+
+
+def registra_motore(nome: str, sequenziale: Sequenza, sovrapposto: Sequenza, descrizione: str = "") -> MotoreSimulazione:
+    """
+    Registra (o sostituisce) un motore con le funzioni dei due metodi, che
+    devono avere la firma delle sequenze di app/main.py e restituire
+    risultati identici a quelli del motore di riferimento.
+    """
+    motore = MotoreSimulazione(nome, sequenziale, sovrapposto, descrizione)
+    MOTORI[nome] = motore
+    return motore
+
+
+def ottieni_motore(nome: str) -> MotoreSimulazione:
+    if nome not in MOTORI:
+        raise ValueError(f"Motore di simulazione non valido: {nome!r} (ammessi: {', '.join(MOTORI)})")
+    return MOTORI[nome]
+
+
+def simula(lotti: List[LottoProduzione], config: ConfigurazioneGruppoDelPesce, metodo: str = 'sovrapposto',
+           motore: Optional[str] = None) -> Dict:
+    """
+    Esegue il metodo indicato con il motore scelto (di default quello della
+    configurazione, MOTORE_SIMULAZIONE).
+    """
+    if metodo not in METODI:
+        raise ValueError(f"Metodo non valido: {metodo!r} (ammessi: {', '.join(METODI)})")
+    return getattr(ottieni_motore(motore or config.motore_simulazione), metodo)(lotti, config)
+
+
+# ============================================================================
+# COMPOSIZIONE DEI RISULTATI DAGLI ARRAY
+# ============================================================================
+
+def _componi_dettagli(lotti: List[LottoProduzione], numero_larve: np.ndarray, giorni: Dict[str, np.ndarray],
+                      quantita: Dict[str, np.ndarray], piano: Optional[Dict[str, np.ndarray]]) -> List[Dict]:
+    """
+    Costruisce i dettagli per lotto con gli stessi campi, lo stesso ordine e
+    gli stessi tipi Python delle sequenze di riferimento. Gli arrotondamenti
+    usano round() di Python, che su alcuni valori differisce da np.round.
+    """
+    colonne = {**giorni, **quantita, **(piano or {}), 'larve_seminate': numero_larve}
+    if piano is None:
+        colonne['giorni_totali'] = giorni['giorni_larvali'] + giorni['giorni_preingrasso'] + giorni['giorni_ingrasso']
+        campi_tempo = ('giorni_larvali', 'giorni_preingrasso', 'giorni_ingrasso', 'giorni_totali')
+    else:
+        campi_tempo = ('inizio_giorno', 'fine_larvale_giorno', 'fine_preingrasso_giorno', 'fine_ingrasso_giorno',
+                       'giorni_larvali', 'giorni_preingrasso', 'giorni_ingrasso')
+    campi = (('larve_seminate', 'vasche_larvali', 'vasche_preingrasso', 'gabbie_ingrasso') + campi_tempo
+             + ('larve_sopravvissute', 'avannotti_2g', 'pesci_commerciali'))
+
+    valori = [[lotto.specie.nome for lotto in lotti]]
+    valori += [colonne[campo].tolist() for campo in campi]
+    valori.append([round(t, 2) for t in quantita['tonnellate_prodotte'].tolist()])
+    valori.append([round(t, 1) for t in (quantita['pesci_commerciali'] / numero_larve * 100).tolist()])
+    chiavi = ('specie',) + campi + ('tonnellate_prodotte', 'tasso_sopravvivenza_totale')
+    return [dict(zip(chiavi, riga)) for riga in zip(*valori)]
+
+
+def _giorni_fasi(indice_specie: np.ndarray, array_specie: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    return {
+        'giorni_larvali': array_specie['giorni_fase_larvale'][indice_specie],
+        'giorni_preingrasso': array_specie['giorni_preingrasso'][indice_specie],
+        'giorni_ingrasso': array_specie['giorni_ingrasso'][indice_specie]
+    }
+
+
+def _simula_da_array(metodo: str, lotti: List[LottoProduzione], array_lotti: Dict[str, np.ndarray],
+                     array_specie: Dict[str, np.ndarray], quantita: Dict[str, np.ndarray], offset_inizio: int = 0) -> Dict:
+    """
+    Compone i risultati di un metodo a partire dalle quantità per lotto già
+    calcolate. Per il sovrapposto gli inizi sono traslati di `offset_inizio`
+    (fine della fase larvale dell'ultimo lotto del blocco precedente).
+    """
+    indice_specie = array_lotti['indice_specie']
+    giorni = _giorni_fasi(indice_specie, array_specie)
+    if metodo == 'sequenziale':
+        dettagli = _componi_dettagli(lotti, array_lotti['numero_larve'], giorni, quantita, None)
+        tempo_totale = sum(d['giorni_totali'] for d in dettagli)
+    else:
+        piano = {campo: valori + offset_inizio for campo, valori in pianifica_sovrapposta(indice_specie, array_specie).items()}
+        dettagli = _componi_dettagli(lotti, array_lotti['numero_larve'], giorni, quantita, piano)
+        tempo_totale = int(piano['fine_ingrasso_giorno'].max()) if len(lotti) else 0
+    return {'metodo': NOMI_METODI[metodo], 'dettagli': dettagli, 'tempo_totale': tempo_totale}
+
+
+# ============================================================================
+# MOTORI
+# ============================================================================
+
+def _vettoriale(metodo: str) -> Sequenza:
+    """
+    Motore vettoriale: tutti i lotti convertiti in array e calcolati in una
+    sola passata NumPy (calcola_quantita_lotti, pianifica_sovrapposta).
+    """
+    def sequenza(lotti: List[LottoProduzione], config: ConfigurazioneGruppoDelPesce) -> Dict:
+        array_lotti, array_specie, _ = lotti_in_array(lotti)
+        quantita = calcola_quantita_lotti(array_lotti['indice_specie'], array_lotti['numero_larve'], array_specie, config)
+        return _simula_da_array(metodo, lotti, array_lotti, array_specie, quantita)
+    return sequenza
+
+
+def _a_blocchi(metodo: str, dimensione_blocco: int = DIMENSIONE_BLOCCO) -> Sequenza:
+    """
+    Motore a blocchi: i lotti sono elaborati in blocchi di dimensione fissa,
+    così gli array temporanei restano limitati anche con milioni di lotti.
+    Tra un blocco e l'altro viaggiano solo il tempo accumulato (sequenziale)
+    o la fine della fase larvale dell'ultimo lotto e il tempo massimo
+    (sovrapposto), come nei cicli delle sequenze di riferimento.
+    """
+    def sequenza(lotti: List[LottoProduzione], config: ConfigurazioneGruppoDelPesce) -> Dict:
+        dettagli = []
+        tempo_totale = 0
+        offset_inizio = 0
+        for inizio in range(0, len(lotti), dimensione_blocco):
+            blocco = lotti[inizio:inizio + dimensione_blocco]
+            array_lotti, array_specie, _ = lotti_in_array(blocco)
+            quantita = calcola_quantita_lotti(array_lotti['indice_specie'], array_lotti['numero_larve'], array_specie, config)
+            parziale = _simula_da_array(metodo, blocco, array_lotti, array_specie, quantita, offset_inizio)
+            dettagli.extend(parziale['dettagli'])
+            if metodo == 'sequenziale':
+                tempo_totale += parziale['tempo_totale']
+            else:
+                tempo_totale = max(tempo_totale, parziale['tempo_totale'])
+                offset_inizio = parziale['dettagli'][-1]['fine_larvale_giorno']
+        return {'metodo': NOMI_METODI[metodo], 'dettagli': dettagli, 'tempo_totale': tempo_totale}
+    return sequenza
+
+
+def _parallelo(metodo: str) -> Sequenza:
+    """
+    Motore parallelo: le quantità per lotto sono calcolate da un pool di
+    processi su memoria condivisa (calcola_lotti_in_parallelo); pianificazione
+    e composizione dei risultati restano nel processo principale.
+    """
+    def sequenza(lotti: List[LottoProduzione], config: ConfigurazioneGruppoDelPesce) -> Dict:
+        array_lotti, array_specie, _ = lotti_in_array(lotti)
+        quantita = calcola_lotti_in_parallelo(lotti, config) if lotti else \
+            calcola_quantita_lotti(array_lotti['indice_specie'], array_lotti['numero_larve'], array_specie, config)
+        return _simula_da_array(metodo, lotti, array_lotti, array_specie, quantita)
+    return sequenza
+
+
+registra_motore('riferimento', sequenza_produzione_completa_sequenziale, sequenza_produzione_integrata_sovrapposta,
+                "Sequenze Python di app/main.py, un lotto alla volta")
+registra_motore('vettoriale', _vettoriale('sequenziale'), _vettoriale('sovrapposto'),
+                "Calcolo NumPy di tutti i lotti in una passata")
+registra_motore('a_blocchi', _a_blocchi('sequenziale'), _a_blocchi('sovrapposto'),
+                f"Calcolo NumPy a blocchi di {DIMENSIONE_BLOCCO:,} lotti, memoria limitata")
+registra_motore('parallelo', _parallelo('sequenziale'), _parallelo('sovrapposto'),
+                "Pool di processi su memoria condivisa")
@@ -2,14 +2,67 @@
 GENERATORE DI REPORT GRAFICI - GRUPPO DEL PESCE
 Classe per generare report visivi con grafici e tabelle in formato PNG
 """
+import itertools
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
+from matplotlib.figure import Figure
 from matplotlib.gridspec import GridSpec
 import numpy as np
-from typing import Dict, List
+from typing import Dict, Iterable, List, Tuple
 from datetime import datetime
 
+from utils.occupazione_risorse import calcola_occupazione_risorse
+
+
+_STILE_CONFIGURATO = False
+
+
+def _configura_stile():
+    """
+    Imposta una sola volta per processo lo stile matplotlib del report (font,
+    dimensioni testo, spessori) e disabilita i warning relativi ai glifi
+    mancanti. Le chiamate successive non toccano più plt.rcParams.
+    """
+    global _STILE_CONFIGURATO
+    if _STILE_CONFIGURATO:
+        return
+
+    plt.style.use('default')
+    plt.rcParams['font.family'] = 'sans-serif'
+    plt.rcParams['font.sans-serif'] = ['Arial', 'Helvetica', 'DejaVu Sans']
+    plt.rcParams['font.size'] = 11
+    plt.rcParams['axes.labelsize'] = 12
+    plt.rcParams['axes.titlesize'] = 14
+    plt.rcParams['axes.titleweight'] = 'bold'
+    plt.rcParams['xtick.labelsize'] = 10
+    plt.rcParams['ytick.labelsize'] = 10
+    plt.rcParams['legend.fontsize'] = 10
+    plt.rcParams['figure.titlesize'] = 16
+    plt.rcParams['figure.titleweight'] = 'bold'
+
+    # Disabilita warning
+    import warnings
+    warnings.filterwarnings('ignore', category=UserWarning, module='matplotlib')
+
+    _STILE_CONFIGURATO = True
+
+
+# Generatore del processo worker, creato dall'initializer del pool di genera_report_batch
+_GENERATORE_WORKER = None
+
+
+def _inizializza_worker(config):
+    global _GENERATORE_WORKER
+    _GENERATORE_WORKER = ReportGeneratorGruppoDelPesce(config)
+
+
+def _rendi_scenario_worker(risultati_seq: Dict, risultati_sov: Dict, lotti: List, nome_file: str, dpi: int) -> str:
+    return _GENERATORE_WORKER._rendi_su_modello(risultati_seq, risultati_sov, lotti, nome_file, dpi)
+
 
 class ReportGeneratorGruppoDelPesce:
     """
@@ -19,9 +72,10 @@ class ReportGeneratorGruppoDelPesce:
     def __init__(self, config):
         """
         Inizializza il generatore di report configurando i colori per i grafici,
-        lo stile matplotlib (font, dimensioni testo, spessori), e disabilitando
-        i warning relativi ai glifi mancanti. Memorizza la configurazione
-        dell'impianto per calcoli successivi (es. capacità produttiva annua).
+        lo stile matplotlib (font, dimensioni testo, spessori, una sola volta per
+        processo), e disabilitando i warning relativi ai glifi mancanti. Memorizza
+        la configurazione dell'impianto per calcoli successivi (es. capacità
+        produttiva annua).
         """
         self.config = config
         self.colors = {
@@ -37,42 +91,89 @@ class ReportGeneratorGruppoDelPesce:
             'ombrina': '#059669'
         }
 
+        # Figura modello riutilizzata dai report batch: (figura, assi), fuori da pyplot
+        self._modello = None
+
         # Configura lo stile matplotlib
-        plt.style.use('default')
-        plt.rcParams['font.family'] = 'sans-serif'
-        plt.rcParams['font.sans-serif'] = ['Arial', 'Helvetica', 'DejaVu Sans']
-        plt.rcParams['font.size'] = 11
-        plt.rcParams['axes.labelsize'] = 12
-        plt.rcParams['axes.titlesize'] = 14
-        plt.rcParams['axes.titleweight'] = 'bold'
-        plt.rcParams['xtick.labelsize'] = 10
-        plt.rcParams['ytick.labelsize'] = 10
-        plt.rcParams['legend.fontsize'] = 10
-        plt.rcParams['figure.titlesize'] = 16
-        plt.rcParams['figure.titleweight'] = 'bold'
-
-        # Disabilita warning
-        import warnings
-        warnings.filterwarnings('ignore', category=UserWarning, module='matplotlib')
+        _configura_stile()
 
     def genera_report_completo(self, risultati_seq: Dict, risultati_sov: Dict, lotti: List, nome_file: str = None) -> str:
         """
-        Crea un report visivo completo in formato PNG con 7 sezioni:
+        Crea un report visivo completo in formato PNG con 8 sezioni:
         1) KPI globali (larve, pesci, tonnellate, sopravvivenza, risparmio)
         2) Confronto diretto tra metodo sequenziale e sovrapposto
         3) Dettagli metodo sequenziale con tempi per specie
         4) Dettagli metodo sovrapposto con timeline delle fasi
         5) Distribuzione produzione per specie (grafico a torta)
         6) Risorse utilizzate (vasche e gabbie per specie)
-        7) Tabella riepilogo comparativo con tutti i dati
+        7) Occupazione contemporanea delle risorse rispetto alla capacità
+        8) Tabella riepilogo comparativo con tutti i dati
         Salva il file nella cartella "report" e restituisce il percorso assoluto.
         """
         if nome_file is None:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             nome_file = f"report_gruppo_del_pesce_{timestamp}.png"
 
-        # Crea figura più grande con più spazio
-        fig = plt.figure(figsize=(24, 16))
+        fig, assi = self._crea_figura()
+        self._disegna_pannelli(assi, risultati_seq, risultati_sov, lotti)
+        file_path = self._salva_figura(fig, nome_file, dpi=300)
+
+        return file_path
+
+    def genera_report_batch(self, scenari: Iterable[Tuple[Dict, Dict, List]], nomi_file: Iterable[str] = None,
+                            processi: int = None, dpi: int = 300) -> List[str]:
+        """
+        Genera un report PNG per ciascuno scenario (risultati_seq, risultati_sov,
+        lotti). Ogni processo costruisce una sola volta figura, GridSpec, assi,
+        titolo e sottotitolo e li riutilizza per tutti gli scenari che gli
+        vengono assegnati; il contenuto dei pannelli invece viene cancellato e
+        ridisegnato per intero a ogni scenario. Lo stile matplotlib è configurato
+        una volta per processo. Con processi <= 1 gli scenari sono simulati (se
+        `scenari` è un generatore) e disegnati uno dopo l'altro nel processo
+        principale, senza sovrapposizione. Con processi > 1 il rendering è
+        distribuito su un pool di processi e il generatore viene consumato man
+        mano, così la simulazione dello scenario successivo avviene nel processo
+        principale mentre i worker disegnano quelli già pronti (al più 2
+        scenari in coda per processo).
+        I nomi dei file, se non indicati, sono report_scenario_0000.png, ...
+        Restituisce i percorsi assoluti nell'ordine degli scenari.
+        """
+        if nomi_file is None:
+            nomi_file = (f"report_scenario_{i:04d}.png" for i in itertools.count())
+        coppie = zip(scenari, nomi_file)
+
+        if processi is None:
+            processi = os.cpu_count() or 1
+
+        if processi <= 1:
+            try:
+                return [self._rendi_su_modello(seq, sov, lotti, nome, dpi) for (seq, sov, lotti), nome in coppie]
+            finally:
+                # La figura modello vive solo per la durata del batch
+                self._modello = None
+
+        percorsi = []
+        in_coda = deque()
+        with ProcessPoolExecutor(max_workers=processi, initializer=_inizializza_worker,
+                                 initargs=(self.config,)) as pool:
+            for (seq, sov, lotti), nome in coppie:
+                if len(in_coda) >= 2 * processi:
+                    percorsi.append(in_coda.popleft().result())
+                in_coda.append(pool.submit(_rendi_scenario_worker, seq, sov, lotti, nome, dpi))
+            while in_coda:
+                percorsi.append(in_coda.popleft().result())
+
+        return percorsi
+
+    def _crea_figura(self):
+        """
+        Crea la figura del report con titolo, sottotitolo, griglia 6x2 e gli otto
+        assi dei pannelli, nell'ordine in cui vengono disegnati.
+        """
+        # Crea figura più grande con più spazio. La figura è creata fuori da
+        # pyplot: non entra nel registro delle figure (non diventa la figura
+        # corrente) e viene liberata appena non è più referenziata
+        fig = Figure(figsize=(24, 19))
         fig.patch.set_facecolor('white')
 
         # Titolo principale
@@ -82,36 +183,57 @@ class ReportGeneratorGruppoDelPesce:
         fig.text(0.5, 0.945, 'Filiera integrata: dalla nascita alla taglia commerciale | Guidonia (RM)', ha='center', fontsize=13, style='italic', color='#4b5563')
 
         # Crea griglia con più spazio
-        gs = GridSpec(5, 2, figure=fig, hspace=0.5, wspace=0.35, left=0.06, right=0.94, top=0.92, bottom=0.05)
+        gs = GridSpec(6, 2, figure=fig, hspace=0.5, wspace=0.35, left=0.06, right=0.94, top=0.92, bottom=0.05)
+
+        assi = [
+            fig.add_subplot(gs[0, :]),   # 1. KPI GLOBALI (riga 1, colonne 1-2)
+            fig.add_subplot(gs[1, :]),   # 2. CONFRONTO DIRETTO (riga 2, colonne 1-2)
+            fig.add_subplot(gs[2, 0]),   # 3. DETTAGLI SEQUENZIALE (riga 3, colonna 1)
+            fig.add_subplot(gs[2, 1]),   # 4. DETTAGLI SOVRAPPOSTO (riga 3, colonna 2)
+            fig.add_subplot(gs[3, 0]),   # 5. DISTRIBUZIONE PRODUZIONE (riga 4, colonna 1)
+            fig.add_subplot(gs[3, 1]),   # 6. RISORSE UTILIZZATE (riga 4, colonna 2)
+            fig.add_subplot(gs[4, :]),   # 7. OCCUPAZIONE RISORSE (riga 5, colonne 1-2)
+            fig.add_subplot(gs[5, :])    # 8. TABELLA COMPARATIVA (riga 6, colonne 1-2)
+        ]
+        return fig, assi
 
-        # 1. KPI GLOBALI (riga 1, colonne 1-2)
-        ax1 = fig.add_subplot(gs[0, :])
+    def _disegna_pannelli(self, assi, risultati_seq: Dict, risultati_sov: Dict, lotti: List):
+        """
+        Disegna il contenuto degli otto pannelli del report sugli assi forniti.
+        """
+        ax1, ax2, ax3, ax4, ax5, ax6, ax7, ax8 = assi
         self._crea_kpi_globali(ax1, lotti, risultati_seq, risultati_sov)
-
-        # 2. CONFRONTO DIRETTO SEQUENZIALE VS SOVRAPPOSTO (riga 2, colonne 1-2)
-        ax2 = fig.add_subplot(gs[1, :])
         self._crea_confronto_principale(ax2, risultati_seq, risultati_sov)
-
-        # 3. DETTAGLI METODO SEQUENZIALE (riga 3, colonna 1)
-        ax3 = fig.add_subplot(gs[2, 0])
         self._crea_dettagli_sequenziale(ax3, risultati_seq)
-
-        # 4. DETTAGLI METODO SOVRAPPOSTO (riga 3, colonna 2)
-        ax4 = fig.add_subplot(gs[2, 1])
         self._crea_dettagli_sovrapposto(ax4, risultati_sov)
-
-        # 5. DISTRIBUZIONE PRODUZIONE (riga 4, colonna 1)
-        ax5 = fig.add_subplot(gs[3, 0])
         self._crea_distribuzione_specie(ax5, risultati_sov)
-
-        # 6. RISORSE UTILIZZATE (riga 4, colonna 2)
-        ax6 = fig.add_subplot(gs[3, 1])
         self._crea_grafico_risorse(ax6, risultati_sov)
+        self._crea_grafico_occupazione(ax7, risultati_sov)
+        self._crea_tabella_riepilogo(ax8, risultati_seq, risultati_sov)
 
-        # 7. TABELLA COMPARATIVA (riga 5, colonne 1-2)
-        ax7 = fig.add_subplot(gs[4, :])
-        self._crea_tabella_riepilogo(ax7, risultati_seq, risultati_sov)
+    def _rendi_su_modello(self, risultati_seq: Dict, risultati_sov: Dict, lotti: List, nome_file: str, dpi: int) -> str:
+        """
+        Disegna uno scenario sulla figura modello del generatore, creandola al
+        primo utilizzo. Figura, GridSpec, titolo e sottotitolo restano quelli
+        del modello, mentre ogni asse viene svuotato con ax.clear() e tutti i
+        pannelli sono ridisegnati da capo: barre, fette e righe della tabella
+        cambiano di numero da uno scenario all'altro, per cui gli artisti non
+        vengono riutilizzati. Restituisce il percorso del PNG salvato.
+        """
+        if self._modello is None:
+            self._modello = self._crea_figura()
+        fig, assi = self._modello
 
+        for ax in assi:
+            ax.clear()
+            ax.axis('on')
+        self._disegna_pannelli(assi, risultati_seq, risultati_sov, lotti)
+        return self._salva_figura(fig, nome_file, dpi=dpi)
+
+    def _salva_figura(self, fig, nome_file: str, dpi: int) -> str:
+        """
+        Salva la figura nella cartella "report" e restituisce il percorso assoluto.
+        """
         # --- Salva figura nella cartella "report" situata allo stesso livello di "app" ---
         # Cartella report: ../report relative al file current (app/report_generator.py)
         report_dir = Path(__file__).resolve().parent.parent / "report"
@@ -121,8 +243,7 @@ class ReportGeneratorGruppoDelPesce:
         nome_file = Path(nome_file).name
 
         file_path = report_dir / nome_file
-        plt.savefig(file_path, dpi=300, bbox_inches='tight', facecolor='white', edgecolor='none')
-        plt.close()
+        fig.savefig(file_path, dpi=dpi, bbox_inches='tight', facecolor='white', edgecolor='none')
 
         # Ritorna il percorso assoluto del file come stringa
         return str(file_path)
@@ -432,6 +553,41 @@ class ReportGeneratorGruppoDelPesce:
         ax.legend(fontsize=10, loc='upper left')
         ax.grid(axis='y', alpha=0.3, linestyle='--')
 
+    def _crea_grafico_occupazione(self, ax, risultati):
+        """
+        Visualizza nel tempo l'occupazione contemporanea di vasche larvali,
+        vasche preingrasso e gabbie ingrasso nel metodo sovrapposto, espressa
+        in percentuale della capacità configurata, con una linea a gradini per
+        risorsa. La soglia del 100% è tratteggiata in rosso e i periodi oltre
+        capacità sono evidenziati: se presenti, il piano sovrapposto non è
+        realizzabile con le infrastrutture attuali. In legenda picco e
+        utilizzo medio di ciascuna risorsa.
+        """
+        occupazioni = calcola_occupazione_risorse(risultati, self.config)
+        stili = {
+            'vasche_larvali': ('Vasche Larvali', self.colors['primary']),
+            'vasche_preingrasso': ('Vasche Preingrasso', self.colors['warning']),
+            'gabbie_ingrasso': ('Gabbie Ingrasso', self.colors['success'])
+        }
+
+        for risorsa, occ in occupazioni.items():
+            etichetta, colore = stili[risorsa]
+            percentuale = occ['occupazione'] / max(occ['capacita'], 1) * 100
+            ax.step(occ['giorni'], percentuale, where='post', color=colore, linewidth=2.5,
+                    label=f"{etichetta}: picco {occ['picco']}/{occ['capacita']} - utilizzo {occ['utilizzo_percentuale']}%")
+            for inizio, fine, _ in occ['intervalli_sovraccarico']:
+                ax.axvspan(inizio, fine, color=self.colors['danger'], alpha=0.08)
+
+        ax.axhline(100, color=self.colors['danger'], linestyle='--', linewidth=2, label='Capacità (100%)')
+        ax.set_xlim(0, max(risultati['tempo_totale'], 1))
+        ax.set_ylim(bottom=0)
+        ax.set_xlabel('Timeline (giorni)', fontsize=11, fontweight='bold')
+        ax.set_ylabel('Occupazione (% capacità)', fontsize=11, fontweight='bold')
+        ax.set_title('OCCUPAZIONE CONTEMPORANEA DELLE RISORSE - METODO SOVRAPPOSTO',
+                     fontsize=13, fontweight='bold', pad=15)
+        ax.legend(loc='upper right', framealpha=0.95, fontsize=10)
+        ax.grid(alpha=0.3, linestyle='--')
+
     def _crea_tabella_riepilogo(self, ax, risultati_seq, risultati_sov):
         """
         Genera una tabella riepilogativa completa con 8 colonne che confronta
@@ -0,0 +1,165 @@
+"""
+SIMULAZIONE CON CHECKPOINT - GRUPPO DEL PESCE
+Esecuzione di simulazioni lunghe (arrivo continuo di lotti su molti anni) con
+salvataggio periodico dello stato su disco e ripresa dopo un'interruzione,
+con risultati identici a quelli di un'esecuzione senza interruzioni
+"""
+import json
+import os
+import pickle
+import random
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from app.main import sequenza_produzione_completa_sequenziale, sequenza_produzione_integrata_sovrapposta
+from data_model.lotto_produzione_model import LottoProduzione
+from data_model.specie_ittica_model import SpecieIttica
+from utils.configurazione import ConfigurazioneGruppoDelPesce
+
+VERSIONE_CHECKPOINT = 1
+
+METODI = {
+    'sequenziale': sequenza_produzione_completa_sequenziale,
+    'sovrapposto': sequenza_produzione_integrata_sovrapposta
+}
+
+
+def _firma_esecuzione(specie_disponibili: List[SpecieIttica], config: ConfigurazioneGruppoDelPesce, metodo: str,
+                      numero_lotti: int, min_larve: int, max_larve: int, seed) -> Dict:
+    """
+    Restituisce i parametri che identificano un'esecuzione: un checkpoint può
+    essere ripreso solo con la stessa firma, altrimenti i risultati non
+    sarebbero quelli dell'esecuzione originale.
+    """
+    return {
+        'metodo': metodo,
+        'numero_lotti': numero_lotti,
+        'min_larve': min_larve,
+        'max_larve': max_larve,
+        'seed': seed,
+        'specie': [vars(s) for s in specie_disponibili],
+        'config': vars(config)
+    }
+
+
+def _salva_checkpoint(percorso: Path, stato: Dict):
+    """
+    Scrive lo stato su un file temporaneo e lo sostituisce atomicamente al
+    checkpoint precedente, così un'interruzione durante la scrittura lascia
+    sempre un checkpoint valido.
+    """
+    temporaneo = percorso.with_name(percorso.name + '.tmp')
+    with open(temporaneo, 'wb') as f:
+        pickle.dump(stato, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporaneo, percorso)
+
+
+def simula_con_checkpoint(specie_disponibili: List[SpecieIttica], config: ConfigurazioneGruppoDelPesce,
+                          numero_lotti: int, min_larve: int, max_larve: int, percorso_checkpoint: str,
+                          metodo: str = 'sovrapposto', seed: int = None,
+                          intervallo_lotti: int = 10000, intervallo_secondi: float = None,
+                          rimuovi_a_fine: bool = True) -> Dict:
+    """
+    Simula l'arrivo continuo di `numero_lotti` lotti (le specie si alternano a
+    rotazione, le larve sono estratte con random.Random(seed) come in
+    genera_lotti_casuali) con il metodo indicato, salvando lo stato ogni
+    `intervallo_lotti` lotti e/o ogni `intervallo_secondi` secondi.
+    Il checkpoint contiene cursore dei lotti, stato del generatore casuale,
+    offset di inizio del prossimo lotto, tempo e totali parziali; i dettagli
+    per lotto sono accodati in un file JSONL accanto al checkpoint, di cui si
+    salva solo la lunghezza, così ogni salvataggio costa O(1) e non O(lotti).
+    Se esiste un checkpoint con la stessa firma l'esecuzione riprende da lì,
+    troncando i dettagli scritti dopo l'ultimo salvataggio. Ogni lotto è
+    calcolato dalla funzione di riferimento di app/main.py, per cui il
+    risultato (stesso formato di quelle funzioni, più 'totali') è identico a
+    quello di un'esecuzione senza interruzioni.
+    """
+    if metodo not in METODI:
+        raise ValueError(f"Metodo non valido: {metodo!r} (ammessi: {', '.join(METODI)})")
+    simula_lotto = METODI[metodo]
+
+    percorso = Path(percorso_checkpoint)
+    percorso_dettagli = percorso.with_name(percorso.name + '.dettagli.jsonl')
+    firma = _firma_esecuzione(specie_disponibili, config, metodo, numero_lotti, min_larve, max_larve, seed)
+
+    rng = random.Random(seed)
+    stato = {
+        'versione': VERSIONE_CHECKPOINT,
+        'firma': firma,
+        'cursore': 0,
+        'stato_rng': rng.getstate(),
+        'offset_inizio': 0,
+        'tempo_totale': 0,
+        'totali': {'larve_seminate': 0, 'pesci_commerciali': 0, 'tonnellate_prodotte': 0.0},
+        'byte_dettagli': 0,
+        'nome_metodo': None
+    }
+
+    if percorso.exists():
+        with open(percorso, 'rb') as f:
+            salvato = pickle.load(f)
+        if salvato.get('versione') != VERSIONE_CHECKPOINT or salvato.get('firma') != firma:
+            raise ValueError(f"Il checkpoint {percorso} appartiene a un'esecuzione con parametri diversi")
+        stato = salvato
+        rng.setstate(stato['stato_rng'])
+    else:
+        percorso.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(percorso_dettagli, 'ab') as file_dettagli:
+        # Scarta i dettagli scritti dopo l'ultimo checkpoint
+        file_dettagli.truncate(stato['byte_dettagli'])
+        file_dettagli.seek(stato['byte_dettagli'])
+
+        ultimo_salvataggio = time.monotonic()
+        n_specie = len(specie_disponibili)
+        totali = stato['totali']
+
+        while stato['cursore'] < numero_lotti:
+            specie = specie_disponibili[stato['cursore'] % n_specie]
+            lotto = LottoProduzione(specie, rng.randint(min_larve, max_larve))
+            risultato = simula_lotto([lotto], config)
+            dettaglio = risultato['dettagli'][0]
+            stato['nome_metodo'] = risultato['metodo']
+
+            if metodo == 'sovrapposto':
+                # Trasla la pianificazione del lotto all'offset corrente
+                for campo in ('inizio_giorno', 'fine_larvale_giorno', 'fine_preingrasso_giorno', 'fine_ingrasso_giorno'):
+                    dettaglio[campo] += stato['offset_inizio']
+                stato['offset_inizio'] = dettaglio['fine_larvale_giorno']
+                stato['tempo_totale'] = max(stato['tempo_totale'], dettaglio['fine_ingrasso_giorno'])
+            else:
+                stato['tempo_totale'] += dettaglio['giorni_totali']
+
+            totali['larve_seminate'] += dettaglio['larve_seminate']
+            totali['pesci_commerciali'] += dettaglio['pesci_commerciali']
+            totali['tonnellate_prodotte'] += dettaglio['tonnellate_prodotte']
+            file_dettagli.write(json.dumps(dettaglio, ensure_ascii=False).encode('utf-8') + b"\n")
+            stato['cursore'] += 1
+
+            scadenza_lotti = intervallo_lotti and stato['cursore'] % intervallo_lotti == 0
+            scadenza_tempo = intervallo_secondi is not None and time.monotonic() - ultimo_salvataggio >= intervallo_secondi
+            if scadenza_lotti or scadenza_tempo:
+                file_dettagli.flush()
+                os.fsync(file_dettagli.fileno())
+                stato['byte_dettagli'] = file_dettagli.tell()
+                stato['stato_rng'] = rng.getstate()
+                _salva_checkpoint(percorso, stato)
+                ultimo_salvataggio = time.monotonic()
+
+    with open(percorso_dettagli, 'r', encoding='utf-8') as f:
+        dettagli = [json.loads(riga) for riga in f]
+
+    risultati = {
+        'metodo': stato['nome_metodo'] or METODI[metodo]([], config)['metodo'],
+        'dettagli': dettagli,
+        'tempo_totale': stato['tempo_totale'],
+        'totali': dict(stato['totali'])
+    }
+
+    if rimuovi_a_fine:
+        percorso.unlink(missing_ok=True)
+        percorso_dettagli.unlink(missing_ok=True)
+    return risultati
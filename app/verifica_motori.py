@@ -0,0 +1,214 @@
+"""
+VERIFICA DIFFERENZIALE DEI MOTORI - GRUPPO DEL PESCE
+Esegue lotti e configurazioni casuali con tutti i motori registrati, confronta
+i risultati con il motore di riferimento campo per campo (valori e tipi) e
+misura la velocità di ciascun motore
+"""
+import random
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.motori_simulazione import METODI, MOTORI, ottieni_motore
+from data_model.lotto_produzione_model import LottoProduzione
+from data_model.specie_ittica_model import SpecieIttica
+from utils.calcolo_vasche import CAPACITA_VASCHE_LARVALI
+from utils.configurazione import ConfigurazioneGruppoDelPesce
+
+MOTORE_RIFERIMENTO = 'riferimento'
+
+
+def specie_casuale(rng: random.Random, nome: str) -> SpecieIttica:
+    """
+    Genera una specie con parametri casuali attorno a quelli delle specie
+    allevate (densità, durate delle fasi, taglie).
+    """
+    return SpecieIttica(
+        nome=nome,
+        densita_semina_larvale=rng.randint(20, 200),
+        densita_preingrasso=rng.randint(200, 600),
+        densita_ingrasso=rng.randint(5, 30),
+        giorni_fase_larvale=rng.randint(1, 60),
+        giorni_preingrasso=rng.randint(1, 100),
+        giorni_ingrasso=rng.randint(1, 600),
+        taglia_vendita_avannotto=rng.uniform(0.5, 5.0),
+        taglia_commerciale=rng.uniform(100.0, 1200.0),
+        temperatura_ottimale=rng.uniform(14.0, 26.0)
+    )
+
+
+def configurazione_casuale(rng: random.Random) -> ConfigurazioneGruppoDelPesce:
+    """
+    Genera una configurazione con infrastrutture e tassi casuali. Le
+    capacità possono essere molto piccole, così da esercitare anche il
+    limite alle unità disponibili nei calcoli di vasche e gabbie.
+    """
+    config = ConfigurazioneGruppoDelPesce()
+    config.vasche_larvali_piccole = rng.randint(0, 40)
+    config.vasche_larvali_medie = rng.randint(0, 30)
+    config.vasche_larvali_grandi = rng.randint(1, 15)
+    config.vasche_preingrasso = rng.randint(1, 60)
+    config.numero_impianti = rng.randint(1, 8)
+    config.gabbie_per_impianto = rng.randint(1, 30)
+    config.volume_gabbia = rng.randint(100, 2000)
+    config.tasso_sopravvivenza_larvale = rng.uniform(0.05, 1.0)
+    config.tasso_sopravvivenza_preingrasso = rng.uniform(0.05, 1.0)
+    config.tasso_sopravvivenza_ingrasso = rng.uniform(0.05, 1.0)
+    config.efficienza_operativa = rng.uniform(0.05, 1.0)
+    return config
+
+
+def lotti_casuali(rng: random.Random, specie_disponibili: List[SpecieIttica], numero_lotti: int) -> List[LottoProduzione]:
+    """
+    Genera lotti di specie casuali. Una parte delle quantità cade
+    esattamente sui multipli della capacità di una vasca larvale (piccola,
+    media o grande), dove gli arrotondamenti per eccesso sono più delicati.
+    """
+    lotti = []
+    for _ in range(numero_lotti):
+        specie = rng.choice(specie_disponibili)
+        if rng.random() < 0.2:
+            numero_larve = rng.choice(CAPACITA_VASCHE_LARVALI) * specie.densita_semina_larvale * rng.randint(1, 20) + rng.choice((-1, 0, 1))
+        else:
+            numero_larve = rng.randint(1, 10_000_000)
+        lotti.append(LottoProduzione(specie, max(numero_larve, 1)))
+    return lotti
+
+
+def prima_differenza(atteso: Any, ottenuto: Any, percorso: str = '') -> Optional[Tuple[str, Any, Any]]:
+    """
+    Confronta ricorsivamente due risultati e restituisce (campo, atteso,
+    ottenuto) della prima differenza, o None se coincidono. Contano anche
+    tipo, chiavi e loro ordine: ad esempio un np.int64 al posto di un int o
+    un campo mancante sono divergenze.
+    """
+    if type(atteso) is not type(ottenuto):
+        return percorso or '.', f"{atteso!r} ({type(atteso).__name__})", f"{ottenuto!r} ({type(ottenuto).__name__})"
+    if isinstance(atteso, dict):
+        if list(atteso) != list(ottenuto):
+            return f"{percorso}.<chiavi>" if percorso else '<chiavi>', list(atteso), list(ottenuto)
+        for chiave in atteso:
+            differenza = prima_differenza(atteso[chiave], ottenuto[chiave], f"{percorso}.{chiave}" if percorso else chiave)
+            if differenza:
+                return differenza
+        return None
+    if isinstance(atteso, list):
+        for i, (a, o) in enumerate(zip(atteso, ottenuto)):
+            differenza = prima_differenza(a, o, f"{percorso}[{i}]")
+            if differenza:
+                return differenza
+        if len(atteso) != len(ottenuto):
+            return f"{percorso}<lunghezza>", len(atteso), len(ottenuto)
+        return None
+    if atteso != ottenuto:
+        return percorso or '.', atteso, ottenuto
+    return None
+
+
+def _esegui(nome_motore: str, metodo: str, lotti: List[LottoProduzione], config: ConfigurazioneGruppoDelPesce) -> Tuple[Dict, float]:
+    inizio = time.perf_counter()
+    risultati = getattr(ottieni_motore(nome_motore), metodo)(lotti, config)
+    return risultati, time.perf_counter() - inizio
+
+
+def verifica_motori(motori: Optional[Sequence[str]] = None, prove: int = 50, max_lotti: int = 300,
+                    lotti_prestazioni: int = 200_000, seed: Optional[int] = None) -> Dict[str, Dict]:
+    """
+    Esegue `prove` casi casuali (configurazione, da 1 a 5 specie, da 0 a
+    `max_lotti` lotti) con entrambi i metodi su ogni motore e ne confronta i
+    risultati con il motore di riferimento. Poi misura la velocità su un
+    caso grande di `lotti_prestazioni` lotti (anch'esso confrontato). Per
+    ogni motore restituisce il numero di casi divergenti, la prima
+    divergenza (prova, metodo, campo, atteso, ottenuto, seed del caso per
+    riprodurlo), i secondi impiegati, i lotti al secondo e l'accelerazione
+    rispetto al riferimento nel caso grande.
+    """
+    rng = random.Random(seed)
+    nomi = [n for n in (motori or MOTORI) if n != MOTORE_RIFERIMENTO]
+    esito = {nome: {'prove': 0, 'divergenze': 0, 'prima_divergenza': None, 'secondi_prove': 0.0} for nome in nomi}
+
+    def confronta(nome: str, prova: int, seed_caso, metodo: str, atteso: Dict, ottenuto: Dict):
+        differenza = prima_differenza(atteso, ottenuto)
+        esito[nome]['prove'] += 1
+        if differenza is None:
+            return
+        esito[nome]['divergenze'] += 1
+        if esito[nome]['prima_divergenza'] is None:
+            campo, valore_atteso, valore_ottenuto = differenza
+            esito[nome]['prima_divergenza'] = {
+                'prova': prova, 'seed': seed_caso, 'metodo': metodo,
+                'campo': campo, 'atteso': valore_atteso, 'ottenuto': valore_ottenuto
+            }
+
+    for prova in range(prove):
+        seed_caso = rng.getrandbits(32)
+        rng_caso = random.Random(seed_caso)
+        config = configurazione_casuale(rng_caso)
+        specie = [specie_casuale(rng_caso, f"Specie {k + 1}") for k in range(rng_caso.randint(1, 5))]
+        lotti = lotti_casuali(rng_caso, specie, rng_caso.randint(0, max_lotti))
+        for metodo in METODI:
+            atteso, _ = _esegui(MOTORE_RIFERIMENTO, metodo, lotti, config)
+            for nome in nomi:
+                ottenuto, secondi = _esegui(nome, metodo, lotti, config)
+                esito[nome]['secondi_prove'] += secondi
+                confronta(nome, prova, seed_caso, metodo, atteso, ottenuto)
+
+    # Caso grande per le prestazioni
+    seed_caso = rng.getrandbits(32)
+    rng_caso = random.Random(seed_caso)
+    config = ConfigurazioneGruppoDelPesce()
+    specie = [specie_casuale(rng_caso, f"Specie {k + 1}") for k in range(3)]
+    lotti = lotti_casuali(rng_caso, specie, lotti_prestazioni)
+    tempi_riferimento = {}
+    risultati_riferimento = {}
+    for metodo in METODI:
+        risultati_riferimento[metodo], tempi_riferimento[metodo] = _esegui(MOTORE_RIFERIMENTO, metodo, lotti, config)
+    secondi_riferimento = sum(tempi_riferimento.values())
+
+    for nome in nomi:
+        secondi = 0.0
+        for metodo in METODI:
+            ottenuto, durata = _esegui(nome, metodo, lotti, config)
+            secondi += durata
+            confronta(nome, prove, seed_caso, metodo, risultati_riferimento[metodo], ottenuto)
+        esito[nome].update({
+            'secondi': secondi,
+            'lotti_al_secondo': 2 * lotti_prestazioni / secondi if secondi > 0 else float('inf'),
+            'accelerazione': secondi_riferimento / secondi if secondi > 0 else float('inf')
+        })
+
+    esito[MOTORE_RIFERIMENTO] = {
+        'secondi': secondi_riferimento,
+        'lotti_al_secondo': 2 * lotti_prestazioni / secondi_riferimento if secondi_riferimento > 0 else float('inf'),
+        'accelerazione': 1.0
+    }
+    return esito
+
+
+def stampa_verifica(esito: Dict[str, Dict]):
+    """
+    Stampa l'esito della verifica differenziale: equivalenza e prestazioni
+    per motore, con la prima divergenza trovata.
+    """
+    print("\n" + "=" * 80)
+    print(" VERIFICA DIFFERENZIALE DEI MOTORI DI SIMULAZIONE")
+    print("=" * 80)
+    print(f"{'Motore':<14}{'Casi':>8}{'Divergenti':>12}{'Secondi':>10}{'Lotti/s':>14}{'Accelerazione':>15}")
+    for nome, dati in esito.items():
+        casi = dati.get('prove', '-')
+        divergenti = dati.get('divergenze', '-')
+        print(f"{nome:<14}{casi:>8}{divergenti:>12}{dati['secondi']:>10.2f}"
+              f"{dati['lotti_al_secondo']:>14,.0f}{dati['accelerazione']:>14.1f}x")
+
+    for nome, dati in esito.items():
+        divergenza = dati.get('prima_divergenza')
+        if divergenza:
+            print(f"\n {nome}: prima divergenza nella prova {divergenza['prova']} (seed {divergenza['seed']}), "
+                  f"metodo {divergenza['metodo']}")
+            print(f"   campo: {divergenza['campo']}")
+            print(f"   atteso: {divergenza['atteso']}")
+            print(f"   ottenuto: {divergenza['ottenuto']}")
+    print("=" * 80 + "\n")
+
+
+if __name__ == "__main__":
+    stampa_verifica(verifica_motori())
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 
 class Configuration(BaseSettings):
@@ -30,4 +32,17 @@ class Configuration(BaseSettings):
     # Capacità produttiva annua (tonnellate)
     CAPACITA_PRODUTTIVA_ANNUA: int = 4500  # tonnellate/anno
 
+    # ===== OUTPUT =====
+    # completo, sintesi, tabella, jsonl, csv (altri valori sono rifiutati all'avvio)
+    MODALITA_OUTPUT: Literal["completo", "sintesi", "tabella", "jsonl", "csv"] = "completo"
+
+    # ===== SIMULAZIONE =====
+    # riferimento, vettoriale, a_blocchi, parallelo
+    MOTORE_SIMULAZIONE: str = "riferimento"
+
+    # ===== STORICO =====
+    # Se attivo registra ogni esecuzione di main() nel database SQLite (vuoto = report/storico_simulazioni.db)
+    REGISTRA_STORICO: bool = False
+    PERCORSO_STORICO: str = ""
+
 settings = Configuration()
\ No newline at end of file
@@ -0,0 +1,13 @@
+from dataclasses import dataclass
+from typing import Tuple
+
+
+@dataclass
+class EventoCatastrofico:
+    """Tipo di evento raro che colpisce i lotti presenti in alcune fasi produttive"""
+    nome: str
+    fasi: Tuple[str, ...]  # fasi colpite: larvale, preingrasso, ingrasso
+    tasso_annuo: float  # eventi attesi per anno (processo di Poisson)
+    alfa_perdita: float  # parametri della distribuzione Beta della quota di pesci persi
+    beta_perdita: float
+    quota_lotti_colpiti: float  # probabilità che un lotto presente nella fase sia colpito
\ No newline at end of file
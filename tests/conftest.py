@@ -0,0 +1,22 @@
+"""
+Fixture comuni dei test: le tre specie allevate dal Gruppo Del Pesce (come in
+app/main.py) e la configurazione predefinita
+"""
+import pytest
+
+from data_model.specie_ittica_model import SpecieIttica
+from utils.configurazione import ConfigurazioneGruppoDelPesce
+
+
+@pytest.fixture
+def specie_ittiche():
+    return [
+        SpecieIttica("Spigola/Branzino (Dicentrarchus labrax)", 100, 400, 15, 40, 70, 450, 2.0, 380.0, 18.0),
+        SpecieIttica("Orata (Sparus aurata)", 120, 450, 18, 45, 65, 420, 2.0, 330.0, 20.0),
+        SpecieIttica("Ombrina/Meagre (Argyrosomus regius)", 80, 350, 12, 35, 80, 480, 2.0, 900.0, 19.0)
+    ]
+
+
+@pytest.fixture
+def config():
+    return ConfigurazioneGruppoDelPesce()
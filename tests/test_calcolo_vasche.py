@@ -0,0 +1,45 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from utils.calcolo_vasche import (_VOLUMI_UNITA, combinazioni_vasche_larvali, lotti_larvali_contemporanei,
+                                  tabella_vasche_larvali)
+
+
+def _migliore_forza_bruta(domanda, disponibili):
+    """Volume e vasche della combinazione di volume minimo >= domanda e, a parità, con meno vasche"""
+    combinazioni = np.array(list(itertools.product(*(range(n + 1) for n in disponibili)))).reshape(-1, 3)
+    volumi = combinazioni @ _VOLUMI_UNITA
+    vasche = combinazioni.sum(axis=1)
+    sufficienti = volumi >= domanda
+    if not sufficienti.any():
+        return None
+    volume = volumi[sufficienti].min()
+    return int(volume), int(vasche[sufficienti & (volumi == volume)].min())
+
+
+@pytest.mark.parametrize('disponibili', [(0, 0, 0), (3, 0, 0), (2, 2, 1), (5, 3, 2), (1, 4, 3), (6, 0, 4)])
+def test_tabella_coincide_con_la_forza_bruta(disponibili):
+    tabella = tabella_vasche_larvali(*disponibili)
+    volume_totale = int(np.dot(disponibili, _VOLUMI_UNITA))
+    assert len(tabella) == volume_totale + 1
+
+    for domanda, combinazione in enumerate(tabella):
+        assert all(0 <= c <= n for c, n in zip(combinazione, disponibili))
+        assert (combinazione @ _VOLUMI_UNITA, combinazione.sum()) == _migliore_forza_bruta(domanda, disponibili)
+
+
+def test_combinazioni_senza_limite_di_vasche():
+    domande = np.arange(0, 900, 13)
+    combinazioni = combinazioni_vasche_larvali(domande)
+    for domanda, combinazione in zip(domande, combinazioni):
+        limite = tuple(int(domanda) // v + 1 for v in _VOLUMI_UNITA)
+        assert (combinazione @ _VOLUMI_UNITA, combinazione.sum()) == _migliore_forza_bruta(domanda, limite)
+
+
+def test_lotti_contemporanei_usano_le_vasche_rimaste():
+    # 40 unità: un lotto prende una grande, il secondo due medie, il terzo non entra
+    assert lotti_larvali_contemporanei((2, 2, 1), 40, 10) == 2
+    assert lotti_larvali_contemporanei((2, 2, 1), 40, 1) == 1
+    assert lotti_larvali_contemporanei((0, 0, 0), 1, 10) == 0
@@ -0,0 +1,27 @@
+from app.confronto_varianza import confronta_metodi_varianza_ridotta
+
+
+def test_variabili_controllo_riducono_la_varianza(specie_ittiche, config):
+    comuni = dict(min_larve=1_000_000, max_larve=3_000_000, antitetiche=False, min_repliche=256, max_repliche=256, seed=3)
+    senza = confronta_metodi_varianza_ridotta(specie_ittiche, config, variabili_controllo=False, **comuni)
+    con = confronta_metodi_varianza_ridotta(specie_ittiche, config, variabili_controllo=True, **comuni)
+
+    assert con['metriche']['giorni']['varianza_ridotta'] < senza['metriche']['giorni']['varianza_ridotta'] / 10
+
+
+def test_coppie_antitetiche_identiche_segnalate_come_degeneri(specie_ittiche, config):
+    risultati = confronta_metodi_varianza_ridotta(specie_ittiche, config, 1_000_000, 3_000_000,
+                                                  antitetiche=True, seed=3)
+    stima = risultati['metriche']['giorni']
+
+    assert risultati['degenere'] and not risultati['convergenza']
+    assert stima['degenere'] and stima['intervallo'] is None and stima['fattore_riduzione'] is None
+
+
+def test_durate_fisse_differenza_deterministica(specie_ittiche, config):
+    risultati = confronta_metodi_varianza_ridotta(specie_ittiche, config, 1_000_000, 3_000_000,
+                                                  ampiezza_durate=0, antitetiche=False, seed=3)
+    stima = risultati['metriche']['giorni']
+
+    assert risultati['convergenza'] and stima['semiampiezza'] == 0
+    assert stima['fattore_riduzione'] is None
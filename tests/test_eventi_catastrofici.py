@@ -0,0 +1,45 @@
+import dataclasses
+import random
+
+import numpy as np
+import pytest
+
+from app.eventi_catastrofici import EVENTI_PREDEFINITI, ModelloEventi
+from app.main import sequenza_produzione_integrata_sovrapposta
+from utils.generazione_lotti import genera_lotti_casuali
+
+
+@pytest.fixture
+def modello(specie_ittiche, config):
+    random.seed(0)
+    lotti = [lotto for _ in range(4) for lotto in genera_lotti_casuali(specie_ittiche, 1_000_000, 2_500_000)]
+    return ModelloEventi(sequenza_produzione_integrata_sovrapposta(lotti, config))
+
+
+def test_rapporto_di_verosimiglianza_ripesa_alla_distribuzione_nominale(modello):
+    repliche = 200_000
+    nominale = modello.simula_perdite(np.random.default_rng(1), repliche)
+    inclinazione = modello.parametri_nominali()
+    inclinazione['intensita'] = inclinazione['intensita'] * 4
+    inclinazione['quota'] = np.clip(inclinazione['quota'] * 1.5, 0.05, 0.95)
+    inclinazione['alfa'] = inclinazione['alfa'] + 1
+    inclinata = modello.simula_perdite(np.random.default_rng(2), repliche, inclinazione)
+    pesi = np.exp(inclinata['log_rapporto'])
+
+    # I pesi hanno media 1 e riportano la perdita media al valore nominale
+    assert pesi.mean() == pytest.approx(1, abs=0.03)
+    assert (pesi * inclinata['perdite']).mean() == pytest.approx(nominale['perdite'].mean(), rel=0.05)
+
+
+def test_senza_inclinazione_il_rapporto_e_nullo(modello):
+    campione = modello.simula_perdite(np.random.default_rng(3), 1000)
+    assert np.allclose(campione['log_rapporto'], 0)
+
+
+@pytest.mark.parametrize('campo, valore', [('quota_lotti_colpiti', 0.0), ('quota_lotti_colpiti', 1.0),
+                                           ('alfa_perdita', 0.0), ('tasso_annuo', -0.1), ('fasi', ('schiusa',))])
+def test_eventi_fuori_dominio_rifiutati(campo, valore):
+    evento = dataclasses.replace(EVENTI_PREDEFINITI[0], **{campo: valore})
+    risultati = {'dettagli': [], 'tempo_totale': 0}
+    with pytest.raises(ValueError):
+        ModelloEventi(risultati, [evento])
@@ -0,0 +1,34 @@
+import random
+import subprocess
+import sys
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from utils.array_lotti import calcola_quantita_lotti, lotti_in_array
+from utils.generazione_lotti import genera_lotti_casuali
+from utils.memoria_condivisa import ArrayCondivisi, calcola_lotti_in_parallelo
+
+
+def test_calcolo_parallelo_coincide_con_quello_locale(specie_ittiche, config):
+    random.seed(7)
+    lotti = [lotto for _ in range(200) for lotto in genera_lotti_casuali(specie_ittiche, 1, 5_000_000)]
+    array_lotti, array_specie, _ = lotti_in_array(lotti)
+    attese = calcola_quantita_lotti(array_lotti['indice_specie'], array_lotti['numero_larve'], array_specie, config)
+
+    ottenute = calcola_lotti_in_parallelo(lotti, config, processi=2, dimensione_blocco=150)
+    for campo, valori in ottenute.items():
+        assert np.array_equal(valori, attese[campo]), campo
+
+
+def test_collegamento_da_altro_processo_non_rimuove_il_segmento():
+    with ArrayCondivisi({'valori': ((4,), np.int64)}) as condivisi:
+        descrittore = condivisi.descrittore
+        codice = ("import sys; from utils.memoria_condivisa import collega_array\n"
+                  f"with collega_array({descrittore!r}) as viste: viste['valori'][:] = 7")
+        subprocess.run([sys.executable, '-c', codice], check=True)
+
+        # Il processo collegato è terminato ma il segmento (e i dati scritti) restano
+        segmento = shared_memory.SharedMemory(name=descrittore['valori'][0])
+        segmento.close()
+        assert condivisi.viste['valori'].tolist() == [7] * 4
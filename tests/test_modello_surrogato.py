@@ -0,0 +1,43 @@
+import itertools
+
+import numpy as np
+
+from app.modello_surrogato import ModelloSurrogato, nome_parametro_lotti, tempo_totale_rotazione, valuta_scenario
+
+
+def test_tempo_totale_rotazione_coincide_con_la_simulazione(specie_ittiche, config):
+    giorni_larvali = [s.giorni_fase_larvale for s in specie_ittiche]
+    giorni_totali = [s.giorni_fase_larvale + s.giorni_preingrasso + s.giorni_ingrasso for s in specie_ittiche]
+    combinazioni = list(itertools.product(range(0, 5), repeat=len(specie_ittiche)))
+
+    esatti = tempo_totale_rotazione(giorni_larvali, giorni_totali, np.array(combinazioni))
+    for lotti, esatto in zip(combinazioni, esatti):
+        valori = {nome_parametro_lotti(i): n for i, n in enumerate(lotti)}
+        valori['larve_per_lotto'] = 1_000_000
+        assert esatto == valuta_scenario(specie_ittiche, config, valori)['tempo_totale']
+
+
+def test_interroga_risponde_senza_simulazione_nel_dominio(specie_ittiche, config):
+    modello = ModelloSurrogato.addestra(specie_ittiche, config, seed=1)
+    rng = np.random.default_rng(5)
+
+    fonti = []
+    for _ in range(200):
+        valori = {
+            nome: int(rng.integers(basso, alto + 1)) if intero else float(rng.uniform(basso, alto))
+            for nome, (basso, alto), intero in zip(modello.parametri, modello.limiti, modello.interi)
+        }
+        fonti.append(modello.interroga(valori)['fonte'])
+
+    # Con la tolleranza predefinita il ricorso alla simulazione deve restare raro
+    assert fonti.count('simulazione') / len(fonti) <= 0.05
+
+
+def test_salva_e_carica_dallo_stesso_percorso(specie_ittiche, config, tmp_path):
+    modello = ModelloSurrogato.addestra(specie_ittiche, config, campioni=300, seed=2)
+    percorso = tmp_path / "modello"
+    modello.salva(percorso)
+    caricato = ModelloSurrogato.carica(percorso)
+
+    x = modello.vettore({})
+    assert np.allclose(modello.predici(x)[0], caricato.predici(x)[0])
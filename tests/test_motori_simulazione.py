@@ -0,0 +1,19 @@
+import pytest
+
+from app.motori_simulazione import MOTORI, simula
+from app.verifica_motori import MOTORE_RIFERIMENTO, verifica_motori
+
+
+def test_motori_equivalenti_al_riferimento():
+    esito = verifica_motori(prove=8, max_lotti=60, lotti_prestazioni=2_000, seed=11)
+
+    for nome in MOTORI:
+        if nome == MOTORE_RIFERIMENTO:
+            continue
+        assert esito[nome]['prove'] > 0
+        assert esito[nome]['divergenze'] == 0, esito[nome]['prima_divergenza']
+
+
+def test_motore_sconosciuto_rifiutato(config):
+    with pytest.raises(ValueError):
+        simula([], config, motore='inesistente')
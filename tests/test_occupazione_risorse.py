@@ -0,0 +1,34 @@
+import numpy as np
+
+from utils.occupazione_risorse import intervalli_sovraccarico, profilo_occupazione
+
+
+def _occupazione_giornaliera(inizi, fini, quantita, giorni):
+    return np.array([sum(q for a, b, q in zip(inizi, fini, quantita) if a <= g < b) for g in giorni])
+
+
+def test_profilo_coincide_con_il_conteggio_giorno_per_giorno():
+    rng = np.random.default_rng(0)
+    inizi = rng.integers(0, 200, 300)
+    fini = inizi + rng.integers(0, 60, 300)
+    quantita = rng.integers(1, 10, 300)
+
+    giorni, occupazione = profilo_occupazione(inizi, fini, quantita)
+    assert np.all(np.diff(giorni) > 0) and occupazione[-1] == 0
+
+    # Il gradino valido dal giorno g vale fino al cambio successivo
+    tutti = np.arange(giorni[0], giorni[-1] + 1)
+    gradini = occupazione[np.searchsorted(giorni, tutti, side='right') - 1]
+    assert np.array_equal(gradini, _occupazione_giornaliera(inizi, fini, quantita, tutti))
+
+
+def test_profilo_vuoto():
+    giorni, occupazione = profilo_occupazione([], [], [])
+    assert len(giorni) == 0 and len(occupazione) == 0
+
+
+def test_intervalli_sovraccarico_uniscono_i_gradini():
+    giorni, occupazione = profilo_occupazione([0, 5, 10, 30], [20, 15, 25, 40], [3, 2, 2, 1])
+    # Occupazione: 3 da 0, 5 da 5, 7 da 10, 5 da 15, 2 da 20, 0 da 25, 1 da 30, 0 da 40
+    assert intervalli_sovraccarico(giorni, occupazione, 4) == [(5, 20, 7)]
+    assert intervalli_sovraccarico(giorni, occupazione, 7) == []
@@ -0,0 +1,40 @@
+import random
+
+from utils.generazione_lotti import genera_lotti_casuali
+from utils.ottimizzazione_infrastruttura import (VARIABILI, _catena_ricottura, limiti_ricerca, profilo_scenario,
+                                                 valuta_candidato)
+
+COSTI = {'vasche_larvali_piccole': 10000, 'vasche_larvali_medie': 25000, 'vasche_larvali_grandi': 45000,
+         'vasche_preingrasso': 60000, 'gabbie_per_impianto': 90000}
+
+
+def _profili(specie_ittiche, config, scenari=3):
+    random.seed(4)
+    return [profilo_scenario(genera_lotti_casuali(specie_ittiche, 1_000_000, 2_500_000), config) for _ in range(scenari)]
+
+
+def test_limiti_inferiori_coprono_il_lotto_piu_grande(specie_ittiche, config):
+    profili = _profili(specie_ittiche, config)
+    inferiori, limiti, minimi = limiti_ricerca(profili, config, config.capacita_produttiva_annua)
+
+    assert all(0 <= basso <= alto for basso, alto in zip(inferiori, limiti))
+    preingrasso = VARIABILI.index('vasche_preingrasso')
+    gabbie = VARIABILI.index('gabbie_per_impianto')
+    assert config.vasche_preingrasso + inferiori[preingrasso] >= minimi['vasche_preingrasso']
+    assert (config.gabbie_per_impianto + inferiori[gabbie]) * config.numero_impianti >= minimi['gabbie_ingrasso']
+
+
+def test_catena_resta_nei_limiti(specie_ittiche, config):
+    profili = _profili(specie_ittiche, config)
+    inferiori, limiti, _ = limiti_ricerca(profili, config, config.capacita_produttiva_annua)
+    esito = _catena_ricottura(profili, config, COSTI, config.capacita_produttiva_annua, inferiori, limiti,
+                              iterazioni=200, temperatura_iniziale=None, seed=1)
+
+    assert all(basso <= x <= alto for x, basso, alto in zip(esito['incrementi'], inferiori, limiti))
+
+
+def test_scenario_senza_lotti_non_produce(config):
+    profilo = profilo_scenario([], config)
+    esito = valuta_candidato((0,) * len(VARIABILI), [profilo], config, COSTI)
+
+    assert esito['produzione_annua'] == 0
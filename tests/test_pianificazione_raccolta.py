@@ -0,0 +1,30 @@
+import pytest
+
+from utils.pianificazione_raccolta import pianifica_raccolte
+
+
+def _risultati(lotti):
+    return {'dettagli': [
+        {'specie': specie, 'fine_ingrasso_giorno': fine, 'tonnellate_prodotte': tonnellate, 'gabbie_ingrasso': 2}
+        for specie, fine, tonnellate in lotti
+    ]}
+
+
+def test_lotti_senza_tonnellate_non_sono_assegnati():
+    piano = pianifica_raccolte(_risultati([('Orata', 0, 0.0), ('Orata', 7, 10.0)]), {'Orata': [5.0, 5.0, 5.0]},
+                               ritardo_massimo_giorni=14)
+
+    assert 0 not in piano['assegnazioni']['lotto']
+    assert piano['giorni_gabbia_per_lotto'][0] == 0
+
+
+def test_domanda_servita_dal_lotto_con_scadenza_piu_vicina():
+    # Entrambi raccoglibili dalla settimana 0; il lotto 1 scade per primo e deve
+    # servire la prima domanda, lasciando il lotto 0 per la settimana 3
+    risultati = _risultati([('Orata', 7, 10.0), ('Orata', 0, 10.0)])
+    piano = pianifica_raccolte(risultati, {'Orata': [10.0, 0.0, 0.0, 10.0]}, anticipo_giorni=7, ritardo_massimo_giorni=14)
+
+    assert piano['tonnellate_non_soddisfatte'] == pytest.approx(0)
+    assert piano['tonnellate_eccedenza'] == pytest.approx(0)
+    assert piano['assegnazioni']['lotto'].tolist() == [1, 0]
+    assert piano['assegnazioni']['settimana'].tolist() == [0, 3]
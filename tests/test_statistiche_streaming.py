@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from utils.statistiche_streaming import IstogrammaFisso, SketchKLL, StatisticheWelford
+
+
+def test_welford_unione_coincide_con_i_campioni_uniti():
+    rng = np.random.default_rng(0)
+    blocchi = [rng.normal(1e6, 3.0, n) for n in (1, 17, 1000, 250)]
+    parziali = []
+    for i, blocco in enumerate(blocchi):
+        statistiche = StatisticheWelford()
+        if i % 2:
+            statistiche.aggiungi_array(blocco)
+        else:
+            for valore in blocco:
+                statistiche.aggiungi(valore)
+        parziali.append(statistiche)
+
+    totale = parziali[0]
+    for parziale in parziali[1:]:
+        totale.unisci(parziale)
+    tutti = np.concatenate(blocchi)
+    assert totale.n == len(tutti)
+    assert totale.media == pytest.approx(tutti.mean(), rel=1e-12)
+    assert totale.varianza == pytest.approx(tutti.var(ddof=1), rel=1e-9)
+    assert (totale.minimo, totale.massimo) == (tutti.min(), tutti.max())
+
+
+def test_kll_unito_rispetta_l_errore_di_rango():
+    rng = np.random.default_rng(1)
+    sketch = SketchKLL(k=200, seed=0)
+    tutti = []
+    # Molti sketch parziali (come i worker) uniti in uno solo
+    for w in range(40):
+        valori = rng.lognormal(w % 5, 1.0, 5_000)
+        parziale = SketchKLL(k=200, seed=w + 1)
+        parziale.aggiungi_array(valori[:2_500])
+        for valore in valori[2_500:]:
+            parziale.aggiungi(valore)
+        sketch.unisci(parziale)
+        tutti.append(valori)
+    tutti = np.sort(np.concatenate(tutti))
+
+    assert sketch.n == len(tutti)
+    assert sketch.campioni_conservati < 3 * sketch.k
+    for p in np.linspace(0.01, 0.99, 25):
+        rango_vero = np.searchsorted(tutti, sketch.quantile(p), side='right') / len(tutti)
+        assert abs(rango_vero - p) <= sketch.errore_rango()
+
+
+def test_kll_con_k_diversi_non_si_uniscono():
+    with pytest.raises(ValueError):
+        SketchKLL(k=100).unisci(SketchKLL(k=200))
+
+
+def test_istogramma_unione_e_quantile():
+    valori = np.linspace(0, 100, 10_001)
+    primo, secondo = IstogrammaFisso(0, 100, 100), IstogrammaFisso(0, 100, 100)
+    primo.aggiungi_array(valori[::2])
+    secondo.aggiungi_array(valori[1::2])
+    primo.unisci(secondo)
+
+    assert primo.n == len(valori)
+    assert primo.quantile(0.5) == pytest.approx(50, abs=1)
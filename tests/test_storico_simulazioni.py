@@ -0,0 +1,24 @@
+import random
+
+from app.main import sequenza_produzione_integrata_sovrapposta
+from utils.generazione_lotti import genera_lotti_casuali
+from utils.storico_simulazioni import StoricoSimulazioni
+
+
+def test_esecuzione_ricostruita_dallo_storico(specie_ittiche, config, tmp_path):
+    random.seed(2)
+    lotti = [lotto for _ in range(3) for lotto in genera_lotti_casuali(specie_ittiche, 1_000_000, 2_500_000)]
+    risultati = sequenza_produzione_integrata_sovrapposta(lotti, config)
+
+    with StoricoSimulazioni(tmp_path / "storico.db") as storico:
+        primo = storico.registra_esecuzione(risultati, 'sovrapposto', config, specie_ittiche)
+        secondo = storico.registra_esecuzione(risultati, 'sovrapposto', config, specie_ittiche)
+        ricostruiti = storico.risultati(primo)
+
+        assert primo != secondo
+        assert ricostruiti['tempo_totale'] == risultati['tempo_totale']
+        assert len(ricostruiti['dettagli']) == len(risultati['dettagli'])
+        for atteso, ottenuto in zip(risultati['dettagli'], ricostruiti['dettagli']):
+            assert {campo: atteso[campo] for campo in ottenuto} == ottenuto
+        assert storico.specie(primo) == specie_ittiche
+        assert storico.risultati(-1) is None
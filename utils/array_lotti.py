@@ -0,0 +1,137 @@
+"""
+MODULO ARRAY LOTTI - GRUPPO DEL PESCE
+Rappresentazione a colonne (array NumPy) di lotti e specie e calcolo
+vettorizzato delle quantità per lotto, con le stesse formule delle sequenze
+produttive di app/main.py
+"""
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from data_model.lotto_produzione_model import LottoProduzione
+from data_model.specie_ittica_model import SpecieIttica
+from utils.calcolo_vasche import combinazioni_vasche_larvali, domanda_vasche_larvali, vasche_larvali_disponibili
+from utils.configurazione import ConfigurazioneGruppoDelPesce
+
+# Campi numerici di SpecieIttica, nell'ordine della dataclass
+CAMPI_SPECIE = {
+    'densita_semina_larvale': np.int64,
+    'densita_preingrasso': np.int64,
+    'densita_ingrasso': np.int64,
+    'giorni_fase_larvale': np.int64,
+    'giorni_preingrasso': np.int64,
+    'giorni_ingrasso': np.int64,
+    'taglia_vendita_avannotto': np.float64,
+    'taglia_commerciale': np.float64,
+    'temperatura_ottimale': np.float64
+}
+
+# Quantità calcolate per lotto da calcola_quantita_lotti
+CAMPI_RISULTATO = {
+    'vasche_larvali': np.int64,
+    'vasche_preingrasso': np.int64,
+    'gabbie_ingrasso': np.int64,
+    'larve_sopravvissute': np.int64,
+    'avannotti_2g': np.int64,
+    'pesci_commerciali': np.int64,
+    'tonnellate_prodotte': np.float64  # non arrotondate
+}
+
+
+def lotti_in_array(lotti: List[LottoProduzione]) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray], List[str]]:
+    """
+    Converte una lista di lotti in array a colonne. Le specie distinte (per
+    identità dell'oggetto) vengono numerate in ordine di prima comparsa.
+    Restituisce gli array dei lotti ('indice_specie', 'numero_larve'), gli
+    array delle specie (uno per campo numerico di SpecieIttica) e i nomi
+    delle specie, che restano fuori dagli array perché stringhe.
+    """
+    indici = {}
+    specie_distinte: List[SpecieIttica] = []
+    indice_specie = np.empty(len(lotti), dtype=np.int32)
+    numero_larve = np.empty(len(lotti), dtype=np.int64)
+
+    for i, lotto in enumerate(lotti):
+        chiave = id(lotto.specie)
+        if chiave not in indici:
+            indici[chiave] = len(specie_distinte)
+            specie_distinte.append(lotto.specie)
+        indice_specie[i] = indici[chiave]
+        numero_larve[i] = lotto.numero_larve
+
+    array_lotti = {'indice_specie': indice_specie, 'numero_larve': numero_larve}
+    array_specie = {
+        campo: np.array([getattr(s, campo) for s in specie_distinte], dtype=tipo)
+        for campo, tipo in CAMPI_SPECIE.items()
+    }
+    return array_lotti, array_specie, [s.nome for s in specie_distinte]
+
+
+def calcola_quantita_lotti(indice_specie: np.ndarray, numero_larve: np.ndarray, array_specie: Dict[str, np.ndarray],
+                           config: ConfigurazioneGruppoDelPesce, uscita: Dict[str, np.ndarray] = None,
+                           limita_risorse: bool = True) -> Dict[str, np.ndarray]:
+    """
+    Calcola in forma vettoriale, per tutti i lotti indicati, vasche e gabbie
+    necessarie, sopravvissuti per fase, pesci commerciali e tonnellate,
+    replicando esattamente le troncature intere di calcola_vasche_* e delle
+    sequenze produttive (stesso ordine delle moltiplicazioni in virgola mobile);
+    le vasche larvali sono lette dalla stessa tabella di allocazione.
+    Se `uscita` è fornito i risultati sono scritti negli array indicati
+    (ad esempio viste su memoria condivisa) invece che in array nuovi.
+    Con limita_risorse=False vasche e gabbie sono il fabbisogno effettivo,
+    senza il limite delle unità disponibili nell'impianto (per le vasche
+    larvali, la combinazione più economica con vasche di ogni tipo illimitate).
+    """
+    densita_larvale = array_specie['densita_semina_larvale'][indice_specie]
+    densita_ingrasso = array_specie['densita_ingrasso'][indice_specie]
+    taglia_commerciale = array_specie['taglia_commerciale'][indice_specie]
+
+    domanda_larvale = domanda_vasche_larvali(numero_larve, densita_larvale)
+    if limita_risorse:
+        vasche_larvali = combinazioni_vasche_larvali(domanda_larvale, vasche_larvali_disponibili(config)).sum(axis=1)
+        vasche_preingrasso_totali = config.vasche_preingrasso
+        gabbie_totali = config.gabbie_per_impianto * config.numero_impianti
+    else:
+        vasche_larvali = combinazioni_vasche_larvali(domanda_larvale).sum(axis=1)
+        vasche_preingrasso_totali = gabbie_totali = np.iinfo(np.int64).max
+
+    larve_sopravvissute = (numero_larve * config.tasso_sopravvivenza_larvale * config.efficienza_operativa).astype(np.int64)
+    avannotti = (larve_sopravvissute * config.tasso_sopravvivenza_preingrasso).astype(np.int64)
+    pesci = (avannotti * config.tasso_sopravvivenza_ingrasso).astype(np.int64)
+
+    risultati = {
+        'vasche_larvali': vasche_larvali,
+        'vasche_preingrasso': np.minimum((larve_sopravvissute / ((40000 / 1000) * 400)).astype(np.int64) + 1, vasche_preingrasso_totali),
+        'gabbie_ingrasso': np.minimum((avannotti / (config.volume_gabbia * densita_ingrasso)).astype(np.int64) + 1, gabbie_totali),
+        'larve_sopravvissute': larve_sopravvissute,
+        'avannotti_2g': avannotti,
+        'pesci_commerciali': pesci,
+        'tonnellate_prodotte': (pesci * taglia_commerciale) / 1000 / 1000
+    }
+
+    if uscita is None:
+        return risultati
+    for campo, valori in risultati.items():
+        uscita[campo][...] = valori
+    return uscita
+
+
+def pianifica_sovrapposta(indice_specie: np.ndarray, array_specie: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Calcola in forma vettoriale i giorni di inizio e fine fase del metodo
+    sovrapposto: ogni lotto inizia quando il precedente libera le vasche
+    larvali, per cui gli inizi sono la somma cumulativa delle durate larvali.
+    """
+    giorni_larvali = array_specie['giorni_fase_larvale'][indice_specie]
+    giorni_preingrasso = array_specie['giorni_preingrasso'][indice_specie]
+    giorni_ingrasso = array_specie['giorni_ingrasso'][indice_specie]
+
+    fine_larvale = np.cumsum(giorni_larvali)
+    inizio = fine_larvale - giorni_larvali
+    fine_preingrasso = fine_larvale + giorni_preingrasso
+    return {
+        'inizio_giorno': inizio,
+        'fine_larvale_giorno': fine_larvale,
+        'fine_preingrasso_giorno': fine_preingrasso,
+        'fine_ingrasso_giorno': fine_preingrasso + giorni_ingrasso
+    }
@@ -2,33 +2,153 @@
 MODULO CALCOLO VASCHE - GRUPPO DEL PESCE
 Funzioni per calcolare le risorse necessarie per ogni fase produttiva
 """
+import math
+from functools import lru_cache
+from typing import Tuple
+
+import numpy as np
 
 from data_model.lotto_produzione_model import LottoProduzione
 from data_model.specie_ittica_model import SpecieIttica
 from utils.configurazione import ConfigurazioneGruppoDelPesce
 
+# Capacità in litri delle vasche larvali piccole (2-5mc), medie (10mc) e grandi (20mc)
+CAPACITA_VASCHE_LARVALI = (3500, 10000, 20000)
 
-def calcola_vasche_larvali(lotto: LottoProduzione, config: ConfigurazioneGruppoDelPesce) -> int:
+# Volumi e domande delle tabelle sono espressi in multipli di questa unità (500 litri)
+UNITA_VOLUME_LARVALE = math.gcd(*CAPACITA_VASCHE_LARVALI)
+_VOLUMI_UNITA = tuple(c // UNITA_VOLUME_LARVALE for c in CAPACITA_VASCHE_LARVALI)
+
+# Oltre questa domanda (in unità) la combinazione migliore senza limite di
+# vasche è quella della domanda ridotta di una vasca grande, più una grande
+_DOMANDA_RIDOTTA = 400
+
+
+def domanda_vasche_larvali(numero_larve, densita):
     """
-    Determina quante vasche larvali sono necessarie per un lotto specifico
-    basandosi sul numero di larve da seminare e sulla densità di semina della specie.
-    Utilizza una capacità media di 8000 litri per vasca (mix di vasche piccole,
-    medie e grandi) e calcola quante larve possono essere contenute per vasca
-    moltiplicando la capacità per la densità specifica della specie (larve/litro).
-    Arrotonda per eccesso (+1) per garantire spazio sufficiente e limita il risultato
-    al numero totale di vasche larvali disponibili nell'impianto.
+    Volume necessario a seminare `numero_larve` larve alla densità indicata
+    (larve/litro), in unità di UNITA_VOLUME_LARVALE arrotondate per eccesso.
+    Funziona sia con interi sia con array NumPy di interi.
+    """
+    return -(-numero_larve // (UNITA_VOLUME_LARVALE * densita))
+
+
+@lru_cache(maxsize=64)
+def tabella_vasche_larvali(piccole: int, medie: int, grandi: int) -> np.ndarray:
+    """
+    Tabella di allocazione per un parco di vasche larvali libere: la riga d
+    (domanda in unità di volume, da 0 al volume totale) contiene il numero di
+    vasche piccole, medie e grandi della combinazione più economica che
+    contiene la domanda, cioè quella di volume minimo non inferiore a d e, a
+    parità di volume, con meno vasche. Costruita una volta per parco con uno
+    zaino limitato in programmazione dinamica sul volume (il numero di vasche
+    di ogni tipo è scomposto in gruppi di 1, 2, 4, ... vasche, ciascuno usato
+    al più una volta): tempo O(V log n) e memoria O(V), con V il volume
+    totale in unità. Per ogni volume esatto si ottiene il minimo di vasche,
+    poi ogni domanda prende il più piccolo volume raggiungibile sufficiente.
+    La tabella è in sola lettura perché condivisa.
+    """
+    volume_totale = piccole * _VOLUMI_UNITA[0] + medie * _VOLUMI_UNITA[1] + grandi * _VOLUMI_UNITA[2]
+    irraggiungibile = np.iinfo(np.int64).max // 2
+    vasche = np.full(volume_totale + 1, irraggiungibile, dtype=np.int64)
+    vasche[0] = 0
+    combinazioni = np.zeros((volume_totale + 1, 3), dtype=np.int64)
+
+    for tipo, (numero, volume) in enumerate(zip((piccole, medie, grandi), _VOLUMI_UNITA)):
+        gruppo = 1
+        while numero > 0:
+            k = min(gruppo, numero)
+            numero -= k
+            gruppo *= 2
+            passo = k * volume
+            # Usare il gruppo di k vasche sul volume v - passo (valori prima del gruppo)
+            candidati = vasche[:-passo] + k
+            migliora = np.flatnonzero(candidati < vasche[passo:])
+            nuove = combinazioni[migliora]
+            nuove[:, tipo] += k
+            vasche[migliora + passo] = candidati[migliora]
+            combinazioni[migliora + passo] = nuove
+
+    volumi_raggiungibili = np.flatnonzero(vasche < irraggiungibile)
+    domande = np.arange(volume_totale + 1)
+    tabella = combinazioni[volumi_raggiungibili[np.searchsorted(volumi_raggiungibili, domande)]]
+    tabella.setflags(write=False)
+    return tabella
+
+
+def vasche_larvali_disponibili(config: ConfigurazioneGruppoDelPesce) -> Tuple[int, int, int]:
+    """
+    Vasche larvali piccole, medie e grandi dell'impianto.
     """
+    return config.vasche_larvali_piccole, config.vasche_larvali_medie, config.vasche_larvali_grandi
 
-    densita = lotto.specie.densita_semina_larvale
 
-    # Usa le vasche piccole, medie, grandi
-    capacita_media = 8000  # litri (media tra i vari tipi)
-    vasche_totali = config.vasche_larvali_piccole + config.vasche_larvali_medie + config.vasche_larvali_grandi
+def combinazioni_vasche_larvali(domanda: np.ndarray, disponibili: Tuple[int, int, int] = None) -> np.ndarray:
+    """
+    Combinazioni (piccole, medie, grandi) per un array di domande in unità di
+    volume, con una lettura della tabella per lotto. Con `disponibili` la
+    domanda oltre il volume disponibile riceve tutte le vasche; senza il
+    numero di vasche di ciascun tipo è illimitato (fabbisogno effettivo):
+    la combinazione migliore per domande grandi aggiunge vasche grandi alla
+    combinazione di una domanda ridotta, per cui basta una tabella fissa.
+    """
+    domanda = np.asarray(domanda, dtype=np.int64)
+    if disponibili is not None:
+        tabella = tabella_vasche_larvali(*disponibili)
+        return tabella[np.minimum(domanda, len(tabella) - 1)]
+
+    tabella = tabella_vasche_larvali(*(_DOMANDA_RIDOTTA // v + 1 for v in _VOLUMI_UNITA))
+    grandi_aggiunte = np.maximum(-(-(domanda - _DOMANDA_RIDOTTA) // _VOLUMI_UNITA[2]), 0)
+    combinazioni = tabella[domanda - grandi_aggiunte * _VOLUMI_UNITA[2]].copy()
+    combinazioni[:, 2] += grandi_aggiunte
+    return combinazioni
 
-    larve_per_vasca = capacita_media * densita
-    vasche_necessarie = int(lotto.numero_larve / larve_per_vasca) + 1
 
-    return min(vasche_necessarie, vasche_totali)
+def lotti_larvali_contemporanei(disponibili: Tuple[int, int, int], domanda: int, massimo: int) -> int:
+    """
+    Numero di lotti con la domanda indicata (in unità di volume) che il parco
+    `disponibili` può ospitare contemporaneamente, fino a `massimo`: ogni
+    lotto riceve la combinazione della tabella delle vasche ancora libere,
+    come se i lotti fossero assegnati uno dopo l'altro.
+    """
+    libere = tuple(int(n) for n in disponibili)
+    lotti = 0
+    while lotti < massimo:
+        tabella = tabella_vasche_larvali(*libere)
+        if domanda > len(tabella) - 1:
+            break
+        libere = tuple(n - int(v) for n, v in zip(libere, tabella[domanda]))
+        lotti += 1
+    return lotti
+
+
+def assegna_vasche_larvali(lotto: LottoProduzione, config: ConfigurazioneGruppoDelPesce) -> Tuple[int, int, int]:
+    """
+    Sceglie le vasche larvali piccole, medie e grandi per un lotto: la
+    combinazione di volume minimo (a parità di volume, con meno vasche) che
+    contiene le larve alla densità di semina della specie. Se le vasche non
+    bastano il lotto le riceve tutte. Ogni lotto dispone dell'intero parco:
+    le fasi larvali non si sovrappongono mai, né nel metodo sequenziale (un
+    lotto alla volta) né nel sovrapposto, dove ogni lotto inizia quando il
+    precedente libera le vasche larvali.
+    """
+    domanda = domanda_vasche_larvali(lotto.numero_larve, lotto.specie.densita_semina_larvale)
+    tabella = tabella_vasche_larvali(*vasche_larvali_disponibili(config))
+    piccole, medie, grandi = tabella[min(int(domanda), len(tabella) - 1)]
+    return int(piccole), int(medie), int(grandi)
+
+
+def calcola_vasche_larvali(lotto: LottoProduzione, config: ConfigurazioneGruppoDelPesce) -> int:
+    """
+    Determina quante vasche larvali sono necessarie per un lotto specifico
+    basandosi sul numero di larve da seminare e sulla densità di semina della specie.
+    Le vasche sono scelte tra piccole (3.500 litri), medie (10.000) e grandi
+    (20.000) con assegna_vasche_larvali: la combinazione più economica che
+    contiene le larve, limitata alle vasche dell'impianto (le fasi larvali
+    di lotti diversi non si sovrappongono).
+    """
+
+    return sum(assegna_vasche_larvali(lotto, config))
 
 def calcola_vasche_preingrasso(post_larve: int, config: ConfigurazioneGruppoDelPesce) -> int:
     """
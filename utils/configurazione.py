@@ -31,4 +31,14 @@ class ConfigurazioneGruppoDelPesce:
         self.efficienza_operativa = settings.EFFICIENZA_OPERATIVA
 
         # Capacità produttiva annua (tonnellate)
-        self.capacita_produttiva_annua = settings.CAPACITA_PRODUTTIVA_ANNUA
\ No newline at end of file
+        self.capacita_produttiva_annua = settings.CAPACITA_PRODUTTIVA_ANNUA
+
+        # ===== OUTPUT =====
+        self.modalita_output = settings.MODALITA_OUTPUT
+
+        # ===== SIMULAZIONE =====
+        self.motore_simulazione = settings.MOTORE_SIMULAZIONE
+
+        # ===== STORICO =====
+        self.registra_storico = settings.REGISTRA_STORICO
+        self.percorso_storico = settings.PERCORSO_STORICO
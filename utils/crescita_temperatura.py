@@ -0,0 +1,159 @@
+"""
+MODULO CRESCITA E TEMPERATURA - GRUPPO DEL PESCE
+Durata delle fasi produttive guidata dalla temperatura dell'acqua tramite
+gradi-giorno: serie giornaliere per sito lette da file in memory-map, somme
+cumulative vettorizzate e ricerca binaria (searchsorted) per tutti i lotti
+"""
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+TEMPERATURA_BASE = 12.0  # °C sotto cui la crescita si considera nulla (soglia indicativa)
+
+# Fase -> campo di SpecieIttica con la durata nominale a temperatura ottimale
+FASI = (
+    ('larvale', 'giorni_fase_larvale'),
+    ('preingrasso', 'giorni_preingrasso'),
+    ('ingrasso', 'giorni_ingrasso')
+)
+
+
+def salva_serie_temperature(percorso: str, temperature: np.ndarray):
+    """
+    Salva le serie di temperatura giornaliera (°C) come matrice float32
+    (numero siti x numero giorni) in formato .npy, leggibile in memory-map.
+    """
+    temperature = np.atleast_2d(np.asarray(temperature, dtype=np.float32))
+    np.save(Path(percorso), temperature)
+
+
+def carica_serie_temperature(percorso: str) -> np.ndarray:
+    """
+    Apre in memory-map, in sola lettura, la matrice siti x giorni salvata da
+    salva_serie_temperature: i dati vengono letti dal disco solo quando
+    servono, anche per serie di decenni su molti siti.
+    """
+    return np.load(Path(percorso), mmap_mode='r')
+
+
+def gradi_giorno_cumulati(temperature_sito: np.ndarray, temperatura_ottimale: float,
+                          temperatura_base: float = TEMPERATURA_BASE) -> np.ndarray:
+    """
+    Restituisce i gradi-giorno cumulati di un sito per una specie: il
+    contributo di ogni giorno è la temperatura oltre la soglia base, limitato
+    alla temperatura ottimale della specie (oltre l'ottimo la crescita non
+    accelera). L'elemento k è la somma dei giorni 0..k-1, per cui l'array ha
+    un elemento in più della serie e inizia da 0.
+    """
+    if temperatura_ottimale <= temperatura_base:
+        raise ValueError(f"La temperatura ottimale ({temperatura_ottimale}°C) deve superare la soglia base ({temperatura_base}°C)")
+
+    contributi = np.clip(np.asarray(temperature_sito, dtype=np.float64) - temperatura_base,
+                         0.0, temperatura_ottimale - temperatura_base)
+    cumulati = np.empty(len(contributi) + 1, dtype=np.float64)
+    cumulati[0] = 0.0
+    np.cumsum(contributi, out=cumulati[1:])
+    return cumulati
+
+
+def fine_fase_gradi_giorno(cumulati: np.ndarray, giorni_inizio: np.ndarray, gradi_richiesti: np.ndarray) -> np.ndarray:
+    """
+    Per ogni lotto che inizia una fase al giorno indicato restituisce il primo
+    giorno in cui i gradi-giorno accumulati raggiungono quelli richiesti, con
+    una ricerca binaria sull'array cumulato. I lotti che non completano la
+    fase entro la serie, o che non l'hanno iniziata (giorno -1), valgono -1.
+    """
+    giorni_inizio = np.asarray(giorni_inizio, dtype=np.int64)
+    validi = (giorni_inizio >= 0) & (giorni_inizio < len(cumulati))
+    partenza = cumulati[np.where(validi, giorni_inizio, 0)]
+    # Tolleranza relativa per gli errori di arrotondamento della somma cumulata
+    obiettivo = partenza + gradi_richiesti * (1 - 1e-9)
+    fine = np.searchsorted(cumulati, obiettivo, side='left').astype(np.int64)
+    return np.where(validi & (fine < len(cumulati)), fine, -1)
+
+
+def _cumulati_per_gruppo(temperature: np.ndarray, temperature_ottimali: np.ndarray, temperatura_base: float) -> Dict:
+    cache = {}
+
+    def cumulati(sito: int, specie: int) -> np.ndarray:
+        if (sito, specie) not in cache:
+            cache[(sito, specie)] = gradi_giorno_cumulati(temperature[sito], temperature_ottimali[specie], temperatura_base)
+        return cache[(sito, specie)]
+
+    return cumulati
+
+
+def calcola_fasi_temperatura(indice_specie: np.ndarray, array_specie: Dict[str, np.ndarray], temperature: np.ndarray,
+                             giorni_inizio: np.ndarray, sito_avannotteria: int = 0,
+                             siti_ingrasso: Optional[np.ndarray] = None,
+                             temperatura_base: float = TEMPERATURA_BASE) -> Dict[str, np.ndarray]:
+    """
+    Calcola per tutti i lotti, dati i giorni di inizio, la fine di ciascuna
+    fase con il modello a gradi-giorno. Ogni fase richiede
+    giorni_nominali x (temperatura_ottimale - temperatura_base) gradi-giorno,
+    per cui a temperatura costante pari all'ottimo la durata coincide con le
+    costanti della specie; con acqua più fredda le fasi si allungano. Le fasi
+    larvale e preingrasso usano la serie del sito dell'avannotteria, l'ingrasso
+    quella del sito di ciascun lotto (di default lo stesso). Il calcolo è
+    vettoriale per gruppo (sito, specie), senza cicli sui giorni. Restituisce
+    fine di ogni fase, durate effettive e il flag 'completato' (False se la
+    serie termina prima della fine dell'ingrasso; in tal caso le fasi non
+    completate valgono -1).
+    """
+    indice_specie = np.asarray(indice_specie)
+    n = len(indice_specie)
+    if siti_ingrasso is None:
+        siti_ingrasso = np.full(n, sito_avannotteria, dtype=np.int64)
+    siti_ingrasso = np.asarray(siti_ingrasso, dtype=np.int64)
+    temperature_ottimali = array_specie['temperatura_ottimale']
+    cumulati = _cumulati_per_gruppo(temperature, temperature_ottimali, temperatura_base)
+
+    inizio = np.asarray(giorni_inizio, dtype=np.int64)
+    risultati = {'inizio_giorno': inizio}
+    for fase, campo_giorni in FASI:
+        gradi_richiesti = array_specie[campo_giorni][indice_specie] * (temperature_ottimali[indice_specie] - temperatura_base)
+        siti = siti_ingrasso if fase == 'ingrasso' else np.full(n, sito_avannotteria, dtype=np.int64)
+        fine = np.full(n, -1, dtype=np.int64)
+        for sito, specie in set(zip(siti.tolist(), indice_specie.tolist())):
+            gruppo = (siti == sito) & (indice_specie == specie)
+            fine[gruppo] = fine_fase_gradi_giorno(cumulati(sito, specie), inizio[gruppo], gradi_richiesti[gruppo])
+        risultati[f'fine_{fase}_giorno'] = fine
+        risultati[f'giorni_{fase}'] = np.where(fine >= 0, fine - inizio, -1)
+        inizio = fine
+
+    risultati['completato'] = risultati['fine_ingrasso_giorno'] >= 0
+    # Nomi coerenti con i dettagli delle sequenze produttive
+    risultati['giorni_larvali'] = risultati.pop('giorni_larvale')
+    return risultati
+
+
+def pianifica_sovrapposta_temperatura(indice_specie: np.ndarray, array_specie: Dict[str, np.ndarray],
+                                      temperature: np.ndarray, giorno_partenza: int = 0, sito_avannotteria: int = 0,
+                                      siti_ingrasso: Optional[np.ndarray] = None,
+                                      temperatura_base: float = TEMPERATURA_BASE) -> Dict[str, np.ndarray]:
+    """
+    Pianificazione del metodo sovrapposto con durate dipendenti dalla
+    temperatura: ogni lotto inizia quando il precedente termina la fase
+    larvale. Solo la catena delle fasi larvali è sequenziale (una ricerca
+    binaria per lotto, nessun ciclo sui giorni); preingrasso e ingrasso sono
+    poi calcolati in blocco da calcola_fasi_temperatura. `giorno_partenza` è
+    l'indice nella serie del primo giorno del piano, per far partire la
+    produzione in una stagione precisa.
+    """
+    indice_specie = np.asarray(indice_specie)
+    temperature_ottimali = array_specie['temperatura_ottimale']
+    cumulati = _cumulati_per_gruppo(temperature, temperature_ottimali, temperatura_base)
+    gradi_larvali = array_specie['giorni_fase_larvale'] * (temperature_ottimali - temperatura_base)
+
+    inizi = np.full(len(indice_specie), -1, dtype=np.int64)
+    giorno = giorno_partenza
+    for i, specie in enumerate(indice_specie.tolist()):
+        if giorno < 0:
+            break
+        inizi[i] = giorno
+        giorno = int(fine_fase_gradi_giorno(cumulati(sito_avannotteria, specie), np.array([giorno]),
+                                            np.array([gradi_larvali[specie]]))[0])
+
+    return calcola_fasi_temperatura(indice_specie, array_specie, temperature, inizi, sito_avannotteria,
+                                    siti_ingrasso, temperatura_base)
@@ -1,5 +1,5 @@
 import random
-from typing import List
+from typing import List, Sequence
 from data_model.lotto_produzione_model import LottoProduzione
 from data_model.specie_ittica_model import SpecieIttica
 
@@ -13,4 +13,20 @@ def genera_lotti_casuali(specie_disponibili: List[SpecieIttica], min_larve: int,
     for specie in specie_disponibili:
         numero_larve = random.randint(min_larve, max_larve)
         lotti.append(LottoProduzione(specie, numero_larve))
-    return lotti
\ No newline at end of file
+    return lotti
+
+def genera_lotti_da_quantili(specie_disponibili: List[SpecieIttica], min_larve: int, max_larve: int, quantili: Sequence[float]) -> List[LottoProduzione]:
+    """
+    Genera lotti di produzione a partire da quantili uniformi in [0, 1) forniti
+    dall'esterno (uno per specie), mappandoli sull'intervallo intero
+    [min_larve, max_larve] come farebbe random.randint. Permette di riutilizzare
+    gli stessi numeri casuali su più simulazioni (numeri casuali comuni) o di
+    usarne il complemento 1-u per le variabili antitetiche.
+    """
+
+    ampiezza = max_larve - min_larve + 1
+    lotti = []
+    for specie, u in zip(specie_disponibili, quantili):
+        numero_larve = min_larve + min(int(u * ampiezza), ampiezza - 1)
+        lotti.append(LottoProduzione(specie, numero_larve))
+    return lotti
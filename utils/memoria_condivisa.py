@@ -0,0 +1,190 @@
+"""
+MODULO MEMORIA CONDIVISA - GRUPPO DEL PESCE
+Pubblicazione di array NumPy (lotti, specie, risultati) in segmenti di
+multiprocessing.shared_memory: i processi worker si collegano per nome e
+lavorano su viste senza copie né serializzazione dei dati
+"""
+import os
+import sys
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from data_model.lotto_produzione_model import LottoProduzione
+from utils.array_lotti import CAMPI_RISULTATO, calcola_quantita_lotti, lotti_in_array
+from utils.configurazione import ConfigurazioneGruppoDelPesce
+
+# Descrittore serializzabile: nome array -> (nome segmento, forma, dtype)
+Descrittore = Dict[str, Tuple[str, Tuple[int, ...], str]]
+
+
+def _rilascia_segmenti(segmenti: List[shared_memory.SharedMemory]):
+    """
+    Chiude e rimuove i segmenti indicati, ignorando quelli già rimossi.
+    Usata sia da ArrayCondivisi.chiudi sia dal finalizer di sicurezza. Se
+    restano viste esterne la mappatura non si può chiudere, ma il segmento
+    viene comunque rimosso e la memoria liberata all'ultimo rilascio.
+    """
+    for segmento in segmenti:
+        try:
+            segmento.close()
+        except BufferError:
+            pass
+        try:
+            segmento.unlink()
+        except FileNotFoundError:
+            pass
+    segmenti.clear()
+
+
+def _collega_segmento(nome: str) -> shared_memory.SharedMemory:
+    """
+    Si collega a un segmento esistente senza diventarne proprietario, così
+    la chiusura di un worker non può rimuoverlo: da Python 3.13 il segmento
+    non viene registrato nel resource tracker. Le versioni precedenti lo
+    registrano anche solo collegandosi: la registrazione viene saltata
+    durante il collegamento invece di essere annullata dopo, perché i worker
+    condividono il tracker del proprietario e un unregister cancellerebbe
+    anche la registrazione di quest'ultimo.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=nome, track=False)
+    registra = resource_tracker.register
+    resource_tracker.register = lambda *args: None
+    try:
+        return shared_memory.SharedMemory(name=nome)
+    finally:
+        resource_tracker.register = registra
+
+
+class ArrayCondivisi:
+    """
+    Insieme di array NumPy allocati in memoria condivisa e posseduti dal
+    processo che li crea. Va usato come context manager (o chiuso con
+    chiudi()): all'uscita tutti i segmenti vengono chiusi e rimossi; un
+    finalizer li rimuove comunque se l'oggetto viene raccolto o il processo
+    termina senza chiusura esplicita.
+    """
+
+    def __init__(self, specifiche: Dict[str, Tuple[Tuple[int, ...], np.dtype]]):
+        """
+        Alloca un segmento per ogni array descritto da nome -> (forma, dtype),
+        inizializzato a zero. Se un'allocazione fallisce i segmenti già
+        creati vengono rilasciati prima di propagare l'errore.
+        """
+        self._segmenti: List[shared_memory.SharedMemory] = []
+        self._finalizer = weakref.finalize(self, _rilascia_segmenti, self._segmenti)
+        self.viste: Dict[str, np.ndarray] = {}
+        self.descrittore: Descrittore = {}
+
+        try:
+            for nome, (forma, dtype) in specifiche.items():
+                dtype = np.dtype(dtype)
+                dimensione = max(int(np.prod(forma)) * dtype.itemsize, 1)
+                segmento = shared_memory.SharedMemory(create=True, size=dimensione)
+                self._segmenti.append(segmento)
+                vista = np.ndarray(forma, dtype=dtype, buffer=segmento.buf)
+                vista[...] = 0
+                self.viste[nome] = vista
+                self.descrittore[nome] = (segmento.name, tuple(forma), dtype.str)
+        except BaseException:
+            self.chiudi()
+            raise
+
+    @classmethod
+    def da_array(cls, array: Dict[str, np.ndarray]) -> 'ArrayCondivisi':
+        """
+        Pubblica in memoria condivisa una copia degli array forniti.
+        """
+        condivisi = cls({nome: (valori.shape, valori.dtype) for nome, valori in array.items()})
+        for nome, valori in array.items():
+            condivisi.viste[nome][...] = valori
+        return condivisi
+
+    def chiudi(self):
+        """
+        Rilascia tutti i segmenti; le viste non devono più essere usate.
+        Chiamate ripetute non hanno effetto.
+        """
+        self.viste.clear()
+        self._finalizer()
+
+    def __enter__(self) -> 'ArrayCondivisi':
+        return self
+
+    def __exit__(self, *exc):
+        self.chiudi()
+
+
+@contextmanager
+def collega_array(descrittore: Descrittore) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Lato worker: si collega ai segmenti indicati nel descrittore e fornisce
+    viste NumPy senza copia. All'uscita i segmenti vengono solo chiusi; la
+    rimozione spetta al processo proprietario (ArrayCondivisi).
+    """
+    segmenti = []
+    viste = {}
+    try:
+        for nome, (nome_segmento, forma, dtype) in descrittore.items():
+            segmento = _collega_segmento(nome_segmento)
+            segmenti.append(segmento)
+            viste[nome] = np.ndarray(forma, dtype=np.dtype(dtype), buffer=segmento.buf)
+        yield viste
+    finally:
+        # Le viste devono essere rilasciate prima di chiudere i buffer
+        viste.clear()
+        for segmento in segmenti:
+            segmento.close()
+
+
+def _calcola_blocco_worker(descrittore_ingresso: Descrittore, descrittore_uscita: Descrittore,
+                           inizio: int, fine: int, config: ConfigurazioneGruppoDelPesce) -> int:
+    """
+    Task del worker: legge i lotti [inizio, fine) dagli array condivisi e ne
+    scrive le quantità negli array di uscita preallocati. Restituisce solo il
+    numero di lotti elaborati, così il risultato non viaggia via pickle.
+    """
+    with collega_array(descrittore_ingresso) as ingresso, collega_array(descrittore_uscita) as uscita:
+        array_specie = {campo: valori for campo, valori in ingresso.items() if campo not in ('indice_specie', 'numero_larve')}
+        calcola_quantita_lotti(
+            ingresso['indice_specie'][inizio:fine],
+            ingresso['numero_larve'][inizio:fine],
+            array_specie,
+            config,
+            uscita={campo: valori[inizio:fine] for campo, valori in uscita.items()}
+        )
+        del array_specie
+    return fine - inizio
+
+
+def calcola_lotti_in_parallelo(lotti: List[LottoProduzione], config: ConfigurazioneGruppoDelPesce,
+                               processi: int = None, dimensione_blocco: int = 100_000) -> Dict[str, np.ndarray]:
+    """
+    Calcola le quantità per lotto (vasche, gabbie, sopravvissuti, pesci,
+    tonnellate non arrotondate) distribuendo blocchi di lotti su un pool di
+    processi. Lotti e specie sono pubblicati una sola volta in memoria
+    condivisa e i worker scrivono negli array di uscita condivisi: a ogni task
+    viaggiano solo i nomi dei segmenti, gli estremi del blocco e la
+    configurazione. Restituisce copie locali degli array di uscita; tutti i
+    segmenti vengono rimossi anche in caso di errore.
+    """
+    array_lotti, array_specie, _ = lotti_in_array(lotti)
+    n = len(lotti)
+    processi = processi or os.cpu_count() or 1
+
+    with ArrayCondivisi.da_array({**array_lotti, **array_specie}) as ingresso, \
+            ArrayCondivisi({campo: ((n,), tipo) for campo, tipo in CAMPI_RISULTATO.items()}) as uscita:
+        blocchi = [(i, min(i + dimensione_blocco, n)) for i in range(0, n, dimensione_blocco)]
+        with ProcessPoolExecutor(max_workers=processi) as pool:
+            futures = [
+                pool.submit(_calcola_blocco_worker, ingresso.descrittore, uscita.descrittore, inizio, fine, config)
+                for inizio, fine in blocchi
+            ]
+            for future in futures:
+                future.result()
+        return {campo: valori.copy() for campo, valori in uscita.viste.items()}
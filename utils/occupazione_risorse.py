@@ -0,0 +1,112 @@
+"""
+MODULO OCCUPAZIONE RISORSE - GRUPPO DEL PESCE
+Profili di occupazione contemporanea di vasche e gabbie calcolati con una
+scansione a eventi (sweep line) sulla pianificazione del metodo sovrapposto
+"""
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from utils.configurazione import ConfigurazioneGruppoDelPesce
+
+# Risorsa -> (campo quantità, campo inizio, campo fine) nei dettagli del metodo sovrapposto
+FASI_RISORSE = {
+    'vasche_larvali': ('vasche_larvali', 'inizio_giorno', 'fine_larvale_giorno'),
+    'vasche_preingrasso': ('vasche_preingrasso', 'fine_larvale_giorno', 'fine_preingrasso_giorno'),
+    'gabbie_ingrasso': ('gabbie_ingrasso', 'fine_preingrasso_giorno', 'fine_ingrasso_giorno')
+}
+
+
+def capacita_risorse(config: ConfigurazioneGruppoDelPesce) -> Dict[str, int]:
+    """
+    Restituisce il numero totale di unità disponibili per ciascuna risorsa:
+    vasche larvali (piccole + medie + grandi), vasche di preingrasso e gabbie
+    in mare distribuite sugli impianti produttivi.
+    """
+    return {
+        'vasche_larvali': config.vasche_larvali_piccole + config.vasche_larvali_medie + config.vasche_larvali_grandi,
+        'vasche_preingrasso': config.vasche_preingrasso,
+        'gabbie_ingrasso': config.gabbie_per_impianto * config.numero_impianti
+    }
+
+
+def profilo_occupazione(inizi: np.ndarray, fini: np.ndarray, quantita: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Costruisce la funzione a gradini dell'occupazione a partire da intervalli
+    semiaperti [inizio, fine) ciascuno con la sua quantità di unità. Ogni
+    intervallo genera un evento +quantita all'inizio e -quantita alla fine;
+    gli eventi sono ordinati (O(n log n)) e la somma cumulativa dà
+    l'occupazione. Restituisce i giorni di cambio e l'occupazione valida da
+    ciascun giorno fino al successivo (l'ultimo valore è sempre 0). Senza
+    intervalli restituisce due array vuoti.
+    """
+    inizi = np.asarray(inizi, dtype=np.int64)
+    fini = np.asarray(fini, dtype=np.int64)
+    quantita = np.asarray(quantita, dtype=np.int64)
+    if len(inizi) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    giorni = np.concatenate([inizi, fini])
+    delta = np.concatenate([quantita, -quantita])
+    ordine = np.argsort(giorni, kind='stable')
+    giorni = giorni[ordine]
+    occupazione = np.cumsum(delta[ordine])
+
+    # Per giorni con più eventi vale l'occupazione dopo l'ultimo evento del giorno
+    ultimo_del_giorno = np.append(giorni[1:] != giorni[:-1], True)
+    return giorni[ultimo_del_giorno], occupazione[ultimo_del_giorno]
+
+
+def intervalli_sovraccarico(giorni: np.ndarray, occupazione: np.ndarray, capacita: int) -> List[Tuple[int, int, int]]:
+    """
+    Restituisce gli intervalli [inizio, fine) in cui l'occupazione supera la
+    capacità, unendo gradini consecutivi, con il picco raggiunto in ciascuno.
+    """
+    sopra = occupazione > capacita
+    if not sopra.any():
+        return []
+
+    bordi = np.diff(np.concatenate([[0], sopra.astype(np.int8), [0]]))
+    inizi_run = np.flatnonzero(bordi == 1)
+    fini_run = np.flatnonzero(bordi == -1)
+    return [
+        (int(giorni[i]), int(giorni[j]), int(occupazione[i:j].max()))
+        for i, j in zip(inizi_run, fini_run)
+    ]
+
+
+def calcola_occupazione_risorse(risultati_sov: Dict, config: ConfigurazioneGruppoDelPesce) -> Dict[str, Dict]:
+    """
+    Calcola per vasche larvali, vasche di preingrasso e gabbie di ingrasso il
+    profilo di occupazione contemporanea nella pianificazione sovrapposta.
+    Per ogni risorsa restituisce capacità, giorni e occupazione della funzione
+    a gradini, picco e giorno del picco, intervalli oltre capacità e
+    percentuale di utilizzo (unità-giorno occupate rispetto alle unità-giorno
+    disponibili fino al tempo totale). Un piano è realizzabile solo se nessuna
+    risorsa ha intervalli di sovraccarico.
+    """
+    dettagli = risultati_sov['dettagli']
+    orizzonte = risultati_sov['tempo_totale']
+    capacita = capacita_risorse(config)
+
+    occupazioni = {}
+    for risorsa, (campo_quantita, campo_inizio, campo_fine) in FASI_RISORSE.items():
+        inizi = np.fromiter((d[campo_inizio] for d in dettagli), dtype=np.int64, count=len(dettagli))
+        fini = np.fromiter((d[campo_fine] for d in dettagli), dtype=np.int64, count=len(dettagli))
+        quantita = np.fromiter((d[campo_quantita] for d in dettagli), dtype=np.int64, count=len(dettagli))
+
+        giorni, occupazione = profilo_occupazione(inizi, fini, quantita)
+        unita_giorno = int(np.sum(occupazione[:-1] * np.diff(giorni))) if len(giorni) > 1 else 0
+        indice_picco = int(np.argmax(occupazione)) if len(occupazione) else 0
+
+        occupazioni[risorsa] = {
+            'capacita': capacita[risorsa],
+            'giorni': giorni,
+            'occupazione': occupazione,
+            'picco': int(occupazione[indice_picco]) if len(occupazione) else 0,
+            'giorno_picco': int(giorni[indice_picco]) if len(giorni) else 0,
+            'intervalli_sovraccarico': intervalli_sovraccarico(giorni, occupazione, capacita[risorsa]),
+            'utilizzo_percentuale': round(unita_giorno / (capacita[risorsa] * orizzonte) * 100, 1)
+            if capacita[risorsa] and orizzonte else 0.0
+        }
+    return occupazioni
@@ -0,0 +1,295 @@
+"""
+MODULO OTTIMIZZAZIONE INFRASTRUTTURA - GRUPPO DEL PESCE
+Ricerca del piano di investimento (vasche larvali, vasche preingrasso, gabbie)
+di costo minimo che permette di raggiungere la capacità produttiva annua,
+con ricottura simulata su conteggi interi, potatura dei candidati non
+realizzabili, valutazioni memorizzate e catene eseguite in parallelo
+"""
+import copy
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from data_model.lotto_produzione_model import LottoProduzione
+from utils.array_lotti import calcola_quantita_lotti, lotti_in_array, pianifica_sovrapposta
+from utils.calcolo_vasche import (CAPACITA_VASCHE_LARVALI, UNITA_VOLUME_LARVALE, domanda_vasche_larvali,
+                                  lotti_larvali_contemporanei, vasche_larvali_disponibili)
+from utils.configurazione import ConfigurazioneGruppoDelPesce
+from utils.occupazione_risorse import FASI_RISORSE, capacita_risorse, profilo_occupazione
+
+# Variabili di decisione: attributi di ConfigurazioneGruppoDelPesce incrementabili
+VARIABILI = ('vasche_larvali_piccole', 'vasche_larvali_medie', 'vasche_larvali_grandi',
+             'vasche_preingrasso', 'gabbie_per_impianto')
+
+# Variabili delle vasche larvali, nell'ordine di CAPACITA_VASCHE_LARVALI
+VARIABILI_LARVALI = VARIABILI[:3]
+
+# Risorsa aggregata a cui contribuisce ciascuna variabile
+RISORSA_VARIABILE = {
+    'vasche_larvali_piccole': 'vasche_larvali',
+    'vasche_larvali_medie': 'vasche_larvali',
+    'vasche_larvali_grandi': 'vasche_larvali',
+    'vasche_preingrasso': 'vasche_preingrasso',
+    'gabbie_per_impianto': 'gabbie_ingrasso'
+}
+
+
+def profilo_scenario(lotti: List[LottoProduzione], config: ConfigurazioneGruppoDelPesce) -> Dict:
+    """
+    Simula in forma vettoriale il metodo sovrapposto per un insieme di lotti,
+    usando il fabbisogno effettivo di vasche e gabbie (senza il limite delle
+    unità disponibili), e ne ricava ciò che serve a valutare qualsiasi
+    infrastruttura: tonnellate e durata del ciclo, picco di occupazione
+    contemporanea (scansione a eventi) e fabbisogno massimo di un singolo
+    lotto per ciascuna risorsa. Per le vasche larvali, che hanno capienze
+    diverse, servono invece il volume richiesto dal lotto più grande (in
+    unità di volume) e il massimo di lotti contemporaneamente in fase
+    larvale. Il profilo non dipende dall'infrastruttura, per cui ogni
+    scenario viene simulato una sola volta.
+    """
+    array_lotti, array_specie, _ = lotti_in_array(lotti)
+    quantita = calcola_quantita_lotti(array_lotti['indice_specie'], array_lotti['numero_larve'], array_specie,
+                                      config, limita_risorse=False)
+    piano = pianifica_sovrapposta(array_lotti['indice_specie'], array_specie)
+
+    domanda_larvale = domanda_vasche_larvali(array_lotti['numero_larve'],
+                                             array_specie['densita_semina_larvale'][array_lotti['indice_specie']])
+    _, lotti_in_fase_larvale = profilo_occupazione(piano['inizio_giorno'], piano['fine_larvale_giorno'],
+                                                   np.ones(len(lotti), dtype=np.int64))
+
+    picchi = {}
+    massimi_lotto = {}
+    for risorsa, (campo_quantita, campo_inizio, campo_fine) in FASI_RISORSE.items():
+        _, occupazione = profilo_occupazione(piano[campo_inizio], piano[campo_fine], quantita[campo_quantita])
+        picchi[risorsa] = int(occupazione.max(initial=0))
+        massimi_lotto[risorsa] = int(quantita[campo_quantita].max(initial=0))
+
+    return {
+        'tonnellate_ciclo': float(np.round(quantita['tonnellate_prodotte'], 2).sum()),
+        'tempo_totale': int(piano['fine_ingrasso_giorno'].max(initial=0)),
+        'picchi': picchi,
+        'massimi_lotto': massimi_lotto,
+        'domanda_larvale_massima': int(domanda_larvale.max(initial=0)),
+        'picco_lotti_larvali': int(lotti_in_fase_larvale.max(initial=0))
+    }
+
+
+def _configurazione_candidato(incrementi: Tuple[int, ...], config: ConfigurazioneGruppoDelPesce) -> ConfigurazioneGruppoDelPesce:
+    candidato = copy.copy(config)
+    for variabile, incremento in zip(VARIABILI, incrementi):
+        setattr(candidato, variabile, getattr(config, variabile) + incremento)
+    return candidato
+
+
+def valuta_candidato(incrementi: Tuple[int, ...], profili: List[Dict], config: ConfigurazioneGruppoDelPesce,
+                     costi_unitari: Dict[str, float]) -> Dict:
+    """
+    Valuta un piano di investimento (unità aggiuntive per ciascuna variabile).
+    Un candidato è potato come non realizzabile se una risorsa ha meno unità
+    del fabbisogno di un singolo lotto, o se il parco di vasche larvali non
+    ha il volume del lotto più grande: è il caso in cui calcola_vasche_*
+    taglierebbe il fabbisogno al totale disponibile. Altrimenti in ogni
+    scenario si possono condurre in parallelo tante linee sovrapposte quante
+    ne consente la risorsa più vincolata: capacità // picco di occupazione,
+    e per le vasche larvali i lotti più grandi che il parco, tipo per tipo,
+    ospita insieme (lotti_larvali_contemporanei) // picco di lotti in fase
+    larvale. La produzione annua è linee x tonnellate per ciclo x 365 / durata ciclo,
+    come nella stima di main(); uno scenario senza lotti non produce nulla. Restituisce costo, produzione annua media
+    sugli scenari e flag di realizzabilità.
+    """
+    candidato = _configurazione_candidato(incrementi, config)
+    parco_larvale = vasche_larvali_disponibili(candidato)
+    # Le vasche larvali sono valutate sul parco per tipo, le altre risorse in unità
+    capacita = capacita_risorse(candidato)
+    del capacita['vasche_larvali']
+    costo = sum(
+        incremento * costi_unitari.get(variabile, 0.0) * (config.numero_impianti if variabile == 'gabbie_per_impianto' else 1)
+        for variabile, incremento in zip(VARIABILI, incrementi)
+    )
+
+    realizzabile = all(
+        all(capacita[r] >= p['massimi_lotto'][r] for r in capacita)
+        and lotti_larvali_contemporanei(parco_larvale, p['domanda_larvale_massima'], 1) == 1
+        for p in profili
+    )
+    produzione = 0.0
+    if realizzabile:
+        for p in profili:
+            if p['tempo_totale'] == 0 or p['picco_lotti_larvali'] == 0:
+                continue
+            linee = min((capacita[r] // p['picchi'][r] for r in capacita if p['picchi'][r] > 0), default=0)
+            lotti_larvali = lotti_larvali_contemporanei(parco_larvale, p['domanda_larvale_massima'],
+                                                        linee * p['picco_lotti_larvali'])
+            linee = min(linee, lotti_larvali // p['picco_lotti_larvali'])
+            produzione += linee * p['tonnellate_ciclo'] * 365 / p['tempo_totale']
+        produzione /= len(profili)
+
+    return {'costo': costo, 'produzione_annua': produzione, 'realizzabile': realizzabile}
+
+
+def limiti_ricerca(profili: List[Dict], config: ConfigurazioneGruppoDelPesce,
+                   target: float) -> Tuple[List[int], List[int], Dict[str, int]]:
+    """
+    Calcola i limiti inferiore e superiore degli incrementi per ciascuna
+    variabile e il minimo di unità totali per risorsa. Il minimo è il
+    fabbisogno del lotto più grande (sotto non si evita il taglio di
+    calcola_vasche_*) e fissa il limite inferiore di vasche preingrasso e
+    gabbie; per le vasche larvali il minimo riguarda il volume del parco, che
+    si può raggiungere con tipi diversi, per cui il loro limite inferiore
+    resta 0 e i parchi troppo piccoli sono potati da valuta_candidato. Il massimo
+    corrisponde alle linee necessarie per il target nello scenario meno
+    produttivo moltiplicate per il picco di occupazione: oltre, un'unità in
+    più non può aumentare la produzione. Per ogni tipo di vasca larvale il
+    massimo è il numero di vasche di quel tipo con cui da solo il parco
+    ospiterebbe i lotti più grandi di tutte le linee necessarie.
+    """
+    capacita_attuale = capacita_risorse(config)
+    linee_necessarie = max((math.ceil(target / (p['tonnellate_ciclo'] * 365 / p['tempo_totale']))
+                            for p in profili if p['tonnellate_ciclo'] > 0), default=0)
+    minimi = {r: max(p['massimi_lotto'][r] for p in profili) for r in capacita_attuale}
+    massimi = {r: max(minimi[r], linee_necessarie * max(p['picchi'][r] for p in profili)) for r in capacita_attuale}
+
+    lotti_larvali = linee_necessarie * max(p['picco_lotti_larvali'] for p in profili)
+    domanda_larvale = max(p['domanda_larvale_massima'] for p in profili)
+    vasche_per_tipo = {
+        variabile: lotti_larvali * math.ceil(domanda_larvale * UNITA_VOLUME_LARVALE / capacita)
+        for variabile, capacita in zip(VARIABILI_LARVALI, CAPACITA_VASCHE_LARVALI)
+    }
+
+    inferiori, limiti = [], []
+    for variabile in VARIABILI:
+        if variabile in vasche_per_tipo:
+            inferiori.append(0)
+            limiti.append(max(0, vasche_per_tipo[variabile] - getattr(config, variabile)))
+            continue
+        risorsa = RISORSA_VARIABILE[variabile]
+        mancanti_minimo = max(0, minimi[risorsa] - capacita_attuale[risorsa])
+        mancanti = max(0, massimi[risorsa] - capacita_attuale[risorsa])
+        if variabile == 'gabbie_per_impianto':
+            mancanti_minimo = math.ceil(mancanti_minimo / config.numero_impianti)
+            mancanti = math.ceil(mancanti / config.numero_impianti)
+        inferiori.append(mancanti_minimo)
+        limiti.append(mancanti)
+    return inferiori, limiti, minimi
+
+
+def _catena_ricottura(profili: List[Dict], config: ConfigurazioneGruppoDelPesce, costi_unitari: Dict[str, float],
+                      target: float, inferiori: List[int], limiti: List[int], iterazioni: int,
+                      temperatura_iniziale: float, seed: int) -> Dict:
+    """
+    Esegue una catena di ricottura simulata sugli incrementi interi compresi
+    tra i limiti inferiori e superiori, partendo dal limite superiore (sempre
+    realizzabile). L'energia è il costo per i
+    candidati che raggiungono il target; gli altri valgono il costo del
+    limite superiore più una penalità proporzionale al deficit, così ogni
+    candidato valido è preferito a ogni candidato non valido. Le valutazioni
+    sono memorizzate per tupla di incrementi.
+    """
+    rng = random.Random(seed)
+    memo: Dict[Tuple[int, ...], Tuple[float, Dict]] = {}
+    valutazioni = 0
+    costo_massimo = valuta_candidato(tuple(limiti), profili, config, costi_unitari)['costo'] or 1.0
+
+    def energia(incrementi):
+        nonlocal valutazioni
+        if incrementi not in memo:
+            valutazioni += 1
+            esito = valuta_candidato(incrementi, profili, config, costi_unitari)
+            deficit = max(0.0, target - esito['produzione_annua']) if esito['realizzabile'] else target
+            valore = esito['costo'] if deficit == 0 else costo_massimo * (1 + deficit / target)
+            memo[incrementi] = (valore, esito)
+        return memo[incrementi]
+
+    corrente = tuple(limiti)
+    e_corrente, _ = energia(corrente)
+    migliore, e_migliore = corrente, e_corrente
+    temperatura = temperatura_iniziale or costo_massimo * 0.1
+    raffreddamento = (1e-3) ** (1 / max(iterazioni, 1))
+
+    for _ in range(iterazioni):
+        vicino = list(corrente)
+        i = rng.randrange(len(vicino))
+        passo = max(1, int(abs(rng.gauss(0, max(1, limiti[i] - inferiori[i]) * 0.1))))
+        vicino[i] = min(limiti[i], max(inferiori[i], vicino[i] + rng.choice((-passo, passo))))
+        vicino = tuple(vicino)
+
+        e_vicino, _ = energia(vicino)
+        if e_vicino <= e_corrente or rng.random() < math.exp((e_corrente - e_vicino) / max(temperatura, 1e-12)):
+            corrente, e_corrente = vicino, e_vicino
+            if e_corrente < e_migliore:
+                migliore, e_migliore = corrente, e_corrente
+        temperatura *= raffreddamento
+
+    return {'incrementi': migliore, 'esito': memo[migliore][1], 'valutazioni': valutazioni, 'richieste': iterazioni + 1}
+
+
+def ottimizza_infrastruttura(scenari: List[List[LottoProduzione]], config: ConfigurazioneGruppoDelPesce,
+                             costi_unitari: Dict[str, float], target: Optional[float] = None,
+                             catene: int = 4, iterazioni: int = 5000, temperatura_iniziale: float = None,
+                             processi: int = None, seed: int = None) -> Dict:
+    """
+    Cerca quante unità aggiungere a vasche larvali (piccole, medie, grandi),
+    vasche preingrasso e gabbie per impianto per raggiungere il target di
+    produzione annua (di default CAPACITA_PRODUTTIVA_ANNUA) al costo minimo.
+    `costi_unitari` associa a ogni variabile il costo di un'unità (per le
+    gabbie: costo di una gabbia, moltiplicato per il numero di impianti).
+    Ogni scenario di lotti viene simulato una volta, in parallelo; poi più
+    catene di ricottura simulata indipendenti esplorano lo spazio potato dai
+    limiti di limiti_ricerca, su un pool di processi, e si restituisce la
+    migliore. Se il target non è raggiungibile neppure al limite superiore il
+    risultato lo segnala con raggiunto=False.
+    """
+    target = target if target is not None else config.capacita_produttiva_annua
+    rng = random.Random(seed)
+    processi = processi or os.cpu_count() or 1
+
+    with ProcessPoolExecutor(max_workers=processi) as pool:
+        profili = list(pool.map(profilo_scenario, scenari, [config] * len(scenari)))
+        inferiori, limiti, minimi = limiti_ricerca(profili, config, target)
+
+        futures = [
+            pool.submit(_catena_ricottura, profili, config, costi_unitari, target, inferiori, limiti,
+                        iterazioni, temperatura_iniziale, rng.randrange(2**32))
+            for _ in range(catene)
+        ]
+        esiti = [f.result() for f in futures]
+
+    migliore = min(esiti, key=lambda e: (not e['esito']['produzione_annua'] >= target, e['esito']['costo']))
+    return {
+        'incrementi': dict(zip(VARIABILI, migliore['incrementi'])),
+        'costo': migliore['esito']['costo'],
+        'produzione_annua': migliore['esito']['produzione_annua'],
+        'target': target,
+        'raggiunto': migliore['esito']['realizzabile'] and migliore['esito']['produzione_annua'] >= target,
+        'limiti_inferiori': dict(zip(VARIABILI, inferiori)),
+        'limiti_superiori': dict(zip(VARIABILI, limiti)),
+        'minimi_per_risorsa': minimi,
+        'valutazioni': sum(e['valutazioni'] for e in esiti),
+        'valutazioni_richieste': sum(e['richieste'] for e in esiti)
+    }
+
+
+def stampa_ottimizzazione(risultato: Dict):
+    """
+    Stampa su console il piano di investimento trovato con costo, produzione
+    annua stimata rispetto al target e statistiche della ricerca.
+    """
+    righe = [
+        f"\n{'='*80}",
+        "OTTIMIZZAZIONE INFRASTRUTTURA - PIANO DI INVESTIMENTO",
+        f"{'='*80}"
+    ]
+    for variabile, incremento in risultato['incrementi'].items():
+        righe.append(f"   + {incremento:>5} {variabile}")
+    righe += [
+        f"\n   Costo investimento: {risultato['costo']:,.0f}",
+        f"   Produzione annua stimata: {risultato['produzione_annua']:,.0f} t "
+        f"(target {risultato['target']:,} t - {'raggiunto' if risultato['raggiunto'] else 'NON raggiunto'})",
+        f"   Valutazioni: {risultato['valutazioni']:,} su {risultato['valutazioni_richieste']:,} richieste (memorizzazione)",
+        f"{'='*80}\n"
+    ]
+    print("\n".join(righe))
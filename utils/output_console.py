@@ -0,0 +1,217 @@
+"""
+MODULO OUTPUT CONSOLE - GRUPPO DEL PESCE
+Formattazione bufferizzata dei risultati e dei lotti: il testo viene costruito
+in memoria e scritto a blocchi, con una sola scrittura per blocco di lotti
+"""
+import csv
+import io
+import json
+import sys
+from typing import Dict, Iterable, Iterator, List, TextIO
+
+from data_model.lotto_produzione_model import LottoProduzione
+
+MODALITA_OUTPUT = ('completo', 'sintesi', 'tabella', 'jsonl', 'csv')
+DIMENSIONE_BLOCCO = 1000  # lotti formattati per ogni scrittura sullo stream
+
+# Colonne CSV comuni ai due metodi: i campi assenti in un metodo restano vuoti
+COLONNE_CSV = [
+    'metodo', 'specie', 'larve_seminate', 'vasche_larvali', 'vasche_preingrasso', 'gabbie_ingrasso',
+    'inizio_giorno', 'fine_larvale_giorno', 'fine_preingrasso_giorno', 'fine_ingrasso_giorno',
+    'giorni_larvali', 'giorni_preingrasso', 'giorni_ingrasso', 'giorni_totali',
+    'larve_sopravvissute', 'avannotti_2g', 'pesci_commerciali', 'tonnellate_prodotte', 'tasso_sopravvivenza_totale'
+]
+
+
+def _blocchi(elementi: Iterable, dimensione: int) -> Iterator[List]:
+    """
+    Suddivide una sequenza (anche un generatore) in liste di al massimo
+    `dimensione` elementi, senza materializzarla interamente.
+    """
+    blocco = []
+    for elemento in elementi:
+        blocco.append(elemento)
+        if len(blocco) >= dimensione:
+            yield blocco
+            blocco = []
+    if blocco:
+        yield blocco
+
+
+def verifica_modalita(modalita: str):
+    """
+    Solleva ValueError se la modalità di output non è tra MODALITA_OUTPUT.
+    """
+    if modalita not in MODALITA_OUTPUT:
+        raise ValueError(f"Modalità di output non valida: {modalita!r} (ammesse: {', '.join(MODALITA_OUTPUT)})")
+
+
+def _formatta_dettaglio_completo(dettaglio: Dict) -> str:
+    """
+    Restituisce il blocco di testo completo di un lotto (numeri, risorse,
+    tempi e performance), identico a quello storico di stampa_risultati.
+    """
+    righe = [
+        f"\n Specie: {dettaglio['specie']}",
+        f"    NUMERI:",
+        f"      Larve seminate: {dettaglio['larve_seminate']:,} larve",
+        f"      Avannotti prodotti (2g): {dettaglio['avannotti_2g']:,}",
+        f"      Pesci commerciali: {dettaglio['pesci_commerciali']:,}",
+        f"      Tonnellate prodotte: {dettaglio['tonnellate_prodotte']} t",
+        f"\n    RISORSE UTILIZZATE:",
+        f"      Vasche larvali: {dettaglio['vasche_larvali']}",
+        f"      Vasche preingrasso: {dettaglio['vasche_preingrasso']}",
+        f"      Gabbie ingrasso: {dettaglio['gabbie_ingrasso']}",
+        f"\n     TEMPI:"
+    ]
+    if 'inizio_giorno' in dettaglio:
+        righe += [
+            f"      Inizio ciclo: giorno {dettaglio['inizio_giorno']}",
+            f"      Fine larvale: giorno {dettaglio['fine_larvale_giorno']} ({dettaglio['giorni_larvali']}gg)",
+            f"      Fine preingrasso: giorno {dettaglio['fine_preingrasso_giorno']} ({dettaglio['giorni_preingrasso']}gg)",
+            f"      Fine ingrasso: giorno {dettaglio['fine_ingrasso_giorno']} ({dettaglio['giorni_ingrasso']}gg)"
+        ]
+    else:
+        righe += [
+            f"      Fase larvale: {dettaglio['giorni_larvali']} giorni",
+            f"      Fase preingrasso: {dettaglio['giorni_preingrasso']} giorni",
+            f"      Fase ingrasso: {dettaglio['giorni_ingrasso']} giorni",
+            f"      Tempo totale: {dettaglio['giorni_totali']} giorni"
+        ]
+    righe += [
+        f"\n    PERFORMANCE:",
+        f"      Tasso sopravvivenza totale: {dettaglio['tasso_sopravvivenza_totale']}%"
+    ]
+    return "\n".join(righe)
+
+
+def _formatta_riga_tabella(dettaglio: Dict) -> str:
+    """
+    Restituisce una riga a larghezza fissa con i dati essenziali di un lotto.
+    """
+    fine = dettaglio.get('fine_ingrasso_giorno', dettaglio.get('giorni_totali', 0))
+    return (f"{dettaglio['specie'][:40]:<40} {dettaglio['larve_seminate']:>13,} {dettaglio['pesci_commerciali']:>12,} "
+            f"{dettaglio['tonnellate_prodotte']:>10.2f} {dettaglio['vasche_larvali']:>5} {dettaglio['vasche_preingrasso']:>5} "
+            f"{dettaglio['gabbie_ingrasso']:>5} {fine:>7} {dettaglio['tasso_sopravvivenza_totale']:>6.1f}%")
+
+
+INTESTAZIONE_TABELLA = (f"{'SPECIE':<40} {'LARVE':>13} {'PESCI COMM.':>12} {'TONN.':>10} {'VL':>5} {'VP':>5} "
+                        f"{'GI':>5} {'GIORNI':>7} {'SOPR.':>7}")
+
+
+def scrivi_risultati(risultati: Dict, modalita: str = 'completo', stream: TextIO = None,
+                     dimensione_blocco: int = DIMENSIONE_BLOCCO, intestazione_csv: bool = True):
+    """
+    Scrive i risultati di una simulazione sullo stream (stdout se assente)
+    nella modalità richiesta:
+    - completo: blocco di testo dettagliato per ogni lotto e totali
+    - sintesi: solo metodo, numero lotti, tempo totale e produzione totale
+    - tabella: una riga a larghezza fissa per lotto e totali
+    - jsonl: un oggetto JSON per lotto ("tipo": "lotto") e uno finale ("tipo": "totale")
+    - csv: una riga per lotto sulle COLONNE_CSV; con intestazione_csv=False
+      l'intestazione viene omessa, per accodare più metodi nella stessa tabella
+    I lotti vengono formattati a blocchi di `dimensione_blocco` e ogni blocco
+    è scritto con una sola chiamata a write; i totali sono accumulati durante
+    lo scorrimento, senza una seconda passata sui dettagli.
+    """
+    verifica_modalita(modalita)
+    stream = stream or sys.stdout
+    metodo = risultati['metodo']
+    dettagli = risultati['dettagli']
+    tot_tonnellate = 0.0
+    tot_pesci = 0
+    n_lotti = 0
+
+    if modalita == 'completo':
+        stream.write(f"\n{'='*80}\nRISULTATI SIMULAZIONE - {metodo}\n{'='*80}\n")
+    elif modalita == 'tabella':
+        stream.write(f"\n{metodo}\n{INTESTAZIONE_TABELLA}\n{'-'*len(INTESTAZIONE_TABELLA)}\n")
+    elif modalita == 'csv' and intestazione_csv:
+        # Intestazione dalle colonne, scritta anche se il metodo non ha lotti
+        stream.write(",".join(COLONNE_CSV) + "\n")
+
+    for blocco in _blocchi(dettagli, dimensione_blocco):
+        n_lotti += len(blocco)
+        tot_tonnellate += sum(d['tonnellate_prodotte'] for d in blocco)
+        tot_pesci += sum(d['pesci_commerciali'] for d in blocco)
+
+        if modalita == 'sintesi':
+            continue
+        if modalita == 'completo':
+            testo = "\n".join(_formatta_dettaglio_completo(d) for d in blocco) + "\n"
+        elif modalita == 'tabella':
+            testo = "\n".join(_formatta_riga_tabella(d) for d in blocco) + "\n"
+        elif modalita == 'jsonl':
+            testo = "".join(json.dumps({'tipo': 'lotto', 'metodo': metodo, **d}, ensure_ascii=False) + "\n" for d in blocco)
+        else:
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=COLONNE_CSV, extrasaction='ignore', lineterminator="\n")
+            writer.writerows({'metodo': metodo, **d} for d in blocco)
+            testo = buffer.getvalue()
+        stream.write(testo)
+
+    if modalita == 'completo':
+        stream.write(f"\n{'='*80}\n"
+                     f"️  TEMPO TOTALE CICLO PRODUTTIVO: {risultati['tempo_totale']} giorni\n"
+                     f" PRODUZIONE TOTALE: {tot_tonnellate:.2f} tonnellate ({tot_pesci:,} pesci)\n"
+                     f"{'='*80}\n\n")
+    elif modalita in ('sintesi', 'tabella'):
+        stream.write(f"{'='*80}\n{metodo}: {n_lotti:,} lotti | tempo totale {risultati['tempo_totale']} giorni | "
+                     f"produzione {tot_tonnellate:.2f} t ({tot_pesci:,} pesci)\n{'='*80}\n")
+    elif modalita == 'jsonl':
+        stream.write(json.dumps({'tipo': 'totale', 'metodo': metodo, 'lotti': n_lotti,
+                                 'tempo_totale': risultati['tempo_totale'],
+                                 'tonnellate_totali': round(tot_tonnellate, 2), 'pesci_totali': tot_pesci},
+                                ensure_ascii=False) + "\n")
+    stream.flush()
+
+
+def scrivi_lotti(lotti: Iterable[LottoProduzione], modalita: str = 'completo', stream: TextIO = None,
+                 dimensione_blocco: int = DIMENSIONE_BLOCCO):
+    """
+    Scrive l'elenco dei lotti generati nella modalità richiesta, con la stessa
+    strategia a blocchi di scrivi_risultati. In modalità sintesi riporta solo
+    numero di lotti e larve totali.
+    """
+    verifica_modalita(modalita)
+    stream = stream or sys.stdout
+    n_lotti = 0
+    tot_larve = 0
+
+    if modalita == 'completo':
+        stream.write("\n Lotti generati:\n")
+    elif modalita == 'csv':
+        stream.write("specie,numero_larve,densita_semina_larvale,taglia_commerciale\n")
+
+    for blocco in _blocchi(lotti, dimensione_blocco):
+        n_lotti += len(blocco)
+        tot_larve += sum(l.numero_larve for l in blocco)
+
+        if modalita == 'sintesi':
+            continue
+        if modalita == 'completo':
+            testo = "".join(
+                f"   - {l.specie.nome}\n"
+                f"     Larve da seminare: {l.numero_larve:,} larve\n"
+                f"     Densità larvale: {l.specie.densita_semina_larvale} larve/litro\n"
+                f"     Taglia commerciale target: {l.specie.taglia_commerciale}g\n"
+                for l in blocco)
+        elif modalita == 'tabella':
+            testo = "".join(f"   {l.specie.nome[:40]:<40} {l.numero_larve:>13,} larve\n" for l in blocco)
+        elif modalita == 'jsonl':
+            testo = "".join(json.dumps({'tipo': 'lotto_generato', 'specie': l.specie.nome,
+                                        'numero_larve': l.numero_larve,
+                                        'densita_semina_larvale': l.specie.densita_semina_larvale,
+                                        'taglia_commerciale': l.specie.taglia_commerciale},
+                                       ensure_ascii=False) + "\n" for l in blocco)
+        else:
+            buffer = io.StringIO()
+            csv.writer(buffer, lineterminator="\n").writerows(
+                (l.specie.nome, l.numero_larve, l.specie.densita_semina_larvale, l.specie.taglia_commerciale)
+                for l in blocco)
+            testo = buffer.getvalue()
+        stream.write(testo)
+
+    if modalita in ('sintesi', 'tabella'):
+        stream.write(f"\n Lotti generati: {n_lotti:,} ({tot_larve:,} larve totali)\n")
+    stream.flush()
@@ -0,0 +1,158 @@
+"""
+MODULO PIANIFICAZIONE MANGIME - GRUPPO DEL PESCE
+Biomassa giornaliera per lotto e fabbisogno di mangime per impianto e giorno,
+calcolati in forma vettoriale: espansione lotto-giorno con somme cumulative
+e aggregazione con np.bincount
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from data_model.lotto_produzione_model import LottoProduzione
+from utils.array_lotti import lotti_in_array
+
+# Pesi indicativi (grammi) di inizio e fine fase larvale; le fasi successive
+# vanno fino a taglia_vendita_avannotto e taglia_commerciale della specie
+PESO_LARVA = 0.001
+PESO_FINE_LARVALE = 0.05
+
+# Indice di conversione alimentare (kg mangime / kg accrescimento) in funzione
+# del peso individuale in grammi: valori indicativi, interpolati linearmente
+CURVA_FCR_PREDEFINITA = ((0.001, 0.05, 2.0, 50.0, 200.0, 400.0, 1000.0),
+                         (0.8, 0.9, 1.0, 1.3, 1.6, 1.8, 2.0))
+
+RIGHE_PER_BLOCCO = 4_000_000  # righe lotto-giorno elaborate per blocco (limita la memoria)
+
+
+def _segmenti_fasi(piano: Dict[str, np.ndarray], quantita: Dict[str, np.ndarray], indice_specie: np.ndarray,
+                   array_specie: Dict[str, np.ndarray], sito_avannotteria: int,
+                   siti_ingrasso: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Scompone ogni lotto in tre segmenti (larvale, preingrasso, ingrasso) con
+    giorno di inizio e fine, pesi e numero di pesci a inizio e fine fase,
+    sito e specie: le tre fasi sono concatenate in un'unica serie di array.
+    """
+    n = len(indice_specie)
+    taglia_avannotto = array_specie['taglia_vendita_avannotto'][indice_specie]
+    taglia_commerciale = array_specie['taglia_commerciale'][indice_specie]
+    avannotteria = np.full(n, sito_avannotteria, dtype=np.int64)
+
+    return {
+        'inizio': np.concatenate([piano['inizio_giorno'], piano['fine_larvale_giorno'], piano['fine_preingrasso_giorno']]),
+        'fine': np.concatenate([piano['fine_larvale_giorno'], piano['fine_preingrasso_giorno'], piano['fine_ingrasso_giorno']]),
+        'peso_inizio': np.concatenate([np.full(n, PESO_LARVA), np.full(n, PESO_FINE_LARVALE), taglia_avannotto]),
+        'peso_fine': np.concatenate([np.full(n, PESO_FINE_LARVALE), taglia_avannotto, taglia_commerciale]),
+        'pesci_inizio': np.concatenate([quantita['numero_larve'], quantita['larve_sopravvissute'], quantita['avannotti_2g']]).astype(np.float64),
+        'pesci_fine': np.concatenate([quantita['larve_sopravvissute'], quantita['avannotti_2g'], quantita['pesci_commerciali']]).astype(np.float64),
+        'sito': np.concatenate([avannotteria, avannotteria, np.asarray(siti_ingrasso, dtype=np.int64)]),
+        'specie': np.tile(np.asarray(indice_specie, dtype=np.int64), 3),
+        'lotto': np.tile(np.arange(n), 3)
+    }
+
+
+def pianifica_mangime(piano: Dict[str, np.ndarray], quantita: Dict[str, np.ndarray], indice_specie: np.ndarray,
+                      array_specie: Dict[str, np.ndarray], curve_fcr: Sequence[Tuple[Sequence[float], Sequence[float]]],
+                      sito_avannotteria: int = 0, siti_ingrasso: Optional[np.ndarray] = None,
+                      numero_siti: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Calcola biomassa e mangime giornalieri per sito. In ogni fase il peso
+    individuale cresce in modo esponenziale dal peso di inizio a quello di
+    fine fase e il numero di pesci decresce in modo esponenziale secondo la
+    sopravvivenza della fase; il mangime del giorno è FCR(peso) x
+    accrescimento della biomassa dei sopravvissuti. Le fasi di ogni lotto sono
+    espanse in righe lotto-giorno con np.repeat e somme cumulative (nessun
+    ciclo Python sui giorni) e aggregate per (sito, giorno) con np.bincount,
+    a blocchi per contenere la memoria. `piano` contiene i giorni di inizio e
+    fine fase (es. pianifica_sovrapposta o pianifica_sovrapposta_temperatura),
+    `quantita` i pesci per fase (calcola_quantita_lotti più 'numero_larve'),
+    `curve_fcr` una coppia (pesi in g, FCR) per indice di specie. Le fasi
+    larvale e preingrasso sono attribuite al sito dell'avannotteria,
+    l'ingrasso al sito di ciascun lotto. Restituisce matrici siti x giorni di
+    mangime e biomassa in kg e il mangime totale per lotto in kg.
+    """
+    n = len(indice_specie)
+    if siti_ingrasso is None:
+        siti_ingrasso = np.full(n, sito_avannotteria, dtype=np.int64)
+    segmenti = _segmenti_fasi(piano, quantita, indice_specie, array_specie, sito_avannotteria, siti_ingrasso)
+
+    # I lotti che non completano una fase (fine -1, es. serie di temperatura esaurita) sono esclusi
+    validi = (segmenti['inizio'] >= 0) & (segmenti['fine'] > segmenti['inizio'])
+    segmenti = {campo: valori[validi] for campo, valori in segmenti.items()}
+
+    orizzonte = int(segmenti['fine'].max()) if len(segmenti['fine']) else 0
+    numero_siti = numero_siti or (int(segmenti['sito'].max()) + 1 if len(segmenti['sito']) else 1)
+    mangime = np.zeros(numero_siti * orizzonte)
+    biomassa = np.zeros(numero_siti * orizzonte)
+    mangime_lotto = np.zeros(n)
+
+    durate = segmenti['fine'] - segmenti['inizio']
+    # Confini dei blocchi di segmenti in base al numero cumulato di righe lotto-giorno
+    righe_cumulate = np.cumsum(durate)
+    confini = np.searchsorted(righe_cumulate, np.arange(RIGHE_PER_BLOCCO, righe_cumulate[-1] if len(durate) else 0,
+                                                        RIGHE_PER_BLOCCO), side='right')
+    for a, b in zip(np.concatenate([[0], confini]), np.concatenate([confini, [len(durate)]])):
+        if a == b:
+            continue
+        blocco = {campo: valori[a:b] for campo, valori in segmenti.items()}
+        durata = durate[a:b]
+
+        # Espansione lotto-giorno: indice del segmento e giorno relativo t per ogni riga
+        riga_segmento = np.repeat(np.arange(b - a), durata)
+        primo = np.cumsum(durata) - durata
+        t = np.arange(len(riga_segmento)) - primo[riga_segmento]
+        d = durata[riga_segmento].astype(np.float64)
+
+        rapporto_peso = (blocco['peso_fine'] / blocco['peso_inizio'])[riga_segmento]
+        peso = blocco['peso_inizio'][riga_segmento] * rapporto_peso ** (t / d)
+        peso_domani = blocco['peso_inizio'][riga_segmento] * rapporto_peso ** ((t + 1) / d)
+        pesci_inizio = blocco['pesci_inizio'][riga_segmento]
+        rapporto_pesci = np.divide(blocco['pesci_fine'], blocco['pesci_inizio'],
+                                   out=np.zeros(b - a), where=blocco['pesci_inizio'] > 0)[riga_segmento]
+        pesci = pesci_inizio * rapporto_pesci ** (t / d)
+
+        fcr = np.empty(len(riga_segmento))
+        specie_riga = blocco['specie'][riga_segmento]
+        for specie in np.unique(blocco['specie']):
+            maschera = specie_riga == specie
+            pesi_curva, valori_curva = curve_fcr[specie]
+            fcr[maschera] = np.interp(peso[maschera], pesi_curva, valori_curva)
+
+        mangime_riga = fcr * pesci * (peso_domani - peso) / 1000  # kg
+        chiave = blocco['sito'][riga_segmento] * orizzonte + blocco['inizio'][riga_segmento] + t
+        mangime += np.bincount(chiave, weights=mangime_riga, minlength=len(mangime))
+        biomassa += np.bincount(chiave, weights=pesci * peso / 1000, minlength=len(biomassa))
+        mangime_lotto += np.bincount(blocco['lotto'][riga_segmento], weights=mangime_riga, minlength=n)
+
+    return {
+        'mangime_kg': mangime.reshape(numero_siti, orizzonte),
+        'biomassa_kg': biomassa.reshape(numero_siti, orizzonte),
+        'mangime_per_lotto_kg': mangime_lotto
+    }
+
+
+def pianifica_mangime_da_risultati(risultati_sov: Dict, lotti: List[LottoProduzione],
+                                   curve_fcr: Dict[str, Tuple[Sequence[float], Sequence[float]]] = None,
+                                   sito_avannotteria: int = 0, siti_ingrasso: Optional[Sequence[int]] = None) -> Dict[str, np.ndarray]:
+    """
+    Versione di pianifica_mangime che parte dai risultati del metodo
+    sovrapposto e dai lotti simulati (stesso ordine). `curve_fcr` associa al
+    nome della specie una curva (pesi in g, FCR); le specie senza curva usano
+    CURVA_FCR_PREDEFINITA.
+    """
+    curve_fcr = curve_fcr or {}
+    array_lotti, array_specie, nomi_specie = lotti_in_array(lotti)
+    dettagli = risultati_sov['dettagli']
+
+    def colonna(campo):
+        return np.fromiter((d[campo] for d in dettagli), dtype=np.int64, count=len(dettagli))
+
+    piano = {campo: colonna(campo) for campo in ('inizio_giorno', 'fine_larvale_giorno',
+                                                 'fine_preingrasso_giorno', 'fine_ingrasso_giorno')}
+    quantita = {campo: colonna(campo) for campo in ('larve_sopravvissute', 'avannotti_2g', 'pesci_commerciali')}
+    quantita['numero_larve'] = array_lotti['numero_larve']
+
+    return pianifica_mangime(
+        piano, quantita, array_lotti['indice_specie'], array_specie,
+        [curve_fcr.get(nome, CURVA_FCR_PREDEFINITA) for nome in nomi_specie],
+        sito_avannotteria, None if siti_ingrasso is None else np.asarray(siti_ingrasso)
+    )
@@ -0,0 +1,114 @@
+"""
+MODULO PIANIFICAZIONE RACCOLTA - GRUPPO DEL PESCE
+Distribuzione delle raccolte dei lotti sulle settimane per seguire la domanda
+di mercato per specie, con coda di priorità per scadenza (earliest deadline
+first) su una finestra attorno al raggiungimento della taglia commerciale
+"""
+import heapq
+import math
+from typing import Dict, Sequence
+
+import numpy as np
+
+GIORNI_SETTIMANA = 7
+
+
+def pianifica_raccolte(risultati_sov: Dict, domanda_settimanale: Dict[str, Sequence[float]],
+                       anticipo_giorni: int = 0, ritardo_massimo_giorni: int = 56) -> Dict:
+    """
+    Assegna le tonnellate di ciascun lotto alle settimane di raccolta.
+    Un lotto è raccoglibile dalla settimana che contiene
+    fine_ingrasso_giorno - anticipo_giorni fino a quella che contiene
+    fine_ingrasso_giorno + ritardo_massimo_giorni (la settimana k copre i
+    giorni [7k, 7k+7)). Per ogni specie, settimana dopo settimana, la domanda
+    (tonnellate, dalla settimana 0) è servita dai lotti disponibili con la
+    scadenza più vicina, estratti da un heap: la regola earliest deadline
+    first minimizza la domanda non soddisfatta con finestre di questo tipo.
+    Alla scadenza, ciò che resta di un lotto viene raccolto comunque e
+    conteggiato come eccedenza. Costo O((lotti + settimane) log lotti).
+    Restituisce le assegnazioni (lotto, settimana, tonnellate, eccedenza),
+    la domanda non soddisfatta per specie e settimana, le tonnellate in
+    eccedenza e i giorni-gabbia di permanenza oltre la taglia commerciale
+    (gabbie del lotto x giorni tra taglia commerciale e ultima raccolta).
+    """
+    dettagli = risultati_sov['dettagli']
+    n = len(dettagli)
+    fine_ingrasso = np.fromiter((d['fine_ingrasso_giorno'] for d in dettagli), dtype=np.int64, count=n)
+    tonnellate = np.fromiter((d['tonnellate_prodotte'] for d in dettagli), dtype=np.float64, count=n)
+    gabbie = np.fromiter((d['gabbie_ingrasso'] for d in dettagli), dtype=np.int64, count=n)
+    apertura = np.maximum(fine_ingrasso - anticipo_giorni, 0) // GIORNI_SETTIMANA
+    chiusura = (fine_ingrasso + ritardo_massimo_giorni) // GIORNI_SETTIMANA
+
+    residuo = tonnellate.copy()
+    ultima_settimana = np.full(n, -1, dtype=np.int64)
+    assegnazioni = []  # (lotto, settimana, tonnellate, eccedenza)
+    non_soddisfatta = {}
+
+    lotti_per_specie: Dict[str, list] = {}
+    for i, d in enumerate(dettagli):
+        lotti_per_specie.setdefault(d['specie'], []).append(i)
+
+    for specie in set(lotti_per_specie) | set(domanda_settimanale):
+        domanda = np.asarray(domanda_settimanale.get(specie, ()), dtype=np.float64)
+        indici = sorted(lotti_per_specie.get(specie, []), key=lambda i: apertura[i])
+        settimane = max(len(domanda), int(chiusura[indici].max()) + 1 if indici else 0)
+        mancante = np.zeros(settimane)
+        heap = []
+        prossimo = 0
+
+        for settimana in range(settimane):
+            while prossimo < len(indici) and apertura[indici[prossimo]] <= settimana:
+                i = indici[prossimo]
+                prossimo += 1
+                # Lotti senza tonnellate (es. sopravvivenza nulla): niente da raccogliere
+                if residuo[i] <= 1e-12:
+                    continue
+                heapq.heappush(heap, (int(chiusura[i]), i))
+
+            richiesta = domanda[settimana] if settimana < len(domanda) else 0.0
+            while richiesta > 1e-12 and heap:
+                _, i = heap[0]
+                quantita = min(richiesta, residuo[i])
+                residuo[i] -= quantita
+                richiesta -= quantita
+                assegnazioni.append((i, settimana, quantita, False))
+                ultima_settimana[i] = settimana
+                if residuo[i] <= 1e-12:
+                    heapq.heappop(heap)
+            mancante[settimana] = richiesta
+
+            # Lotti a scadenza: il residuo viene raccolto comunque
+            while heap and heap[0][0] <= settimana:
+                _, i = heapq.heappop(heap)
+                if residuo[i] > 1e-12:
+                    assegnazioni.append((i, settimana, residuo[i], True))
+                    ultima_settimana[i] = settimana
+                    residuo[i] = 0.0
+
+        non_soddisfatta[specie] = mancante
+
+    giorno_ultima_raccolta = np.maximum(ultima_settimana * GIORNI_SETTIMANA, fine_ingrasso - anticipo_giorni)
+    giorni_gabbia = gabbie * np.maximum(giorno_ultima_raccolta - fine_ingrasso, 0)
+
+    if assegnazioni:
+        lotto, settimana, quantita, eccedenza = (np.array(colonna) for colonna in zip(*assegnazioni))
+    else:
+        lotto, settimana, quantita, eccedenza = (np.array([], dtype=t) for t in (np.int64, np.int64, np.float64, bool))
+
+    return {
+        'assegnazioni': {'lotto': lotto, 'settimana': settimana, 'tonnellate': quantita, 'eccedenza': eccedenza},
+        'domanda_non_soddisfatta': non_soddisfatta,
+        'tonnellate_non_soddisfatte': float(sum(m.sum() for m in non_soddisfatta.values())),
+        'tonnellate_eccedenza': float(quantita[eccedenza].sum()) if len(quantita) else 0.0,
+        'giorni_gabbia_per_lotto': giorni_gabbia,
+        'giorni_gabbia_trattenuti': int(giorni_gabbia.sum())
+    }
+
+
+def domanda_costante(tonnellate_annue: float, anni: float) -> np.ndarray:
+    """
+    Restituisce una curva di domanda settimanale piatta equivalente a
+    `tonnellate_annue`, su `anni` anni.
+    """
+    settimane = math.ceil(anni * 365 / GIORNI_SETTIMANA)
+    return np.full(settimane, tonnellate_annue * GIORNI_SETTIMANA / 365)
@@ -0,0 +1,381 @@
+"""
+MODULO STATISTICHE IN STREAMING - GRUPPO DEL PESCE
+Statistiche a memoria costante e unibili tra processi per le uscite delle
+simulazioni (tempo totale, tonnellate, raggiungimento del target): media e
+varianza di Welford, quantili con sketch KLL e istogrammi a classi fisse
+"""
+import math
+import random
+from typing import Dict, Iterable, Optional, Sequence
+
+import numpy as np
+
+from utils.configurazione import ConfigurazioneGruppoDelPesce
+
+PERCENTILI_PREDEFINITI = (5, 25, 50, 75, 95, 99)
+
+
+class StatisticheWelford:
+    """
+    Numero di campioni, media, varianza, minimo e massimo aggiornati in
+    streaming con l'algoritmo di Welford. L'unione di due istanze usa la
+    formula di Chan ed è esatta (a meno dell'arrotondamento in virgola
+    mobile): il risultato coincide con quello sull'unione dei campioni.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.media = 0.0
+        self.m2 = 0.0  # somma dei quadrati degli scarti dalla media
+        self.minimo = math.inf
+        self.massimo = -math.inf
+
+    def aggiungi(self, valore: float):
+        self.n += 1
+        delta = valore - self.media
+        self.media += delta / self.n
+        self.m2 += delta * (valore - self.media)
+        self.minimo = min(self.minimo, valore)
+        self.massimo = max(self.massimo, valore)
+
+    def aggiungi_array(self, valori: Sequence[float]):
+        """
+        Aggiunge un blocco di campioni: statistiche del blocco calcolate con
+        NumPy e unite con la formula di Chan.
+        """
+        valori = np.asarray(valori, dtype=np.float64).ravel()
+        if len(valori) == 0:
+            return
+        blocco = StatisticheWelford()
+        blocco.n = len(valori)
+        blocco.media = float(valori.mean())
+        blocco.m2 = float(((valori - blocco.media) ** 2).sum())
+        blocco.minimo = float(valori.min())
+        blocco.massimo = float(valori.max())
+        self.unisci(blocco)
+
+    def unisci(self, altra: 'StatisticheWelford') -> 'StatisticheWelford':
+        if altra.n == 0:
+            return self
+        n = self.n + altra.n
+        delta = altra.media - self.media
+        self.media += delta * altra.n / n
+        self.m2 += altra.m2 + delta * delta * self.n * altra.n / n
+        self.n = n
+        self.minimo = min(self.minimo, altra.minimo)
+        self.massimo = max(self.massimo, altra.massimo)
+        return self
+
+    @property
+    def varianza(self) -> float:
+        """Varianza campionaria (denominatore n - 1)"""
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    @property
+    def deviazione_standard(self) -> float:
+        return math.sqrt(self.varianza)
+
+
+class SketchKLL:
+    """
+    Sketch KLL per i quantili: una pila di compattatori, il livello h
+    conserva campioni di peso 2^h e ha capacità k * (2/3)^(H-1-h) (almeno
+    2), dove H è il numero di livelli. Quando lo sketch supera la capacità
+    totale il primo livello pieno viene ordinato e dimezzato tenendo gli
+    elementi di posto pari o dispari a caso, che passano al livello
+    superiore. La memoria è O(k) indipendentemente dal numero di campioni e
+    due sketch si uniscono concatenando i livelli e compattando: l'errore
+    sul rango normalizzato resta entro errore_rango() (circa 1.3% per k=200,
+    con probabilità 99%) anche dopo un numero qualunque di unioni.
+    """
+
+    def __init__(self, k: int = 200, seed: Optional[int] = None):
+        if k < 8:
+            raise ValueError(f"Il parametro k dello sketch KLL deve essere almeno 8 (indicato {k})")
+        self.k = k
+        self.n = 0
+        self.livelli = [np.empty(0, dtype=np.float64)]
+        self._buffer = []  # campioni singoli non ancora trasferiti nel livello 0
+        self._rng = random.Random(seed)
+
+    def _capacita(self, livello: int) -> int:
+        profondita = len(self.livelli) - 1 - livello
+        return max(int(math.ceil(self.k * (2 / 3) ** profondita)), 2)
+
+    def _svuota_buffer(self):
+        if self._buffer:
+            self.livelli[0] = np.concatenate([self.livelli[0], np.asarray(self._buffer, dtype=np.float64)])
+            self._buffer = []
+
+    def _compatta(self):
+        """
+        Compatta finché il numero di campioni conservati rientra nella
+        capacità totale, partendo ogni volta dal livello pieno più basso.
+        """
+        while sum(len(livello) for livello in self.livelli) > sum(self._capacita(h) for h in range(len(self.livelli))):
+            for h, livello in enumerate(self.livelli):
+                if len(livello) >= self._capacita(h):
+                    break
+            if h + 1 == len(self.livelli):
+                self.livelli.append(np.empty(0, dtype=np.float64))
+            ordinati = np.sort(self.livelli[h])
+            # Con numero dispari di elementi uno resta al livello corrente
+            resto = ordinati[-1:] if len(ordinati) % 2 else ordinati[:0]
+            pari = ordinati[:len(ordinati) - len(resto)]
+            promossi = pari[self._rng.randrange(2)::2]
+            self.livelli[h] = resto
+            self.livelli[h + 1] = np.concatenate([self.livelli[h + 1], promossi])
+
+    def aggiungi(self, valore: float):
+        self._buffer.append(valore)
+        self.n += 1
+        if len(self._buffer) >= self.k:
+            self._svuota_buffer()
+            self._compatta()
+
+    def aggiungi_array(self, valori: Sequence[float]):
+        valori = np.asarray(valori, dtype=np.float64).ravel()
+        if len(valori) == 0:
+            return
+        self._svuota_buffer()
+        self.livelli[0] = np.concatenate([self.livelli[0], valori])
+        self.n += len(valori)
+        self._compatta()
+
+    def unisci(self, altro: 'SketchKLL') -> 'SketchKLL':
+        """
+        Unisce un altro sketch (ad esempio di un worker) in questo. I due
+        sketch devono avere lo stesso k, così la garanzia d'errore resta
+        quella di un singolo sketch.
+        """
+        if altro.k != self.k:
+            raise ValueError(f"Impossibile unire sketch KLL con k diversi ({self.k} e {altro.k})")
+        self._svuota_buffer()
+        altro._svuota_buffer()
+        while len(self.livelli) < len(altro.livelli):
+            self.livelli.append(np.empty(0, dtype=np.float64))
+        for h, livello in enumerate(altro.livelli):
+            self.livelli[h] = np.concatenate([self.livelli[h], livello])
+        self.n += altro.n
+        self._compatta()
+        return self
+
+    def _campioni_pesati(self):
+        self._svuota_buffer()
+        valori = np.concatenate(self.livelli)
+        pesi = np.concatenate([np.full(len(livello), 2 ** h, dtype=np.float64) for h, livello in enumerate(self.livelli)])
+        ordine = np.argsort(valori, kind='stable')
+        return valori[ordine], np.cumsum(pesi[ordine])
+
+    def quantili(self, probabilita: Sequence[float]) -> np.ndarray:
+        """
+        Restituisce i quantili (probabilità in [0, 1]): il più piccolo
+        campione conservato il cui rango pesato raggiunge p x peso totale.
+        """
+        if self.n == 0:
+            return np.full(len(probabilita), np.nan)
+        valori, ranghi = self._campioni_pesati()
+        obiettivi = np.clip(np.asarray(probabilita, dtype=np.float64), 0.0, 1.0) * ranghi[-1]
+        indici = np.minimum(np.searchsorted(ranghi, obiettivi, side='left'), len(valori) - 1)
+        return valori[indici]
+
+    def quantile(self, probabilita: float) -> float:
+        return float(self.quantili([probabilita])[0])
+
+    def rango(self, valore: float) -> float:
+        """Frazione stimata dei campioni minori o uguali a `valore`"""
+        if self.n == 0:
+            return math.nan
+        valori, ranghi = self._campioni_pesati()
+        posizione = np.searchsorted(valori, valore, side='right')
+        return float(ranghi[posizione - 1] / ranghi[-1]) if posizione else 0.0
+
+    def errore_rango(self) -> float:
+        """
+        Errore sul rango normalizzato di un singolo quantile con probabilità
+        99% (approssimazione empirica per sketch KLL con questo k).
+        """
+        return 2.296 / self.k ** 0.9723
+
+    @property
+    def campioni_conservati(self) -> int:
+        return sum(len(livello) for livello in self.livelli) + len(self._buffer)
+
+
+class IstogrammaFisso:
+    """
+    Istogramma con classi fisse di uguale ampiezza su [minimo, massimo), più
+    i conteggi dei valori sotto e sopra l'intervallo. Due istogrammi con gli
+    stessi estremi e numero di classi si uniscono in modo esatto sommando i
+    conteggi; i quantili interpolati hanno errore al più pari all'ampiezza
+    di una classe per i valori interni all'intervallo.
+    """
+
+    def __init__(self, minimo: float, massimo: float, classi: int = 100):
+        if not massimo > minimo or classi < 1:
+            raise ValueError(f"Istogramma non valido: [{minimo}, {massimo}) con {classi} classi")
+        self.minimo = float(minimo)
+        self.massimo = float(massimo)
+        self.classi = classi
+        self.conteggi = np.zeros(classi, dtype=np.int64)
+        self.sotto = 0
+        self.sopra = 0
+
+    @property
+    def bordi(self) -> np.ndarray:
+        return np.linspace(self.minimo, self.massimo, self.classi + 1)
+
+    @property
+    def n(self) -> int:
+        return int(self.conteggi.sum()) + self.sotto + self.sopra
+
+    def aggiungi(self, valore: float):
+        self.aggiungi_array([valore])
+
+    def aggiungi_array(self, valori: Sequence[float]):
+        valori = np.asarray(valori, dtype=np.float64).ravel()
+        sotto = valori < self.minimo
+        sopra = valori >= self.massimo
+        self.sotto += int(sotto.sum())
+        self.sopra += int(sopra.sum())
+        interni = valori[~(sotto | sopra)]
+        classe = ((interni - self.minimo) / (self.massimo - self.minimo) * self.classi).astype(np.int64)
+        self.conteggi += np.bincount(np.minimum(classe, self.classi - 1), minlength=self.classi)
+
+    def unisci(self, altro: 'IstogrammaFisso') -> 'IstogrammaFisso':
+        if (altro.minimo, altro.massimo, altro.classi) != (self.minimo, self.massimo, self.classi):
+            raise ValueError("Impossibile unire istogrammi con classi diverse")
+        self.conteggi += altro.conteggi
+        self.sotto += altro.sotto
+        self.sopra += altro.sopra
+        return self
+
+    def quantile(self, probabilita: float) -> float:
+        """
+        Quantile per interpolazione lineare nella classe che lo contiene; se
+        cade fuori dall'intervallo restituisce l'estremo corrispondente.
+        """
+        n = self.n
+        if n == 0:
+            return math.nan
+        obiettivo = probabilita * n
+        if obiettivo <= self.sotto:
+            return self.minimo
+        cumulati = self.sotto + np.cumsum(self.conteggi)
+        classe = int(np.searchsorted(cumulati, obiettivo, side='left'))
+        if classe >= self.classi:
+            return self.massimo
+        precedenti = cumulati[classe] - self.conteggi[classe]
+        frazione = (obiettivo - precedenti) / self.conteggi[classe]
+        ampiezza = (self.massimo - self.minimo) / self.classi
+        return self.minimo + (classe + frazione) * ampiezza
+
+
+class StatisticheMetrica:
+    """
+    Statistiche in streaming di una metrica: Welford, sketch KLL e, se sono
+    indicati gli estremi, un istogramma a classi fisse.
+    """
+
+    def __init__(self, k: int = 200, intervallo_istogramma: Optional[Sequence[float]] = None,
+                 classi_istogramma: int = 100, seed: Optional[int] = None):
+        self.momenti = StatisticheWelford()
+        self.quantili = SketchKLL(k, seed)
+        self.istogramma = IstogrammaFisso(*intervallo_istogramma, classi_istogramma) if intervallo_istogramma else None
+
+    def aggiungi(self, valore: float):
+        self.momenti.aggiungi(valore)
+        self.quantili.aggiungi(valore)
+        if self.istogramma is not None:
+            self.istogramma.aggiungi(valore)
+
+    def aggiungi_array(self, valori: Sequence[float]):
+        self.momenti.aggiungi_array(valori)
+        self.quantili.aggiungi_array(valori)
+        if self.istogramma is not None:
+            self.istogramma.aggiungi_array(valori)
+
+    def unisci(self, altra: 'StatisticheMetrica') -> 'StatisticheMetrica':
+        self.momenti.unisci(altra.momenti)
+        self.quantili.unisci(altra.quantili)
+        if self.istogramma is not None and altra.istogramma is not None:
+            self.istogramma.unisci(altra.istogramma)
+        return self
+
+    def riepilogo(self, percentili: Sequence[float] = PERCENTILI_PREDEFINITI) -> Dict:
+        return {
+            'n': self.momenti.n,
+            'media': self.momenti.media,
+            'deviazione_standard': self.momenti.deviazione_standard,
+            'minimo': self.momenti.minimo,
+            'massimo': self.momenti.massimo,
+            'percentili': dict(zip(percentili, self.quantili.quantili([p / 100 for p in percentili]).tolist())),
+            'errore_rango': self.quantili.errore_rango()
+        }
+
+
+METRICHE_SIMULAZIONE = ('tempo_totale', 'tonnellate', 'raggiungimento_target')
+
+
+class StatisticheSimulazione:
+    """
+    Statistiche in streaming delle uscite delle simulazioni, una
+    StatisticheMetrica per metrica: tempo totale (giorni), tonnellate per
+    ciclo e raggiungimento del target annuo (%), calcolati come in main().
+    Ogni worker accumula le proprie repliche e il processo principale unisce
+    le istanze con unisci(); la memoria per metrica è costante.
+    """
+
+    def __init__(self, config: ConfigurazioneGruppoDelPesce, k: int = 200,
+                 intervalli_istogramma: Optional[Dict[str, Sequence[float]]] = None,
+                 classi_istogramma: int = 100, seed: Optional[int] = None):
+        self.capacita_produttiva_annua = config.capacita_produttiva_annua
+        intervalli_istogramma = intervalli_istogramma or {}
+        rng = random.Random(seed)
+        self.metriche = {
+            metrica: StatisticheMetrica(k, intervalli_istogramma.get(metrica), classi_istogramma,
+                                        rng.getrandbits(32) if seed is not None else None)
+            for metrica in METRICHE_SIMULAZIONE
+        }
+
+    def aggiungi_risultati(self, risultati: Dict, risultati_tonnellate: Optional[Dict] = None):
+        """
+        Aggiunge una replica. Come in main() il ciclo dura il tempo_totale di
+        `risultati` e le tonnellate sono la somma dei dettagli di
+        `risultati_tonnellate` (di default gli stessi risultati).
+        """
+        dettagli = (risultati_tonnellate or risultati)['dettagli']
+        tonnellate = sum(d['tonnellate_prodotte'] for d in dettagli)
+        tempo_totale = risultati['tempo_totale']
+        produzione_annua = tonnellate * 365 / tempo_totale if tempo_totale else 0.0
+        self.metriche['tempo_totale'].aggiungi(tempo_totale)
+        self.metriche['tonnellate'].aggiungi(tonnellate)
+        self.metriche['raggiungimento_target'].aggiungi(produzione_annua / self.capacita_produttiva_annua * 100)
+
+    def aggiungi_array(self, tempo_totale: Sequence[float], tonnellate: Sequence[float]):
+        """Aggiunge un blocco di repliche già ridotte a tempo totale e tonnellate"""
+        tempo_totale = np.asarray(tempo_totale, dtype=np.float64)
+        tonnellate = np.asarray(tonnellate, dtype=np.float64)
+        produzione_annua = np.divide(tonnellate * 365, tempo_totale, out=np.zeros_like(tonnellate), where=tempo_totale != 0)
+        self.metriche['tempo_totale'].aggiungi_array(tempo_totale)
+        self.metriche['tonnellate'].aggiungi_array(tonnellate)
+        self.metriche['raggiungimento_target'].aggiungi_array(produzione_annua / self.capacita_produttiva_annua * 100)
+
+    def unisci(self, altra: 'StatisticheSimulazione') -> 'StatisticheSimulazione':
+        for metrica, statistiche in self.metriche.items():
+            statistiche.unisci(altra.metriche[metrica])
+        return self
+
+    def riepilogo(self, percentili: Sequence[float] = PERCENTILI_PREDEFINITI) -> Dict[str, Dict]:
+        return {metrica: statistiche.riepilogo(percentili) for metrica, statistiche in self.metriche.items()}
+
+
+def unisci_statistiche(parziali: Iterable):
+    """
+    Unisce in sequenza statistiche parziali dello stesso tipo (ad esempio
+    quelle restituite dai worker) e restituisce la prima, aggiornata.
+    """
+    totale = None
+    for parziale in parziali:
+        totale = parziale if totale is None else totale.unisci(parziale)
+    return totale
@@ -0,0 +1,286 @@
+"""
+MODULO STORICO SIMULAZIONI - GRUPPO DEL PESCE
+Archivio SQLite locale delle esecuzioni: configurazione, insieme di specie,
+risultati per lotto e indicatori di ogni simulazione, con indici per i
+confronti storici senza dover ripetere le simulazioni
+"""
+import hashlib
+import json
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from data_model.specie_ittica_model import SpecieIttica
+from utils.configurazione import ConfigurazioneGruppoDelPesce
+
+PERCORSO_PREDEFINITO = Path(__file__).resolve().parent.parent / "report" / "storico_simulazioni.db"
+
+VERSIONE_SCHEMA = 1
+
+# Attributi della configurazione che non influiscono sui risultati (esclusi dall'impronta)
+PARAMETRI_ESECUZIONE = ('modalita_output', 'motore_simulazione', 'registra_storico', 'percorso_storico')
+
+# Campi dei dettagli per lotto, comuni ai due metodi (quelli assenti restano NULL)
+CAMPI_DETTAGLIO = (
+    'specie', 'larve_seminate', 'vasche_larvali', 'vasche_preingrasso', 'gabbie_ingrasso',
+    'inizio_giorno', 'fine_larvale_giorno', 'fine_preingrasso_giorno', 'fine_ingrasso_giorno',
+    'giorni_larvali', 'giorni_preingrasso', 'giorni_ingrasso', 'giorni_totali',
+    'larve_sopravvissute', 'avannotti_2g', 'pesci_commerciali', 'tonnellate_prodotte', 'tasso_sopravvivenza_totale'
+)
+
+# Tipo SQLite delle colonne dei dettagli
+TIPI_DETTAGLIO = {
+    campo: 'TEXT' if campo == 'specie' else 'REAL' if campo in ('tonnellate_prodotte', 'tasso_sopravvivenza_totale') else 'INTEGER'
+    for campo in CAMPI_DETTAGLIO
+}
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS configurazioni (
+    id INTEGER PRIMARY KEY,
+    impronta TEXT NOT NULL UNIQUE,
+    parametri TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS insiemi_specie (
+    id INTEGER PRIMARY KEY,
+    impronta TEXT NOT NULL UNIQUE,
+    specie TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS esecuzioni (
+    id INTEGER PRIMARY KEY,
+    eseguita_il TEXT NOT NULL,
+    configurazione_id INTEGER NOT NULL REFERENCES configurazioni(id),
+    insieme_specie_id INTEGER NOT NULL REFERENCES insiemi_specie(id),
+    metodo TEXT NOT NULL,
+    nome_metodo TEXT NOT NULL,
+    motore TEXT,
+    numero_lotti INTEGER NOT NULL,
+    tempo_totale INTEGER NOT NULL,
+    tonnellate REAL NOT NULL,
+    raggiungimento_target REAL NOT NULL,
+    file_report TEXT
+);
+CREATE TABLE IF NOT EXISTS dettagli_lotti (
+    esecuzione_id INTEGER NOT NULL REFERENCES esecuzioni(id) ON DELETE CASCADE,
+    posizione INTEGER NOT NULL,
+    {', '.join(f'{campo} {tipo}' for campo, tipo in TIPI_DETTAGLIO.items())},
+    PRIMARY KEY (esecuzione_id, posizione)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_esecuzioni_configurazione_tempo ON esecuzioni (configurazione_id, metodo, tempo_totale);
+CREATE INDEX IF NOT EXISTS idx_esecuzioni_data ON esecuzioni (metodo, eseguita_il);
+CREATE INDEX IF NOT EXISTS idx_esecuzioni_specie ON esecuzioni (insieme_specie_id, metodo);
+CREATE INDEX IF NOT EXISTS idx_dettagli_specie ON dettagli_lotti (specie, esecuzione_id);
+"""
+
+
+def _impronta(dati) -> str:
+    """Impronta SHA-256 della rappresentazione JSON canonica (chiavi ordinate)"""
+    return hashlib.sha256(json.dumps(dati, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def parametri_configurazione(config: Union[ConfigurazioneGruppoDelPesce, Dict]) -> Dict:
+    """Parametri produttivi di una configurazione, senza le impostazioni di esecuzione e output"""
+    parametri = config if isinstance(config, dict) else vars(config)
+    return {nome: valore for nome, valore in parametri.items() if nome not in PARAMETRI_ESECUZIONE}
+
+
+def impronta_configurazione(config: Union[ConfigurazioneGruppoDelPesce, Dict]) -> str:
+    """Impronta di una configurazione: identica per configurazioni con gli stessi parametri produttivi"""
+    return _impronta(parametri_configurazione(config))
+
+
+def impronta_specie(specie: List[SpecieIttica]) -> str:
+    return _impronta([vars(s) for s in specie])
+
+
+class StoricoSimulazioni:
+    """
+    Archivio delle esecuzioni in un database SQLite in modalità WAL (letture
+    concorrenti alle scritture). Configurazioni e insiemi di specie sono
+    salvati una sola volta e identificati da un'impronta del contenuto; ogni
+    esecuzione registra metodo, motore, indicatori e i dettagli di tutti i
+    lotti, scritti con un solo executemany per esecuzione. Va usato come
+    context manager o chiuso con chiudi().
+    """
+
+    def __init__(self, percorso: Union[str, Path] = PERCORSO_PREDEFINITO):
+        self.percorso = Path(percorso)
+        self.percorso.parent.mkdir(parents=True, exist_ok=True)
+        self._connessione = sqlite3.connect(self.percorso)
+        self._connessione.row_factory = sqlite3.Row
+        self._connessione.execute("PRAGMA journal_mode=WAL")
+        self._connessione.execute("PRAGMA synchronous=NORMAL")
+        self._connessione.execute("PRAGMA foreign_keys=ON")
+        with self._connessione:
+            self._connessione.executescript(SCHEMA)
+            self._connessione.execute(f"PRAGMA user_version={VERSIONE_SCHEMA}")
+
+    def chiudi(self):
+        self._connessione.close()
+
+    def __enter__(self) -> 'StoricoSimulazioni':
+        return self
+
+    def __exit__(self, *exc):
+        self.chiudi()
+        return False
+
+    # ------------------------------------------------------------------
+    # Scrittura
+    # ------------------------------------------------------------------
+
+    def _id_per_impronta(self, tabella: str, colonna: str, impronta: str, contenuto) -> int:
+        self._connessione.execute(
+            f"INSERT OR IGNORE INTO {tabella} (impronta, {colonna}) VALUES (?, ?)",
+            (impronta, json.dumps(contenuto, sort_keys=True, ensure_ascii=False))
+        )
+        return self._connessione.execute(f"SELECT id FROM {tabella} WHERE impronta = ?", (impronta,)).fetchone()[0]
+
+    def registra_esecuzione(self, risultati: Dict, metodo: str, config: ConfigurazioneGruppoDelPesce,
+                            specie: List[SpecieIttica], motore: Optional[str] = None,
+                            file_report: Optional[str] = None, risultati_tonnellate: Optional[Dict] = None) -> int:
+        """
+        Registra un'esecuzione in un'unica transazione e ne restituisce l'id.
+        `metodo` è 'sequenziale' o 'sovrapposto'. Le tonnellate sono la somma
+        dei dettagli di `risultati_tonnellate` (di default gli stessi
+        risultati) e il raggiungimento del target è calcolato come in main():
+        tonnellate x 365 / tempo_totale rispetto alla capacità annua.
+        """
+        dettagli = risultati['dettagli']
+        tonnellate = sum(d['tonnellate_prodotte'] for d in (risultati_tonnellate or risultati)['dettagli'])
+        tempo_totale = risultati['tempo_totale']
+        produzione_annua = tonnellate * 365 / tempo_totale if tempo_totale else 0.0
+        raggiungimento = produzione_annua / config.capacita_produttiva_annua * 100
+
+        with self._connessione:
+            configurazione_id = self._id_per_impronta('configurazioni', 'parametri', impronta_configurazione(config),
+                                                      parametri_configurazione(config))
+            specie_id = self._id_per_impronta('insiemi_specie', 'specie', impronta_specie(specie), [vars(s) for s in specie])
+            esecuzione_id = self._connessione.execute(
+                "INSERT INTO esecuzioni (eseguita_il, configurazione_id, insieme_specie_id, metodo, nome_metodo, motore, "
+                "numero_lotti, tempo_totale, tonnellate, raggiungimento_target, file_report) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (datetime.now().isoformat(timespec='microseconds'), configurazione_id, specie_id, metodo,
+                 risultati['metodo'], motore, len(dettagli), tempo_totale, tonnellate, raggiungimento,
+                 None if file_report is None else str(file_report))
+            ).lastrowid
+            self._connessione.executemany(
+                f"INSERT INTO dettagli_lotti (esecuzione_id, posizione, {', '.join(CAMPI_DETTAGLIO)}) "
+                f"VALUES (?, ?, {', '.join('?' * len(CAMPI_DETTAGLIO))})",
+                ((esecuzione_id, posizione, *(d.get(campo) for campo in CAMPI_DETTAGLIO))
+                 for posizione, d in enumerate(dettagli))
+            )
+        return esecuzione_id
+
+    def elimina_esecuzione(self, esecuzione_id: int):
+        with self._connessione:
+            self._connessione.execute("DELETE FROM esecuzioni WHERE id = ?", (esecuzione_id,))
+
+    # ------------------------------------------------------------------
+    # Interrogazioni
+    # ------------------------------------------------------------------
+
+    def _id_configurazione(self, config: Union[ConfigurazioneGruppoDelPesce, Dict, str]) -> Optional[int]:
+        impronta = config if isinstance(config, str) else impronta_configurazione(config)
+        riga = self._connessione.execute("SELECT id FROM configurazioni WHERE impronta = ?", (impronta,)).fetchone()
+        return riga[0] if riga else None
+
+    def esecuzioni(self, metodo: Optional[str] = None, config: Union[ConfigurazioneGruppoDelPesce, Dict, str, None] = None,
+                   limite: Optional[int] = None) -> List[Dict]:
+        """
+        Elenco delle esecuzioni (più recenti prima), filtrabile per metodo e
+        per configurazione (oggetto, dizionario dei parametri o impronta).
+        """
+        condizioni, parametri = [], []
+        if metodo is not None:
+            condizioni.append("metodo = ?")
+            parametri.append(metodo)
+        if config is not None:
+            condizioni.append("configurazione_id = ?")
+            parametri.append(self._id_configurazione(config))
+        sql = "SELECT * FROM esecuzioni"
+        if condizioni:
+            sql += " WHERE " + " AND ".join(condizioni)
+        sql += " ORDER BY eseguita_il DESC, id DESC"
+        if limite is not None:
+            sql += " LIMIT ?"
+            parametri.append(limite)
+        return [dict(riga) for riga in self._connessione.execute(sql, parametri)]
+
+    def migliori_tempi(self, config: Union[ConfigurazioneGruppoDelPesce, Dict, str], metodo: str = 'sovrapposto',
+                       limite: int = 1) -> List[Dict]:
+        """
+        Esecuzioni con il tempo_totale più basso per una configurazione
+        (risolta con l'indice su configurazione, metodo e tempo).
+        """
+        return [dict(riga) for riga in self._connessione.execute(
+            "SELECT * FROM esecuzioni WHERE configurazione_id = ? AND metodo = ? ORDER BY tempo_totale, id LIMIT ?",
+            (self._id_configurazione(config), metodo, limite)
+        )]
+
+    def andamento_target(self, metodo: str = 'sovrapposto', dal: Optional[str] = None,
+                         config: Union[ConfigurazioneGruppoDelPesce, Dict, str, None] = None) -> List[Dict]:
+        """
+        Raggiungimento del target delle esecuzioni in ordine cronologico, con
+        la media mobile cumulata; `dal` è una data/ora ISO di inizio.
+        """
+        condizioni, parametri = ["metodo = ?"], [metodo]
+        if dal is not None:
+            condizioni.append("eseguita_il >= ?")
+            parametri.append(dal)
+        if config is not None:
+            condizioni.append("configurazione_id = ?")
+            parametri.append(self._id_configurazione(config))
+        righe = self._connessione.execute(
+            "SELECT id, eseguita_il, raggiungimento_target, "
+            "AVG(raggiungimento_target) OVER (ORDER BY eseguita_il, id) AS media_cumulata "
+            f"FROM esecuzioni WHERE {' AND '.join(condizioni)} ORDER BY eseguita_il, id",
+            parametri
+        )
+        return [dict(riga) for riga in righe]
+
+    def statistiche_per_configurazione(self, metodo: str = 'sovrapposto') -> List[Dict]:
+        """
+        Per ogni configurazione: numero di esecuzioni, tempo totale minimo e
+        medio, tonnellate medie e raggiungimento medio del target.
+        """
+        return [dict(riga) for riga in self._connessione.execute(
+            "SELECT c.impronta, COUNT(*) AS esecuzioni, MIN(e.tempo_totale) AS tempo_minimo, "
+            "AVG(e.tempo_totale) AS tempo_medio, AVG(e.tonnellate) AS tonnellate_medie, "
+            "AVG(e.raggiungimento_target) AS raggiungimento_medio "
+            "FROM esecuzioni e JOIN configurazioni c ON c.id = e.configurazione_id "
+            "WHERE e.metodo = ? GROUP BY e.configurazione_id ORDER BY tempo_minimo",
+            (metodo,)
+        )]
+
+    def configurazione(self, esecuzione_id: int) -> Dict:
+        """Parametri della configurazione usata da un'esecuzione"""
+        riga = self._connessione.execute(
+            "SELECT c.parametri FROM esecuzioni e JOIN configurazioni c ON c.id = e.configurazione_id WHERE e.id = ?",
+            (esecuzione_id,)
+        ).fetchone()
+        return json.loads(riga[0]) if riga else None
+
+    def specie(self, esecuzione_id: int) -> List[SpecieIttica]:
+        """Specie usate da un'esecuzione"""
+        riga = self._connessione.execute(
+            "SELECT s.specie FROM esecuzioni e JOIN insiemi_specie s ON s.id = e.insieme_specie_id WHERE e.id = ?",
+            (esecuzione_id,)
+        ).fetchone()
+        return [SpecieIttica(**s) for s in json.loads(riga[0])] if riga else None
+
+    def risultati(self, esecuzione_id: int) -> Optional[Dict]:
+        """
+        Ricostruisce i risultati di un'esecuzione nel formato delle sequenze
+        produttive (metodo, dettagli con i soli campi valorizzati, tempo
+        totale), utilizzabile dal report e dall'output console.
+        """
+        esecuzione = self._connessione.execute("SELECT * FROM esecuzioni WHERE id = ?", (esecuzione_id,)).fetchone()
+        if esecuzione is None:
+            return None
+        righe = self._connessione.execute(
+            f"SELECT {', '.join(CAMPI_DETTAGLIO)} FROM dettagli_lotti WHERE esecuzione_id = ? ORDER BY posizione",
+            (esecuzione_id,)
+        )
+        dettagli = [{campo: riga[campo] for campo in CAMPI_DETTAGLIO if riga[campo] is not None} for riga in righe]
+        return {'metodo': esecuzione['nome_metodo'], 'dettagli': dettagli, 'tempo_totale': esecuzione['tempo_totale']}
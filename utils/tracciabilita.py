@@ -0,0 +1,236 @@
+"""
+MODULO TRACCIABILITÀ LOTTI - GRUPPO DEL PESCE
+Assegnazione dei lotti alle singole vasche e gabbie fisiche e indice a array
+ordinati per rispondere in tempo logaritmico a "quali lotti erano nella gabbia
+X il giorno D" e "dove è passato il lotto L"
+"""
+import heapq
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from data_model.lotto_produzione_model import LottoProduzione
+from utils.calcolo_vasche import combinazioni_vasche_larvali, domanda_vasche_larvali, vasche_larvali_disponibili
+from utils.configurazione import ConfigurazioneGruppoDelPesce
+from utils.occupazione_risorse import FASI_RISORSE, capacita_risorse
+
+RISORSE = tuple(FASI_RISORSE)  # codice risorsa = posizione in questa tupla
+
+
+def _assegna_unita(inizi: np.ndarray, fini: np.ndarray, quantita: np.ndarray, capacita: int,
+                   primo: int = 0, prossima_virtuale: Optional[int] = None):
+    """
+    Assegna a ogni lotto le unità fisiche di una risorsa (o di un tipo di
+    vasca, numerato da `primo`) scorrendo gli eventi in ordine di tempo (a
+    parità di giorno i rilasci precedono le occupazioni): le unità libere
+    stanno in un min-heap e ogni lotto prende le unità con numero più basso.
+    Se le unità libere non bastano vengono create unità virtuali numerate da
+    `prossima_virtuale` (di default primo + capacita) in su, che segnalano
+    il sovraccarico. I lotti con intervallo vuoto non occupano unità.
+    Restituisce gli array (lotto, unità) di tutte le assegnazioni e il
+    numero della prossima unità virtuale.
+    """
+    totale = int(quantita.sum())
+    lotto_assegnato = np.empty(totale, dtype=np.int32)
+    unita_assegnata = np.empty(totale, dtype=np.int32)
+
+    libere = list(range(primo, primo + capacita))
+    if prossima_virtuale is None:
+        prossima_virtuale = primo + capacita
+    occupate: Dict[int, List[int]] = {}
+    # Eventi: (giorno, 0 = rilascio / 1 = occupazione, lotto)
+    eventi = sorted([(int(f), 0, i) for i, f in enumerate(fini)] + [(int(s), 1, i) for i, s in enumerate(inizi)])
+
+    posizione = 0
+    for _, tipo, lotto in eventi:
+        if tipo == 0:
+            for unita in occupate.pop(lotto, ()):
+                heapq.heappush(libere, unita)
+            continue
+        if fini[lotto] <= inizi[lotto]:
+            continue
+        prese = []
+        for _ in range(int(quantita[lotto])):
+            if libere:
+                prese.append(heapq.heappop(libere))
+            else:
+                prese.append(prossima_virtuale)
+                prossima_virtuale += 1
+        occupate[lotto] = prese
+        lotto_assegnato[posizione:posizione + len(prese)] = lotto
+        unita_assegnata[posizione:posizione + len(prese)] = prese
+        posizione += len(prese)
+
+    return lotto_assegnato[:posizione], unita_assegnata[:posizione], prossima_virtuale
+
+
+class IndiceTracciabilita:
+    """
+    Indice delle assegnazioni lotto -> unità fisica costruito dal piano del
+    metodo sovrapposto. Le assegnazioni sono memorizzate in array NumPy
+    compatti (risorsa, unità, lotto, inizio, fine) ordinati due volte: per
+    (risorsa, unità, inizio), con offset per unità, e per lotto, con offset
+    per lotto. Su ogni unità gli intervalli non si sovrappongono, per cui la
+    ricerca di un giorno è una ricerca binaria nel tratto dell'unità.
+    """
+
+    def __init__(self, risultati_sov: Dict, config: ConfigurazioneGruppoDelPesce, lotti: List[LottoProduzione]):
+        """
+        Assegna le unità fisiche per ciascuna risorsa e costruisce gli indici.
+        `lotti` sono i lotti simulati, nello stesso ordine dei dettagli: per
+        le vasche larvali ogni lotto riceve le vasche piccole, medie e grandi
+        scelte da assegna_vasche_larvali, prese ciascuna dal proprio insieme
+        di vasche libere. Le vasche larvali sono numerate piccole, poi medie,
+        poi grandi; le gabbie per impianto (gabbia g è nell'impianto
+        g // gabbie_per_impianto).
+        """
+        self.config = config
+        self.capacita = capacita_risorse(config)
+        dettagli = risultati_sov['dettagli']
+        n = len(dettagli)
+        if len(lotti) != n:
+            raise ValueError(f"Lotti ({len(lotti)}) e dettagli del piano ({n}) non corrispondono")
+        self.numero_lotti = n
+
+        colonne = {'risorsa': [], 'unita': [], 'lotto': [], 'inizio': [], 'fine': []}
+        for codice, (risorsa, (campo_quantita, campo_inizio, campo_fine)) in enumerate(FASI_RISORSE.items()):
+            inizi = np.fromiter((d[campo_inizio] for d in dettagli), dtype=np.int64, count=n)
+            fini = np.fromiter((d[campo_fine] for d in dettagli), dtype=np.int64, count=n)
+            quantita = np.fromiter((d[campo_quantita] for d in dettagli), dtype=np.int64, count=n)
+
+            if risorsa == 'vasche_larvali':
+                assegnati, unita = self._assegna_vasche_larvali(lotti, inizi, fini)
+            else:
+                assegnati, unita, _ = _assegna_unita(inizi, fini, quantita, self.capacita[risorsa])
+            colonne['risorsa'].append(np.full(len(assegnati), codice, dtype=np.int8))
+            colonne['unita'].append(unita)
+            colonne['lotto'].append(assegnati)
+            colonne['inizio'].append(inizi[assegnati])
+            colonne['fine'].append(fini[assegnati])
+
+        risorsa = np.concatenate(colonne['risorsa'])
+        unita = np.concatenate(colonne['unita'])
+        lotto = np.concatenate(colonne['lotto'])
+        inizio = np.concatenate(colonne['inizio'])
+        fine = np.concatenate(colonne['fine'])
+
+        # Ordinamento per (risorsa, unità, inizio) e offset per unità di ciascuna risorsa
+        ordine = np.lexsort((inizio, unita, risorsa))
+        self._unita_risorsa = risorsa[ordine]
+        self._unita_unita = unita[ordine]
+        self._unita_lotto = lotto[ordine]
+        self._unita_inizio = inizio[ordine]
+        self._unita_fine = fine[ordine]
+        self._numero_unita = {
+            r: int(unita[risorsa == c].max()) + 1 if (risorsa == c).any() else self.capacita[r]
+            for c, r in enumerate(RISORSE)
+        }
+        self._offset_unita = {}
+        for c, r in enumerate(RISORSE):
+            inizio_r, fine_r = np.searchsorted(self._unita_risorsa, [c, c + 1])
+            confini = np.searchsorted(self._unita_unita[inizio_r:fine_r], np.arange(self._numero_unita[r] + 1))
+            self._offset_unita[r] = inizio_r + confini
+
+        # Ordinamento per lotto (e per risorsa, inizio, unità) e offset per lotto
+        ordine = np.lexsort((unita, inizio, risorsa, lotto))
+        self._lotto_risorsa = risorsa[ordine]
+        self._lotto_unita = unita[ordine]
+        self._lotto_inizio = inizio[ordine]
+        self._lotto_fine = fine[ordine]
+        self._offset_lotto = np.searchsorted(lotto[ordine], np.arange(n + 1))
+
+    def _assegna_vasche_larvali(self, lotti: List[LottoProduzione], inizi: np.ndarray, fini: np.ndarray):
+        """
+        Assegna le vasche larvali tipo per tipo secondo la combinazione
+        (piccole, medie, grandi) di ciascun lotto, con un insieme di vasche
+        libere per tipo. Le vasche virtuali di tutti i tipi sono numerate di
+        seguito dopo l'ultima vasca grande.
+        """
+        n = len(lotti)
+        numero_larve = np.fromiter((l.numero_larve for l in lotti), dtype=np.int64, count=n)
+        densita = np.fromiter((l.specie.densita_semina_larvale for l in lotti), dtype=np.int64, count=n)
+        disponibili = vasche_larvali_disponibili(self.config)
+        combinazioni = combinazioni_vasche_larvali(domanda_vasche_larvali(numero_larve, densita), disponibili)
+
+        assegnati, unita = [], []
+        primo = 0
+        prossima_virtuale = self.capacita['vasche_larvali']
+        for tipo, numero in enumerate(disponibili):
+            assegnati_tipo, unita_tipo, prossima_virtuale = _assegna_unita(
+                inizi, fini, combinazioni[:, tipo], numero, primo, prossima_virtuale)
+            assegnati.append(assegnati_tipo)
+            unita.append(unita_tipo)
+            primo += numero
+        return np.concatenate(assegnati), np.concatenate(unita)
+
+    @property
+    def numero_assegnazioni(self) -> int:
+        return len(self._unita_lotto)
+
+    def unita_in_sovraccarico(self, risorsa: str) -> int:
+        """
+        Numero di unità virtuali create oltre la capacità per la risorsa.
+        """
+        return max(0, self._numero_unita[risorsa] - self.capacita[risorsa])
+
+    def lotto_in_unita(self, risorsa: str, unita: int, giorno: int) -> Optional[int]:
+        """
+        Restituisce il lotto presente nell'unità il giorno indicato, o None.
+        Ricerca binaria sugli inizi degli intervalli dell'unità: O(log n).
+        """
+        if not 0 <= unita < self._numero_unita[risorsa]:
+            return None
+        a, b = self._offset_unita[risorsa][unita], self._offset_unita[risorsa][unita + 1]
+        k = a + int(np.searchsorted(self._unita_inizio[a:b], giorno, side='right')) - 1
+        if k >= a and self._unita_fine[k] > giorno:
+            return int(self._unita_lotto[k])
+        return None
+
+    def lotti_in_impianto(self, impianto: int, giorno: int) -> Dict[int, int]:
+        """
+        Restituisce gabbia -> lotto per le gabbie occupate dell'impianto nel
+        giorno indicato (una ricerca binaria per gabbia dell'impianto).
+        """
+        primo = impianto * self.config.gabbie_per_impianto
+        presenti = {}
+        for gabbia in range(primo, primo + self.config.gabbie_per_impianto):
+            lotto = self.lotto_in_unita('gabbie_ingrasso', gabbia, giorno)
+            if lotto is not None:
+                presenti[gabbia] = lotto
+        return presenti
+
+    def percorso_lotto(self, lotto: int) -> List[Dict]:
+        """
+        Restituisce tutte le unità occupate dal lotto, in ordine di fase e di
+        inizio, con etichetta leggibile e intervallo [inizio, fine).
+        """
+        a, b = self._offset_lotto[lotto], self._offset_lotto[lotto + 1]
+        return [
+            {
+                'risorsa': RISORSE[self._lotto_risorsa[k]],
+                'unita': int(self._lotto_unita[k]),
+                'etichetta': self.etichetta_unita(RISORSE[self._lotto_risorsa[k]], int(self._lotto_unita[k])),
+                'inizio_giorno': int(self._lotto_inizio[k]),
+                'fine_giorno': int(self._lotto_fine[k])
+            }
+            for k in range(a, b)
+        ]
+
+    def etichetta_unita(self, risorsa: str, unita: int) -> str:
+        """
+        Restituisce il nome leggibile di un'unità fisica (o virtuale, se oltre
+        la capacità configurata).
+        """
+        if unita >= self.capacita[risorsa]:
+            return f"{risorsa} virtuale {unita - self.capacita[risorsa] + 1} (oltre capacità)"
+        if risorsa == 'vasche_larvali':
+            piccole, medie = self.config.vasche_larvali_piccole, self.config.vasche_larvali_medie
+            if unita < piccole:
+                return f"vasca larvale piccola {unita + 1}"
+            if unita < piccole + medie:
+                return f"vasca larvale media {unita - piccole + 1}"
+            return f"vasca larvale grande {unita - piccole - medie + 1}"
+        if risorsa == 'vasche_preingrasso':
+            return f"vasca preingrasso {unita + 1}"
+        impianto, gabbia = divmod(unita, self.config.gabbie_per_impianto)
+        return f"gabbia {gabbia + 1} impianto {impianto + 1}"